@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+
+import arcade
+import PIL.Image
+
+from Libs.hitbox import CachedTexture
+from Libs.tracing import traced
+
+
+__all__ = ["ATLAS_DIR", "SOURCE_DIRS", "build_atlas", "load_atlas", "install_atlas", "prime_gpu_atlas"]
+
+
+# 游戏的根目录，图片路径都是相对于这里的
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 打包好的图集与清单的存放位置，设为None时不使用图集，每张图片单独加载
+ATLAS_DIR = os.path.join(ROOT, ".cache", "atlas")
+# 需要打包进图集的目录。动图（webp）由framecache单独缓存，不放进图集
+SOURCE_DIRS = ["images", "dlc_ishar_mla/images"]
+# 打包方式或清单格式改变时增加这个数字，旧的图集会被重新生成
+ATLAS_VERSION = 1
+ATLAS_WIDTH = 1024
+# 图片之间留出的透明像素，避免缩放绘制时采样到相邻图片的边缘
+PADDING = 2
+
+# 已经放进arcade材质缓存中的材质，见install_atlas
+_installed = []
+
+
+def find_sources(root=ROOT, dirs=SOURCE_DIRS):
+    """
+    找出需要打包的所有图片
+    :param root: 游戏的根目录
+    :param dirs: 相对于根目录的图片目录
+    :return: 按名称排序的图片路径列表，路径相对于根目录，使用“/”分隔，与游戏代码中写的路径相同
+    """
+    sources = []
+    for directory in dirs:
+        for path, _, files in os.walk(os.path.join(root, directory)):
+            for file in files:
+                if file.lower().endswith(".png"):
+                    sources.append(os.path.relpath(os.path.join(path, file), root).replace(os.sep, "/"))
+    return sorted(sources)
+
+
+def _signature(root, name):
+    # 用文件大小与修改时间判断图片是否改变：启动时只需要stat，不需要重新读取每一张图片
+    stat = os.stat(os.path.join(root, name))
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _pack(sizes, width, padding):
+    """
+    按行摆放图片：先按高度从高到低排序，一行放不下时换到下一行
+    :param sizes: 字典，格式为：图片名：(宽, 高)
+    :return: (字典，格式为：图片名：(x, y)，图集需要的高度)
+    """
+    positions = {}
+    x = y = row_height = 0
+    for name in sorted(sizes, key=lambda item: (-sizes[item][1], item)):
+        image_width, image_height = sizes[name]
+        if image_width + padding > width:
+            raise ValueError(f"The image {name} is wider than the atlas ({width} px).")
+        if x + image_width + padding > width:
+            x = 0
+            y += row_height
+            row_height = 0
+        positions[name] = (x, y)
+        x += image_width + padding
+        row_height = max(row_height, image_height + padding)
+    return positions, y + row_height
+
+
+@traced("asset")
+def build_atlas(root=ROOT, dirs=SOURCE_DIRS, out_dir=ATLAS_DIR, width=ATLAS_WIDTH):
+    """
+    把所有图片打包为一张图集，同时写入记录每张图片位置的清单atlas.json
+    :param root: 游戏的根目录
+    :param dirs: 相对于根目录的图片目录
+    :param out_dir: 图集与清单的存放目录
+    :param width: 图集的宽
+    :return: (清单, 图集的PIL.Image)
+    """
+    images = {name: PIL.Image.open(os.path.join(root, name)).convert("RGBA") for name in find_sources(root, dirs)}
+    positions, height = _pack({name: image.size for name, image in images.items()}, width, PADDING)
+    sheet = PIL.Image.new("RGBA", (width, max(height, 1)), (0, 0, 0, 0))
+    sprites = {}
+    for name, image in images.items():
+        x, y = positions[name]
+        sheet.paste(image, (x, y))
+        sprites[name] = {"rect": [x, y, *image.size], "source": _signature(root, name)}
+    manifest = {"version": ATLAS_VERSION, "dirs": list(dirs), "size": list(sheet.size), "sprites": sprites}
+
+    os.makedirs(out_dir, exist_ok=True)
+    # 先写入临时文件再替换，程序中途被关闭也不会留下不完整的图集
+    temp_image = os.path.join(out_dir, f"atlas.{os.getpid()}.tmp.png")
+    temp_manifest = os.path.join(out_dir, f"atlas.{os.getpid()}.tmp.json")
+    sheet.save(temp_image)
+    with open(temp_manifest, "w") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(temp_image, os.path.join(out_dir, "atlas.png"))
+    os.replace(temp_manifest, os.path.join(out_dir, "atlas.json"))
+    return manifest, sheet
+
+
+def _is_current(manifest, root, dirs):
+    if manifest.get("version") != ATLAS_VERSION or manifest.get("dirs") != list(dirs):
+        return False
+    sprites = manifest.get("sprites", {})
+    if sorted(sprites) != find_sources(root, dirs):
+        return False
+    try:
+        return all(_signature(root, name) == entry["source"] for name, entry in sprites.items())
+    except OSError:
+        return False
+
+
+def load_atlas(root=ROOT, dirs=SOURCE_DIRS, out_dir=ATLAS_DIR):
+    """
+    读取图集。图集不存在、图片被修改、增加或删除时重新打包
+    :return: (清单, 图集的PIL.Image)
+    """
+    try:
+        with open(os.path.join(out_dir, "atlas.json")) as file:
+            manifest = json.load(file)
+        if _is_current(manifest, root, dirs):
+            return manifest, PIL.Image.open(os.path.join(out_dir, "atlas.png")).convert("RGBA")
+    except (OSError, ValueError):
+        # 没有图集或者图集损坏，重新打包
+        pass
+    return build_atlas(root, dirs, out_dir)
+
+
+@traced("asset")
+def install_atlas(root=ROOT, dirs=SOURCE_DIRS, out_dir=ATLAS_DIR):
+    """
+    把图集中的每张图片放进arcade.load_texture的缓存。
+    arcade加载材质时会先按文件路径查找缓存，找到时直接使用缓存中的图像而不再打开文件，
+    因此之后所有的arcade.load_texture(路径)与arcade.Sprite(路径)（包括翻转、裁剪等）都会从图集中取图，
+    材质的名称、图像与碰撞盒都与直接加载图片时完全相同，碰撞盒还会从Libs.hitbox的缓存中获取。
+    需要在os.chdir到游戏目录之后、加载任何图片之前调用
+    :return: 放进缓存的图片数量；ATLAS_DIR为None或打包失败时返回0，游戏会像原来一样单独加载每张图片
+    """
+    if out_dir is None:
+        return 0
+    try:
+        manifest, sheet = load_atlas(root, dirs, out_dir)
+    except (OSError, ValueError):
+        return 0
+    cache = arcade.texture.load_texture.texture_cache
+    for name, entry in manifest["sprites"].items():
+        x, y, width, height = entry["rect"]
+        image = sheet.crop((x, y, x + width, y + height))
+        if name not in cache:
+            cache[name] = CachedTexture(name, image)
+        # 不带任何参数调用arcade.load_texture(name)时使用的缓存名，与arcade内部的格式保持一致
+        full_name = f"{name}-0-0-0-0-False-False-False-Simple "
+        if full_name not in cache:
+            cache[full_name] = CachedTexture(full_name, image)
+        _installed.append(cache[full_name])
+    return len(manifest["sprites"])
+
+
+@traced("asset")
+def prime_gpu_atlas(ctx):
+    """
+    把图集中的所有材质一次性放进arcade的默认GPU图集。
+    arcade的精灵列表本来就从同一张默认图集中取材质，绘制一层只需要绑定一次材质；
+    提前放入可以避免游戏中第一次出现某种精灵时才上传材质，甚至因为图集空间不足而重建整张图集
+    :param ctx: 窗口的ArcadeContext，即window.ctx
+    :return: None
+    """
+    atlas = ctx.default_atlas
+    for texture in _installed:
+        if not atlas.has_texture(texture):
+            atlas.add(texture)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把游戏的图片打包为一张图集")
+    parser.add_argument("--out", default=ATLAS_DIR, help="图集与清单的存放目录")
+    parser.add_argument("--width", type=int, default=ATLAS_WIDTH, help="图集的宽")
+    args = parser.parse_args()
+    result, image = build_atlas(out_dir=args.out, width=args.width)
+    print(f"{len(result['sprites'])} images -> {image.size[0]}x{image.size[1]} {os.path.join(args.out, 'atlas.png')}")
@@ -0,0 +1,335 @@
+import argparse
+import gc
+import importlib
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from Libs.rng import RNG
+
+try:
+    import resource
+except ImportError:
+    # Windows没有resource模块，此时不统计进程的内存峰值
+    resource = None
+
+
+__all__ = ["Scenario", "SCENARIOS", "scenario", "run_scenario", "run_suite", "write_results"]
+
+
+# 结果文件的格式改变时增加这个数字
+RESULTS_VERSION = 1
+# 计时时把步数平均分成的批数
+BATCHES = 10
+
+
+class Scenario(namedtuple("Scenario", ["name", "game", "boss_fight", "description", "setup"])):
+    """
+    一个基准测试场景
+    name: 场景名
+    game: 游戏模块名，"main"或"ishar_mla"
+    boss_fight: 是否以Boss战创建GameView
+    description: 场景的说明
+    setup: 搭建场景的函数，参数为(游戏模块, GameView)，返回每一步之前调用一次的函数（参数为GameView），
+           用来让场景中的东西保持在设定的数量，None：不需要
+    """
+
+
+# 场景名：Scenario，按注册的顺序运行
+SCENARIOS = {}
+
+
+def scenario(name, game, boss_fight=False):
+    """
+    注册一个基准测试场景的装饰器，被装饰函数的文档字符串作为场景的说明
+    :param name: 场景名
+    :param game: 游戏模块名
+    :param boss_fight: 是否以Boss战创建GameView
+    """
+
+    def decorator(setup):
+        SCENARIOS[name] = Scenario(name, game, boss_fight, (setup.__doc__ or "").strip(), setup)
+        return setup
+
+    return decorator
+
+
+def _hold(view):
+    # 所有场景共用：玩家不会受伤，分数保持为0，场景不会因为玩家死亡或者Boss出现而改变
+    view.player.invincible = math.inf
+    view.player.no_hurt = True
+    view.score = 0
+
+
+def _refill_enemies(game, view, count, difficulty):
+    # 按difficulty.json中的难度补充敌机，直到Enemy层中有count架。
+    # spawn_enemy会在屏幕顶端找不重叠的位置，放不下这么多敌机，这里直接把敌机撒在屏幕上半部分
+    setting = game.DIFFICULTY[difficulty]
+    for _ in range(count - len(view.game_scene["Enemy"])):
+        plane = game.Enemy(RNG.spawning.choice(game.ENEMY), view, speed=RNG.spawning.randint(*setting["speed"]),
+                           health=setting["health"], fire=setting["fire"], fire_cd=setting["fire_cd"],
+                           chase=setting["chase"],
+                           center_y=RNG.spawning.uniform(game.SCREEN_HEIGHT / 2, game.SCREEN_HEIGHT + 20))
+        view.game_scene.add_sprite("Enemy", plane)
+
+
+@scenario("hard_bullets", "main")
+def _hard_bullets(game, view):
+    """500颗强追踪子弹同时转向玩家"""
+
+    def keep(_view):
+        for _ in range(500 - len(view.bullet_engines["EnemyBullet"])):
+            bullet = view.bullet_pool.acquire((RNG.spawning.uniform(0, game.SCREEN_WIDTH),
+                                               RNG.spawning.uniform(game.SCREEN_HEIGHT / 2, game.SCREEN_HEIGHT)),
+                                              chase=game.HARD, player=view.player, chase_time=math.inf,
+                                              turn_rate=90)
+            view.add_bullet("EnemyBullet", bullet)
+
+    keep(view)
+    return keep
+
+
+@scenario("enemy_wave", "main")
+def _enemy_wave(game, view):
+    """50架难度为4的敌机，发射强追踪子弹"""
+
+    def keep(_view):
+        _refill_enemies(game, view, 50, "4")
+
+    keep(view)
+    return keep
+
+
+@scenario("boss_many_bullets", "main", boss_fight=True)
+def _boss_many_bullets(game, view):
+    """Boss持续释放无尽火力"""
+    boss = view.boss
+    # 只释放这一个技能
+    boss.skill = lambda: None
+
+    def keep(_view):
+        if not view.timeline:
+            boss.many_bullets()
+
+    keep(view)
+    return keep
+
+
+@scenario("dlc_tears", "ishar_mla", boss_fight=True)
+def _dlc_tears(game, view):
+    """伊莎玛拉的Boss战，场上保持三滴眼泪与三个投掷球"""
+    boss = view.boss
+    boss.skill = lambda: None
+
+    def keep(_view):
+        enemies = view.game_scene["Enemy"]
+        for _ in range(3 - sum(isinstance(sprite, game.Tear) for sprite in enemies)):
+            boss.tear()
+        for _ in range(3 - sum(isinstance(sprite, game.ThrowBall) for sprite in enemies)):
+            ball = game.ThrowBall(game.BOSS_THROW_BALL, player_position=view.player.position,
+                                  center=(boss.center_x, boss.bottom))
+            view.game_scene.add_sprite("Enemy", ball)
+
+    keep(view)
+    return keep
+
+
+@scenario("overload", "main")
+def _overload(game, view):
+    """玩家持续释放技能一，高速发射穿透子弹，场上保持30架敌机"""
+    view.firing = True
+
+    def keep(_view):
+        if not view.player.bullet_through:
+            view.player.skills[0] = True
+            view.player.unlimited_bullets()
+        _refill_enemies(game, view, 30, "1")
+
+    keep(view)
+    return keep
+
+
+def _max_rss():
+    # 进程运行以来的内存峰值，单位为字节
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux下单位为KB，macOS下为字节
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_scenario(name, ticks=600, warmup=120, seed=1, memory=True):
+    """
+    在当前进程中运行一个场景。先预热warmup步，再不加追踪地运行ticks步计时，最后在tracemalloc下再运行ticks步统计内存
+    :param name: 场景名
+    :param ticks: 计时与统计内存各运行的步数
+    :param warmup: 预热的步数，让场景进入稳定状态
+    :param seed: 随机数种子
+    :param memory: 是否统计内存，False：只计时，结果中没有内存相关的指标
+    :return: 字典，各项指标见write_results
+    """
+    item = SCENARIOS[name]
+    game = importlib.import_module(item.game)
+    view = game.GameView(boss_fight=item.boss_fight, headless=True, seed=seed)
+    keep = item.setup(game, view)
+    step = game.SIM_STEP
+
+    def tick():
+        _hold(view)
+        if keep is not None:
+            keep(view)
+        view.update(step)
+
+    for _ in range(warmup):
+        tick()
+    gc.collect()
+
+    # 分成若干批计时，最快的一批受系统中其他程序打断的影响最小
+    batch = max(ticks // BATCHES, 1)
+    wall_time = 0
+    best = math.inf
+    done = 0
+    while done < ticks:
+        count = min(batch, ticks - done)
+        start = time.perf_counter()
+        for _ in range(count):
+            tick()
+        elapsed = time.perf_counter() - start
+        wall_time += elapsed
+        best = min(best, elapsed / count)
+        done += count
+    result = {
+        "game": item.game,
+        "description": item.description,
+        "ticks": ticks,
+        "ticks_per_second": ticks / wall_time,
+        "ms_per_tick": wall_time / ticks * 1000,
+        "best_ms_per_tick": best * 1000,
+    }
+    if not memory:
+        return result
+
+    # 每一步中分配的内存：这一步中Python堆的峰值比步开始时高出的部分
+    allocated = 0
+    peak = 0
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    for _ in range(ticks):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        tick()
+        tick_peak = tracemalloc.get_traced_memory()[1]
+        allocated += tick_peak - before
+        peak = max(peak, tick_peak)
+    blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+
+    result.update({
+        "alloc_bytes_per_tick": allocated / ticks,
+        "blocks_per_tick": blocks / ticks,
+        "peak_traced_bytes": peak,
+        "max_rss_bytes": _max_rss(),
+        "sprites": sum(len(sprite_list) for sprite_list in view.game_scene.sprite_lists),
+    })
+    return result
+
+
+def run_suite(names=None, ticks=600, warmup=120, seed=1, memory=True):
+    """
+    依次运行若干场景，每个场景在单独的子进程中运行，内存峰值互不影响
+    :param names: 场景名的列表，None：所有场景
+    :param ticks: 同run_scenario
+    :param warmup: 同run_scenario
+    :param seed: 同run_scenario
+    :param memory: 同run_scenario
+    :return: 字典，场景名：run_scenario的结果
+    """
+    results = {}
+    for name in names or SCENARIOS:
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        command = [sys.executable, "-m", "Libs.benchmark", "--worker", name, "--ticks", str(ticks),
+                   "--warmup", str(warmup), "--seed", str(seed)]
+        if not memory:
+            command.append("--no-memory")
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        # 游戏模块在导入时可能打印内容，结果总是最后一行
+        results[name] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+
+def write_results(path, results, ticks, warmup, seed):
+    """
+    把结果写入JSON文件，便于在不同版本之间比较。每个场景的指标为：
+    ticks_per_second: 每秒能推进的逻辑步数
+    ms_per_tick: 每一步的平均耗时，单位为毫秒
+    best_ms_per_tick: 最快的一批中每一步的平均耗时，单位为毫秒，比ms_per_tick更不容易受机器负载影响
+    alloc_bytes_per_tick: 每一步中平均分配的内存（步内Python堆峰值超出步开始时的部分），单位为字节
+    blocks_per_tick: 每一步后平均多出的内存块数量，持续大于0说明有东西在不断累积
+    peak_traced_bytes: 统计期间Python堆的峰值，单位为字节
+    max_rss_bytes: 运行该场景的进程的内存峰值，单位为字节，Windows下为None
+    sprites: 结束时场景中的精灵数量
+    :param path: 结果文件的路径
+    :param results: run_suite的结果
+    :param ticks: 运行时使用的参数
+    :param warmup: 同上
+    :param seed: 同上
+    :return: None
+    """
+    import arcade
+    import numpy
+
+    data = {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "arcade": arcade.version.VERSION,
+        "numpy": numpy.__version__,
+        "ticks": ticks,
+        "warmup": warmup,
+        "seed": seed,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="在没有显示器的情况下运行基准测试场景，统计每秒步数、每步分配的内存与内存峰值")
+    parser.add_argument("scenarios", nargs="*", help="要运行的场景，不指定时运行全部场景")
+    parser.add_argument("--ticks", type=int, default=600, help="计时与统计内存各运行的步数")
+    parser.add_argument("--warmup", type=int, default=120, help="预热的步数")
+    parser.add_argument("--seed", type=int, default=1, help="随机数种子")
+    parser.add_argument("--output", default="benchmark.json", help="结果文件的路径")
+    parser.add_argument("--list", action="store_true", help="列出所有场景")
+    parser.add_argument("--worker", metavar="SCENARIO", help=argparse.SUPPRESS)
+    parser.add_argument("--no-memory", action="store_true", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.list:
+        for one in SCENARIOS.values():
+            print(f"{one.name:<20}{one.game:<12}{one.description}")
+    elif arguments.worker:
+        # 由run_suite启动的子进程：只运行一个场景，把结果作为一行JSON输出
+        print(json.dumps(run_scenario(arguments.worker, arguments.ticks, arguments.warmup, arguments.seed,
+                                      memory=not arguments.no_memory)))
+    else:
+        suite = run_suite(arguments.scenarios, arguments.ticks, arguments.warmup, arguments.seed)
+        write_results(arguments.output, suite, arguments.ticks, arguments.warmup, arguments.seed)
+        for scenario_name, result in suite.items():
+            rss = result["max_rss_bytes"]
+            print(f"{scenario_name:<20}{result['ticks_per_second']:>8.0f} ticks/s {result['ms_per_tick']:>7.2f} ms/tick "
+                  f"{result['alloc_bytes_per_tick'] / 1024:>8.1f} KiB/tick {result['blocks_per_tick']:>+7.2f} blocks/tick "
+                  f"peak {result['peak_traced_bytes'] / 2 ** 20:>6.1f} MiB "
+                  f"rss {'-' if rss is None else f'{rss / 2 ** 20:.0f}'} MiB  ({result['sprites']} sprites)")
+        print(f"results written to {arguments.output}")
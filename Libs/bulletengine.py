@@ -0,0 +1,348 @@
+import math
+
+import numpy as np
+
+from Libs.compat import ARCADE_INTERNALS
+from Libs.pool import PooledSprite
+
+
+__all__ = ["BulletEngine", "ManagedBullet", "CHASE_CODES"]
+
+
+# 子弹的追踪方式在数组中的编码，与游戏中NO/SIMPLE/HARD三个常量的取值一一对应
+CHASE_CODES = {"no": 0, "simple": 1, "hard": 2}
+HARD_CODE = CHASE_CODES["hard"]
+
+
+class ManagedBullet(PooledSprite):
+    """
+    可以交给BulletEngine统一推进的子弹
+    子弹被销毁（无论是击中目标还是被其他代码kill）时会自动从所属的引擎中移除，再回到对象池
+    """
+    # 为True时引擎不会用数组推进这颗子弹，而是每帧调用它自己的on_update，用于需要逐帧转向的子弹
+    scripted = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.engine = None
+        self.engine_index = None
+        ManagedBullet.reset(self)
+
+    def reset(self):
+        super().reset()
+        # 子弹跟随的目标（通常是玩家），目标死亡时子弹一同消失
+        self.player = None
+        # 发射这颗子弹的敌人，敌人被击败时会清除自己的子弹
+        self.owner = None
+        self.damage = 1
+        self.chase = "no"
+        self.chase_time = math.inf
+        # 强追踪时的速度大小，以及每秒最多转过的角度（单位为度），inf：每帧直接对准目标
+        self.speed = 0
+        self.turn_rate = math.inf
+        # 子弹剩余的存活时间，单位为秒。inf：只会在飞出屏幕时消失
+        self.life_time = math.inf
+
+    def cull_box(self, width, height):
+        """
+        子弹中心允许存在的范围，超出该范围的子弹会被销毁。默认在子弹完全飞出屏幕时销毁
+        :param width: 屏幕的宽
+        :param height: 屏幕的高
+        :return: (最小x, 最大x, 最小y, 最大y)
+        """
+        half_width = self.width / 2
+        half_height = self.height / 2
+        return -half_width, width + half_width, -half_height, height + half_height
+
+    def remove_from_sprite_lists(self):
+        if self.engine is not None:
+            self.engine.remove(self)
+        super().remove_from_sprite_lists()
+
+
+class BulletEngine:
+    """
+    以结构数组的方式存储一个子弹层的运动状态：位置、速度、伤害、追踪方式、存活时间各自是一个NumPy数组，
+    每一帧用一次向量化运算推进整层子弹（包括强追踪子弹的转向），并用掩码一次性找出飞出屏幕或到期的子弹，
+    省去了每颗子弹各自调用on_update、计算碰撞盒求left/right/top/bottom的开销。
+    精灵本身仍然留在场景的精灵列表中，负责绘制和碰撞检测，引擎只在每帧结束时把新位置写回精灵。
+    强追踪子弹的朝向直接写入精灵列表交给GPU的角度缓冲，因此记录了每颗子弹所在的精灵列表
+    """
+
+    def __init__(self, width, height, capacity=256):
+        """
+        :param width: 屏幕的宽
+        :param height: 屏幕的高
+        :param capacity: 数组的初始容量，不够时会自动翻倍
+        """
+        self.width = width
+        self.height = height
+        self.count = 0
+        self.x = np.empty(capacity)
+        self.y = np.empty(capacity)
+        self.vx = np.empty(capacity)
+        self.vy = np.empty(capacity)
+        self.damage = np.empty(capacity)
+        self.chase = np.empty(capacity, dtype=np.int8)
+        self.chase_time = np.empty(capacity)
+        self.speed = np.empty(capacity)
+        self.turn_rate = np.empty(capacity)
+        self.life_time = np.empty(capacity)
+        # 每行为一颗子弹中心允许存在的范围：最小x，最大x，最小y，最大y
+        self.bounds = np.empty((capacity, 4))
+        # 每颗子弹的目标在self._targets中的编号，-1表示没有目标
+        self.target = np.empty(capacity, dtype=np.int32)
+        # 每颗子弹所在的精灵列表在self._layers中的编号，-1表示不在（唯一的）精灵列表中
+        self.layer = np.empty(capacity, dtype=np.int32)
+        self.sprites = [None] * capacity
+        self._targets = []
+        self._target_codes = {}
+        self._layers = []
+        self._layer_codes = {}
+        # 自己推进自己的子弹，用字典代替集合以保持加入的顺序
+        self.scripted = {}
+
+    def __len__(self):
+        return self.count + len(self.scripted)
+
+    @property
+    def capacity(self):
+        return len(self.sprites)
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        for name in ("x", "y", "vx", "vy", "damage", "chase", "chase_time", "speed", "turn_rate", "life_time",
+                     "target", "layer"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        bounds = np.empty((capacity, 4))
+        bounds[:self.count] = self.bounds[:self.count]
+        self.bounds = bounds
+        self.sprites.extend([None] * (capacity - len(self.sprites)))
+
+    def _target_code(self, target):
+        if target is None:
+            return -1
+        code = self._target_codes.get(id(target))
+        if code is None:
+            code = self._target_codes[id(target)] = len(self._targets)
+            self._targets.append(target)
+        return code
+
+    def _layer_code(self, sprite):
+        if len(sprite.sprite_lists) != 1:
+            return -1
+        sprite_list = sprite.sprite_lists[0]
+        code = self._layer_codes.get(id(sprite_list))
+        if code is None:
+            code = self._layer_codes[id(sprite_list)] = len(self._layers)
+            self._layers.append(sprite_list)
+        return code
+
+    def add(self, sprite: ManagedBullet):
+        """
+        把一颗子弹交给引擎推进。子弹应当先被加入场景中对应的精灵列表
+        :param sprite: 子弹
+        :return: None
+        """
+        sprite.engine = self
+        if sprite.scripted:
+            sprite.engine_index = None
+            self.scripted[sprite] = None
+            return
+        if self.count == self.capacity:
+            self._grow()
+        index = self.count
+        self.x[index] = sprite.center_x
+        self.y[index] = sprite.center_y
+        self.vx[index] = sprite.change_x
+        self.vy[index] = sprite.change_y
+        self.damage[index] = sprite.damage
+        self.chase[index] = CHASE_CODES.get(sprite.chase, 0)
+        self.chase_time[index] = sprite.chase_time
+        self.speed[index] = sprite.speed
+        self.turn_rate[index] = sprite.turn_rate
+        self.life_time[index] = sprite.life_time
+        self.bounds[index] = sprite.cull_box(self.width, self.height)
+        self.target[index] = self._target_code(sprite.player)
+        self.layer[index] = self._layer_code(sprite)
+        self.sprites[index] = sprite
+        sprite.engine_index = index
+        self.count += 1
+
+    def add_many(self, sprites, x, y, vx, vy):
+        """
+        一次性把一批子弹交给引擎推进，位置与速度直接从数组中复制，用于弹幕发射器的齐射
+        :param sprites: 子弹的列表，应当先被加入场景中对应的精灵列表
+        :param x: 子弹位置的x坐标，NumPy数组，长度与sprites相同
+        :param y: 同上，y坐标
+        :param vx: 子弹速度的x分量
+        :param vy: 子弹速度的y分量
+        :return: None
+        """
+        if not sprites:
+            return
+        if any(sprite.scripted for sprite in sprites):
+            # 需要自己推进的子弹不进入数组，逐个加入
+            for sprite in sprites:
+                self.add(sprite)
+            return
+        count = len(sprites)
+        while self.count + count > self.capacity:
+            self._grow()
+        start = self.count
+        end = start + count
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end] = vx
+        self.vy[start:end] = vy
+        self.damage[start:end] = [sprite.damage for sprite in sprites]
+        self.chase[start:end] = [CHASE_CODES.get(sprite.chase, 0) for sprite in sprites]
+        self.chase_time[start:end] = [sprite.chase_time for sprite in sprites]
+        self.speed[start:end] = [sprite.speed for sprite in sprites]
+        self.turn_rate[start:end] = [sprite.turn_rate for sprite in sprites]
+        self.life_time[start:end] = [sprite.life_time for sprite in sprites]
+        self.bounds[start:end] = [sprite.cull_box(self.width, self.height) for sprite in sprites]
+        self.target[start:end] = [self._target_code(sprite.player) for sprite in sprites]
+        self.layer[start:end] = [self._layer_code(sprite) for sprite in sprites]
+        self.sprites[start:end] = sprites
+        for index, sprite in enumerate(sprites, start):
+            sprite.engine = self
+            sprite.engine_index = index
+        self.count = end
+
+    def remove(self, sprite: ManagedBullet):
+        """
+        从引擎中移除一颗子弹。数组中最后一颗子弹会被移到空出的位置，因此移除的代价与子弹数量无关
+        :param sprite: 子弹
+        :return: None
+        """
+        if sprite.engine is not self:
+            return
+        sprite.engine = None
+        if sprite.engine_index is None:
+            self.scripted.pop(sprite, None)
+            return
+        index = sprite.engine_index
+        last = self.count - 1
+        if index != last:
+            for array in (self.x, self.y, self.vx, self.vy, self.damage, self.chase, self.chase_time, self.speed,
+                          self.turn_rate, self.life_time, self.target, self.layer, self.bounds):
+                array[index] = array[last]
+            moved = self.sprites[last]
+            moved.engine_index = index
+            self.sprites[index] = moved
+        self.sprites[last] = None
+        sprite.engine_index = None
+        self.count = last
+        if self.count == 0 and not self.scripted:
+            self._targets.clear()
+            self._target_codes.clear()
+            self._layers.clear()
+            self._layer_codes.clear()
+
+    def clear(self):
+        """
+        销毁引擎中的所有子弹
+        :return: None
+        """
+        for sprite in self.sprites[:self.count] + list(self.scripted):
+            sprite.kill()
+
+    def _steer(self, homing, delta_time):
+        """
+        让强追踪的子弹一次性转向各自的目标：计算朝向、按最大转向速度限制转过的角度，重新计算速度，
+        最后把新的朝向一次性写入精灵列表的角度缓冲
+        :param homing: 需要转向的子弹的下标
+        :param delta_time: 距离上一帧的时间
+        :return: None
+        """
+        targets = np.array([(target.center_x, target.center_y) for target in self._targets])[self.target[homing]]
+        x = self.x[homing]
+        y = self.y[homing]
+        vx = self.vx[homing]
+        vy = self.vy[homing]
+        heading = np.arctan2(targets[:, 1] - y, targets[:, 0] - x)
+
+        turn_rate = self.turn_rate[homing]
+        limited = np.isfinite(turn_rate) & ((vx != 0) | (vy != 0))
+        if limited.any():
+            # 当前朝向与目标方向的夹角，规范到[-pi, pi)，每帧最多转过turn_rate * delta_time
+            current = np.arctan2(vy, vx)
+            max_turn = np.radians(turn_rate) * delta_time
+            turn = np.clip((heading - current + np.pi) % (2 * np.pi) - np.pi, -max_turn, max_turn)
+            heading = np.where(limited, current + turn, heading)
+
+        speed = self.speed[homing]
+        self.vx[homing] = np.cos(heading) * speed
+        self.vy[homing] = np.sin(heading) * speed
+        angles = np.degrees(heading) - 90
+        sprites = [self.sprites[index] for index in homing.tolist()]
+        if ARCADE_INTERNALS:
+            layers = self.layer[homing]
+            for code, sprite_list in enumerate(self._layers):
+                in_layer = np.flatnonzero(layers == code)
+                if not len(in_layer):
+                    continue
+                # 精灵列表会在__setitem__等操作中重新分配位置槽，甚至不经过引擎就换掉子弹，
+                # 因此每帧重新读取子弹所在的槽，而不是在加入时记下；已经不在列表中的子弹退回角度的setter
+                sprite_slot = sprite_list.sprite_slot
+                slots = np.array([sprite_slot.get(sprites[index], -1) for index in in_layer.tolist()])
+                present = slots >= 0
+                layers[in_layer[~present]] = -1
+                # 与Interpolator写位置缓冲相同，直接得到角度缓冲（每个槽一个float）的NumPy视图
+                angle_data = np.frombuffer(sprite_list._sprite_angle_data, dtype=np.float32)
+                angle_data[slots[present]] = angles[in_layer[present]]
+                sprite_list._sprite_angle_changed = True
+            layers = layers.tolist()
+        else:
+            # 其他版本的arcade中不直接写角度缓冲，全部经过角度的setter
+            layers = [-1] * len(sprites)
+        # 碰撞检测按精灵的_angle旋转碰撞盒，因此精灵上的角度仍需同步。这里只是普通的属性赋值并清除缓存的碰撞盒，
+        # 不会经过角度的setter逐个更新精灵列表
+        for sprite, angle, code in zip(sprites, angles.tolist(), layers):
+            if code < 0:
+                sprite.angle = angle
+            else:
+                sprite._angle = angle
+                sprite._point_list_cache = None
+
+    def step(self, delta_time):
+        """
+        推进所有子弹一帧：强追踪的子弹转向目标，移动、销毁出界/到期/目标已死亡的子弹，并把位置写回精灵
+        :param delta_time: 距离上一帧的时间
+        :return: None
+        """
+        for sprite in list(self.scripted):
+            sprite.on_update(delta_time)
+
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        chase_time = self.chase_time[:n]
+        chase_time -= delta_time
+        homing = np.flatnonzero((self.chase[:n] == HARD_CODE) & (chase_time > 0))
+        if len(homing):
+            self._steer(homing, delta_time)
+        x += self.vx[:n] * delta_time
+        y += self.vy[:n] * delta_time
+        life_time = self.life_time[:n]
+        life_time -= delta_time
+
+        bounds = self.bounds[:n]
+        dead = (x < bounds[:, 0]) | (x > bounds[:, 1]) | (y < bounds[:, 2]) | (y > bounds[:, 3]) | (life_time <= 0)
+        dead_targets = [code for code, target in enumerate(self._targets) if target.health <= 0]
+        if dead_targets:
+            dead |= np.isin(self.target[:n], dead_targets)
+
+        # 从后往前销毁：被移到空位上的总是更靠后的、已经检查过的子弹
+        for index in np.flatnonzero(dead)[::-1].tolist():
+            self.sprites[index].kill()
+
+        n = self.count
+        for sprite, new_x, new_y in zip(self.sprites[:n], self.x[:n].tolist(), self.y[:n].tolist()):
+            sprite.position = (new_x, new_y)
@@ -2,6 +2,7 @@ import random
 
 from pyglet.clock import Clock
 from functools import wraps
+from Libs.tracing import TRACER
 import arcade
 import time
 
@@ -32,13 +33,141 @@ class BadClock:
         self.time_passed += time_passed
 
 
+class _TracedCallback:
+    """
+    记录一次时钟回调耗时的包装。与被包装的函数比较时相等，回调在执行中unschedule自己也能正常找到
+    """
+
+    def __init__(self, func, category):
+        self.func = func
+        self.category = category
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            TRACER.complete(getattr(self.func, "__qualname__", repr(self.func)), self.category, start,
+                            time.perf_counter() - start)
+
+    def __eq__(self, other):
+        if isinstance(other, _TracedCallback):
+            other = other.func
+        return self.func == other
+
+    def __hash__(self):
+        return hash(self.func)
+
+
 class GameClock(Clock):
     """
     用于计算和限制帧率的类
 
-    也可以用来定期地调用函数。添加了对于“在x秒内每y秒调用一个函数‘的支持
+    也可以用来定期地调用函数。添加了对于“在x秒内每y秒调用一个函数‘的支持，
+    以及按键（key）去重的一次性调用：同一个键同时只会有一次调用在等待
     """
 
+    def __init__(self, *args, name="clock", **kwargs):
+        """
+        :param name: 时钟的名字，用作trace中这个时钟所有回调的类别
+        其余参数与pyglet.clock.Clock相同
+        """
+        super().__init__(*args, **kwargs)
+        self.name = name
+        # 键：[预定的调用时间, 函数, args, kwargs, 规划时的时间, 实际放进调度队列的函数]
+        self._keyed = {}
+        # 因为同一个键已经在等待而被合并掉的调用次数
+        self.coalesced = 0
+
+    def call_scheduled_functions(self, dt):
+        if not TRACER.enabled:
+            return super().call_scheduled_functions(dt)
+        # 记录trace时，在这一次调用期间把队列中的每个函数换成记录耗时的包装，结束后再换回来
+        items = self._schedule_items + self._schedule_interval_items
+        for item in items:
+            item.func = _TracedCallback(item.func, self.name)
+        try:
+            return super().call_scheduled_functions(dt)
+        finally:
+            for item in items:
+                if isinstance(item.func, _TracedCallback):
+                    item.func = item.func.func
+
+    @property
+    def queue_depth(self):
+        """
+        :return: 调度队列中的项目数量，包括每帧调用的函数与等待中的定时调用
+        （被unschedule的定时调用要到原定的时间才会真正离开队列，也计算在内）
+        """
+        return len(self._schedule_items) + len(self._schedule_interval_items)
+
+    def is_pending(self, key):
+        """
+        :param key: schedule_once_keyed使用的键
+        :return: 这个键是否有调用正在等待
+        """
+        return key in self._keyed
+
+    def schedule_once_keyed(self, key, func, delay, *args, **kwargs):
+        """
+        delay秒之后调用一次函数func。如果同一个键已经有调用在等待，什么都不做，原来的调用时间不变。
+        适合在每一帧中都可能被调用的地方，比如“场上有补给品时展示教程”：不论调用多少次，只会展示一次
+        函数func的参数要求与clock.schedule_once的要求一致
+        :param key: 任意可以作为字典键的值，比如字符串或者(对象, 名称)
+        :param func: 需要调用的函数
+        :param delay: 延时，单位为秒
+        :return: 是否真的规划了一次新的调用
+        """
+        if key in self._keyed:
+            self.coalesced += 1
+            return False
+        self._schedule_keyed(key, func, delay, args, kwargs)
+        return True
+
+    def reschedule_once_keyed(self, key, func, delay, *args, **kwargs):
+        """
+        与schedule_once_keyed基本相同，但同一个键已经有调用在等待时，改为从现在起delay秒后调用新的func。
+        适合“最后一次触发的若干秒后恢复原状”的情况，比如受伤后0.5秒换回原来的图片。
+        调度队列中仍然只有一项，不会随着调用次数增加
+        :param key: 任意可以作为字典键的值
+        :param func: 需要调用的函数
+        :param delay: 延时，单位为秒
+        :return: None
+        """
+        entry = self._keyed.get(key)
+        if entry is None:
+            self._schedule_keyed(key, func, delay, args, kwargs)
+            return
+        self.coalesced += 1
+        now = self._get_nearest_ts()
+        # 已经在队列中的那一项到时间后会发现还没到新的调用时间，再按剩下的时间重新放进队列
+        entry[:5] = [now + delay, func, args, kwargs, now]
+
+    def unschedule_keyed(self, key):
+        """
+        取消某个键正在等待的调用。没有时什么都不做
+        :param key: 规划时使用的键
+        :return: None
+        """
+        entry = self._keyed.pop(key, None)
+        if entry is not None:
+            self.unschedule(entry[5])
+
+    def _schedule_keyed(self, key, func, delay, args, kwargs):
+        now = self._get_nearest_ts()
+
+        def fire(_):
+            entry = self._keyed[key]
+            remaining = entry[0] - self.last_ts
+            if remaining > 0:
+                self.schedule_once(fire, remaining)
+                return
+            del self._keyed[key]
+            entry[1](self.last_ts - entry[4], *entry[2], **entry[3])
+
+        self._keyed[key] = [now + delay, func, args, kwargs, now, fire]
+        self.schedule_once(fire, delay)
+
     def schedule_interval_until(self, end_time, interval):
         """
         每间隔interval秒调用一个函数func，直到end_time秒之后结束
@@ -0,0 +1,117 @@
+from collections import namedtuple
+
+
+__all__ = ["CollisionMatrix", "CollisionPair"]
+
+
+class CollisionPair(namedtuple("CollisionPair", ["first", "second", "handler", "grid", "when", "name"])):
+    """
+    需要检测碰撞的一对层
+    first: 逐个检查的层名
+    second: 与first中每个精灵检测碰撞的层名
+    handler: 处理函数，参数为(first中的精灵, second中与它碰撞的精灵)。返回True时不再处理这个精灵剩下的碰撞
+    grid: 用来加速second层查询的SpatialGrid，None：直接使用arcade的collides_with_list
+    when: 返回是否需要检查这一对层的函数，None：总是检查
+    name: 这一对层的名字，用于性能统计
+    """
+
+
+class CollisionMatrix:
+    """
+    声明式的碰撞矩阵：只有登记过的层之间才会检测碰撞，每一对层有自己的处理函数。
+    每一帧调用check，按登记的顺序依次检查每一对层，检测与处理碰撞的代码都不需要判断精灵的类型
+    """
+
+    def __init__(self, scene, is_dead=None):
+        """
+        :param scene: 存放各层精灵的arcade.Scene
+        :param is_dead: 判断精灵是否已经被销毁的函数，比如RemovalQueue.is_dead。
+        已经被销毁的精灵不再参与碰撞。None：不在任何精灵列表中的精灵视为已销毁
+        """
+        self.scene = scene
+        self.is_dead = is_dead if is_dead is not None else lambda sprite: not sprite.sprite_lists
+        self.pairs = []
+        # 层名：返回该层中需要参与碰撞的精灵的函数，用于覆盖scene中的同名层
+        self._bound = {}
+
+    def bind(self, name, sprites):
+        """
+        指定一个层名实际参与碰撞的精灵。
+        比如Player层中还有尾焰、护盾光晕等特效，真正需要检测碰撞的只有玩家的飞机本身
+        :param name: 层名
+        :param sprites: 无参数的函数，返回参与碰撞的精灵
+        :return: None
+        """
+        self._bound[name] = sprites
+
+    def sprites(self, name):
+        """
+        :param name: 层名
+        :return: 该层中参与碰撞的精灵
+        """
+        sprites = self._bound.get(name)
+        if sprites is not None:
+            return sprites()
+        return self.scene[name]
+
+    def add(self, first, second, handler, grid=None, when=None, name=None):
+        """
+        登记需要检测碰撞的一对层
+        :param first: 逐个检查的层名
+        :param second: 与first中每个精灵检测碰撞的层名
+        :param handler: 处理函数，见CollisionPair
+        :param grid: SpatialGrid，second层中精灵较多（比如子弹）时使用
+        :param when: 返回是否需要检查这一对层的函数
+        :param name: 这一对层的名字，默认为“first/second”
+        :return: CollisionPair
+        """
+        pair = CollisionPair(first, second, handler, grid, when, name or f"{first}/{second}")
+        self.pairs.append(pair)
+        return pair
+
+    def check_pair(self, pair):
+        """
+        检查一对层的碰撞
+        :param pair: CollisionPair
+        :return: None
+        """
+        if pair.when is not None and not pair.when():
+            return
+        handler = pair.handler
+        grid = pair.grid
+        is_dead = self.is_dead
+        if grid is None:
+            others = self.sprites(pair.second)
+            for one in self.sprites(pair.first):
+                if is_dead(one):
+                    continue
+                for other in one.collides_with_list(others):
+                    if is_dead(other):
+                        continue
+                    if handler(one, other):
+                        break
+        else:
+            grid.rebuild(self.sprites(pair.second))
+            for one in self.sprites(pair.first):
+                if is_dead(one):
+                    continue
+                for other in grid.collides_with(one):
+                    if is_dead(other):
+                        continue
+                    stop = handler(one, other)
+                    if is_dead(other):
+                        # 已经被销毁的精灵不能再与其他精灵碰撞
+                        grid.remove(other)
+                    if stop:
+                        break
+
+    def check(self, lap=None):
+        """
+        按登记的顺序检查所有层的碰撞
+        :param lap: 每检查完一对层后调用，参数为这对层的名字，比如FrameProfiler.lap
+        :return: None
+        """
+        for pair in self.pairs:
+            self.check_pair(pair)
+            if lap is not None:
+                lap(pair.name)
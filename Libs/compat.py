@@ -0,0 +1,10 @@
+import arcade
+
+
+__all__ = ["ARCADE_INTERNALS"]
+
+
+# 为了省去逐个精灵、逐帧调用的开销，Libs中的一些模块直接读写arcade 2.6的私有状态，比如精灵列表的位置槽与缓冲。
+# 这些状态不属于arcade的公开接口，其他版本中可能改名或者改变含义，写错了也不会报错，只会让画面错乱。
+# 因此只在arcade 2.6中使用这些捷径，其余版本退回公开接口
+ARCADE_INTERNALS = arcade.version.VERSION.startswith("2.6.")
@@ -0,0 +1,168 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+__all__ = ["Volley", "ring", "spread", "spiral", "aimed", "fan", "predictive", "concat", "acquire_volley"]
+
+
+class Volley(namedtuple("Volley", ["x", "y", "vx", "vy"])):
+    """
+    一次齐射中所有子弹的初始状态，每一项都是长度相同的NumPy数组
+    x, y: 子弹的初始位置
+    vx, vy: 子弹的速度，单位为像素/秒
+    """
+
+    @property
+    def count(self):
+        """
+        :return: 子弹的数量
+        """
+        return len(self.x)
+
+    @property
+    def angles(self):
+        """
+        :return: 每颗子弹图片需要旋转的角度。子弹图片默认朝上，与游戏中其他子弹的计算方式相同
+        """
+        return np.degrees(np.arctan2(self.vy, self.vx)) - 90
+
+
+def _origins(center, count=None):
+    # 把一个位置(x, y)或者若干位置[(x, y), ...]统一为两个数组；只有一个位置时按需要重复count次
+    origins = np.atleast_2d(np.asarray(center, dtype=float))
+    x = origins[:, 0]
+    y = origins[:, 1]
+    if count is not None and len(x) == 1:
+        x = np.repeat(x, count)
+        y = np.repeat(y, count)
+    return x, y
+
+
+def _from_directions(x, y, directions, speed):
+    # directions为弧度
+    return Volley(x, y, np.cos(directions) * speed, np.sin(directions) * speed)
+
+
+def ring(center, count, speed, phase=0):
+    """
+    环形弹幕：count颗子弹从同一点向四周均匀散开
+    :param center: 发射位置(x, y)
+    :param count: 子弹数量
+    :param speed: 子弹速度
+    :param phase: 第一颗子弹的方向，单位为度，0为向右，逆时针为正
+    :return: Volley
+    """
+    directions = np.radians(phase + np.arange(count) * (360 / count))
+    x, y = _origins(center, count)
+    return _from_directions(x, y, directions, speed)
+
+
+def spread(center, count, speed, direction=-90, arc=60):
+    """
+    扇形弹幕：count颗子弹均匀分布在以direction为中心、张角为arc的扇形中
+    :param center: 发射位置(x, y)
+    :param count: 子弹数量
+    :param speed: 子弹速度
+    :param direction: 扇形中心的方向，单位为度，默认竖直向下
+    :param arc: 扇形的张角，单位为度。只有一颗子弹时直接朝向direction
+    :return: Volley
+    """
+    directions = np.asarray(direction, dtype=float)
+    if count > 1:
+        directions = directions + np.linspace(-arc / 2, arc / 2, count)
+    else:
+        directions = np.full(count, directions)
+    x, y = _origins(center, count)
+    return _from_directions(x, y, np.radians(directions), speed)
+
+
+def spiral(center, arms, speed, elapsed, angular_speed=90, phase=0):
+    """
+    螺旋弹幕中的一次齐射：arms条旋臂各一颗子弹，整个环形随时间转动。
+    在时间线脚本中每隔一段时间调用一次，传入技能开始以来的时间，连起来就是螺旋
+    :param center: 发射位置(x, y)
+    :param arms: 旋臂数量
+    :param speed: 子弹速度
+    :param elapsed: 技能开始以来的时间，单位为秒
+    :param angular_speed: 转动的速度，单位为度/秒
+    :param phase: 初始方向，单位为度
+    :return: Volley
+    """
+    return ring(center, arms, speed, phase + angular_speed * elapsed)
+
+
+def aimed(origins, target, speed):
+    """
+    瞄准弹：每个发射位置各发射一颗子弹，朝向目标当前的位置
+    :param origins: 发射位置(x, y)或者若干发射位置[(x, y), ...]
+    :param target: 目标位置(x, y)
+    :param speed: 子弹速度
+    :return: Volley
+    """
+    x, y = _origins(origins)
+    directions = np.arctan2(target[1] - y, target[0] - x)
+    return _from_directions(x, y, directions, speed)
+
+
+def fan(center, target, count, speed, arc=30):
+    """
+    瞄准的扇形弹幕：扇形的中心对准目标
+    :param center: 发射位置(x, y)
+    :param target: 目标位置(x, y)
+    :param count: 子弹数量
+    :param speed: 子弹速度
+    :param arc: 扇形的张角，单位为度
+    :return: Volley
+    """
+    direction = np.degrees(np.arctan2(target[1] - center[1], target[0] - center[0]))
+    return spread(center, count, speed, direction, arc)
+
+
+def predictive(origins, target, target_velocity, speed, bounds=None):
+    """
+    预判弹：假设目标保持当前的速度移动，朝向子弹飞到时目标所在的位置
+    :param origins: 发射位置(x, y)或者若干发射位置[(x, y), ...]
+    :param target: 目标位置(x, y)
+    :param target_velocity: 目标的速度(vx, vy)
+    :param speed: 子弹速度
+    :param bounds: 预判位置的范围(宽, 高)，超出时限制在范围之内。None：不限制
+    :return: Volley
+    """
+    x, y = _origins(origins)
+    flight_time = np.hypot(x - target[0], y - target[1]) / speed
+    next_x = target[0] + target_velocity[0] * flight_time
+    next_y = target[1] + target_velocity[1] * flight_time
+    if bounds is not None:
+        np.clip(next_x, 0, bounds[0], out=next_x)
+        np.clip(next_y, 0, bounds[1], out=next_y)
+    directions = np.arctan2(next_y - y, next_x - x)
+    return _from_directions(x, y, directions, speed)
+
+
+def concat(*volleys):
+    """
+    把几次齐射合并为一次，子弹的先后顺序保持不变
+    :return: Volley
+    """
+    return Volley(*(np.concatenate(arrays) for arrays in zip(*volleys)))
+
+
+def acquire_volley(pool, volley, *args, **kwargs):
+    """
+    从对象池中取出一次齐射所需的所有子弹，并设置好位置、速度与朝向
+    :param pool: 子弹的对象池
+    :param volley: Volley
+    :param args: 传给pool.acquire的其余参数（位置之后的参数），比如图片
+    :param kwargs: 同上
+    :return: 子弹的列表，顺序与volley相同
+    """
+    sprites = []
+    for x, y, vx, vy, angle in zip(volley.x.tolist(), volley.y.tolist(), volley.vx.tolist(), volley.vy.tolist(),
+                                   volley.angles.tolist()):
+        sprite = pool.acquire((x, y), *args, **kwargs)
+        sprite.change_x = vx
+        sprite.change_y = vy
+        sprite.angle = angle
+        sprites.append(sprite)
+    return sprites
@@ -0,0 +1,41 @@
+__all__ = ["Signal"]
+
+
+class Signal:
+    """
+    一个可以被订阅的事件，比如“得分改变”“血量改变”。
+    事件发生时按订阅的先后顺序调用所有订阅者；没有订阅者时emit几乎没有开销，无窗口模式下也可以放心使用
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._listeners)
+
+    def connect(self, listener):
+        """
+        订阅事件
+        :param listener: 事件发生时调用的函数，参数与emit的参数相同
+        :return: listener，方便作为装饰器使用
+        """
+        self._listeners.append(listener)
+        return listener
+
+    def disconnect(self, listener):
+        """
+        取消订阅。没有订阅过时什么都不做
+        :param listener: 订阅时传入的函数
+        :return: None
+        """
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def emit(self, *args):
+        """
+        通知所有订阅者
+        :param args: 传给订阅者的参数
+        :return: None
+        """
+        for listener in tuple(self._listeners):
+            listener(*args)
@@ -0,0 +1,156 @@
+import numpy as np
+
+from Libs.compat import ARCADE_INTERNALS
+
+
+__all__ = ["FixedTimestep", "Interpolator"]
+
+
+class FixedTimestep:
+    """
+    固定步长的时间累加器。
+    每一帧把实际经过的时间加进累加器，再按固定的步长取出若干步交给游戏逻辑，
+    这样不论帧率高低、是否卡顿，每一步推进的时间都相同，快速移动的子弹也不会因为一步走得太远而穿过敌人。
+    每帧最多推进max_steps步，卡顿太久时丢弃多出的时间（游戏会短暂变慢），避免越卡越需要计算、越计算越卡
+    """
+
+    def __init__(self, step=1 / 60, max_steps=5):
+        """
+        :param step: 每一步推进的时间，单位为秒
+        :param max_steps: 每帧最多推进的步数
+        """
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0
+        # 上一帧推进的步数，以及开始运行以来因为超过步数上限而丢弃的时间
+        self.last_steps = 0
+        self.dropped = 0
+
+    @property
+    def alpha(self):
+        """
+        :return: 累加器中剩下的、不足一步的时间占一步的比例，用于在两步之间插值绘制
+        """
+        return min(self.accumulator / self.step, 1)
+
+    def advance(self, frame_time):
+        """
+        把一帧经过的时间加进累加器
+        :param frame_time: 距离上一帧的时间，单位为秒
+        :return: 这一帧需要推进的步数
+        """
+        self.accumulator += frame_time
+        # 容许一点浮点误差，否则恰好一步的帧时间可能因为误差被算成不足一步
+        steps = int(self.accumulator / self.step + 1e-6)
+        if steps > self.max_steps:
+            self.dropped += (steps - self.max_steps) * self.step
+            self.accumulator -= (steps - self.max_steps) * self.step
+            steps = self.max_steps
+        self.accumulator = max(self.accumulator - steps * self.step, 0)
+        self.last_steps = steps
+        return steps
+
+    def reset(self):
+        """
+        清空累加器，比如暂停结束时，不需要补上暂停期间的时间
+        :return: None
+        """
+        self.accumulator = 0
+
+
+class Interpolator:
+    """
+    在两次逻辑步之间插值绘制精灵。
+    逻辑按固定步长推进时，绘制的时刻通常落在两步之间，直接画出最新的位置会让移动看起来一顿一顿的。
+    这里在最后一步之前记录各精灵列表的位置缓冲，绘制前把位置改为上一步与这一步之间按alpha插值的位置，
+    画完再改回来。整个过程直接操作arcade.SpriteList交给GPU的位置缓冲，不会改动精灵本身的位置与碰撞盒。
+    位置缓冲是arcade 2.6的私有状态，其他版本的arcade中不做插值，直接画出最新的位置
+    """
+
+    def __init__(self, max_distance=100):
+        """
+        :param max_distance: 一步中移动超过这个距离的精灵视为瞬移（比如从对象池中取出重新使用），不做插值
+        """
+        self.max_distance = max_distance
+        # 精灵列表：(位置缓冲的副本, 记录时的精灵, 它们各自所在的位置槽)
+        self._snapshots = {}
+        # 绘制期间被改动的精灵列表：原本的位置缓冲
+        self._saved = {}
+
+    @staticmethod
+    def _positions(sprite_list):
+        # 位置缓冲是每个槽两个float的array，这里直接得到它的NumPy视图
+        return np.frombuffer(sprite_list._sprite_pos_data, dtype=np.float32)
+
+    @staticmethod
+    def _slots(sprite_list):
+        # arcade保证索引缓冲（绘制顺序）与sprite_list一一对应，前len(sprite_list)项就是每个精灵所在的位置槽
+        return np.frombuffer(sprite_list._sprite_index_data, dtype=np.uint32)[:len(sprite_list.sprite_list)].copy()
+
+    def snapshot(self, sprite_lists):
+        """
+        记录精灵列表当前的位置，在每帧最后一次逻辑步之前调用。空的精灵列表不需要插值，不会被记录
+        :param sprite_lists: 需要插值的精灵列表，比如Scene.sprite_lists
+        :return: None
+        """
+        if not ARCADE_INTERNALS:
+            self._snapshots = {}
+            return
+        # 精灵的列表只是复制引用，不需要对每个精灵执行Python代码
+        self._snapshots = {sprite_list: (self._positions(sprite_list).copy(), sprite_list.sprite_list[:],
+                                         self._slots(sprite_list))
+                           for sprite_list in sprite_lists if sprite_list.sprite_list}
+
+    def apply(self, alpha):
+        """
+        把位置缓冲改为插值后的位置，绘制完成后需要调用restore
+        :param alpha: 插值比例，0为上一步的位置，1为最新的位置
+        :return: None
+        """
+        if alpha >= 1:
+            return
+        for sprite_list, (previous, previous_sprites, previous_slots) in self._snapshots.items():
+            if not sprite_list.sprite_list:
+                continue
+            positions = self._positions(sprite_list)
+            current = positions.reshape(-1, 2)
+            previous = previous.reshape(-1, 2)
+            # 只插值记录时就在同一个槽中的精灵，新加入或换了槽的精灵直接画在最新的位置。
+            # 大多数列表在一步中没有增减精灵，比较两个列表（逐个比较引用，在C中完成）就能确定所有槽都没有变化
+            sprites = sprite_list.sprite_list
+            same = self._slots(sprite_list)
+            if sprites != previous_sprites or not np.array_equal(same, previous_slots):
+                # 记录时每个槽中的精灵，与现在槽中的精灵逐个比较。记录之后位置缓冲可能扩容过，新的槽不在记录中
+                occupants = np.empty(len(previous), dtype=object)
+                occupants[previous_slots] = np.fromiter(previous_sprites, dtype=object, count=len(previous_sprites))
+                recorded = same < len(previous)
+                same = same[recorded]
+                sprites = np.fromiter(sprites, dtype=object, count=len(sprites))[recorded]
+                same = same[np.equal(sprites, occupants[same], dtype=bool)]
+                if not len(same):
+                    continue
+            moved = current[same] - previous[same]
+            keep = (np.hypot(moved[:, 0], moved[:, 1]) <= self.max_distance) & moved.any(axis=1)
+            if not keep.any():
+                # 这个列表中没有需要插值的精灵，比如全都静止不动
+                continue
+            self._saved[sprite_list] = positions.copy()
+            current[same[keep]] = previous[same[keep]] + moved[keep] * alpha
+            sprite_list._sprite_pos_changed = True
+
+    def restore(self):
+        """
+        恢复apply之前的位置缓冲
+        :return: None
+        """
+        for sprite_list, saved in self._saved.items():
+            self._positions(sprite_list)[:] = saved
+            sprite_list._sprite_pos_changed = True
+        self._saved.clear()
+
+    def clear(self):
+        """
+        丢弃记录的位置，比如暂停时直接绘制最新的位置
+        :return: None
+        """
+        self._snapshots.clear()
@@ -0,0 +1,232 @@
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+
+import numpy as np
+import PIL.Image
+import pyglet
+
+from Libs.tracing import traced
+
+
+__all__ = ["CACHE_DIR", "PendingFrames", "decode_webp_frames", "load_webp_frames", "load_many_webp_frames",
+           "submit_many_webp_frames", "cache_path"]
+
+
+# 解码结果的缓存目录，设为None可以关闭缓存
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "webp")
+# 解码方式或缓存格式改变时增加这个数字，旧的缓存会自然失效
+CACHE_VERSION = 1
+
+
+def _file_digest(file_name):
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(file_name, step=1, flipped=False):
+    """
+    获取一个动图解码结果的缓存文件路径。
+    路径由源文件内容的哈希与解码参数共同决定，源文件被修改后会自动使用新的缓存
+    :param file_name: 动图文件的路径
+    :param step: 每隔几帧取一帧
+    :param flipped: 是否同时保存左右翻转后的帧
+    :return: 缓存文件的路径；CACHE_DIR为None时返回None
+    """
+    if CACHE_DIR is None:
+        return None
+    base_name = os.path.splitext(os.path.basename(file_name))[0]
+    key = f"{_file_digest(file_name)}-v{CACHE_VERSION}-step{step}-{'pair' if flipped else 'single'}-RGBA"
+    return os.path.join(CACHE_DIR, f"{base_name}-{hashlib.sha256(key.encode()).hexdigest()[:24]}.npy")
+
+
+def _frame_count(image_object, step):
+    if not image_object.is_animated:
+        raise TypeError(f"The file {image_object.filename} is not an animated webp.")
+    return len(range(0, image_object.n_frames, step))
+
+
+def _decode_range(file_name, step, flipped, start, stop):
+    """
+    解码取样后的第start到第stop - 1帧，也就是动图中的第start * step, (start + 1) * step ...帧。
+    该函数会在工作进程中运行，每次都自己打开文件，不与其他进程共享任何状态
+    :return: 形状为(stop - start, 1或2, 高, 宽, 4)的uint8数组
+    """
+    image_object = PIL.Image.open(file_name)
+    width, height = image_object.size
+    frames = np.empty((stop - start, 2 if flipped else 1, height, width, 4), dtype=np.uint8)
+    for index in range(start, stop):
+        image_object.seek(index * step)
+        image = image_object.convert("RGBA")
+        frames[index - start, 0] = np.asarray(image)
+        if flipped:
+            frames[index - start, 1] = np.asarray(image.transpose(PIL.Image.FLIP_LEFT_RIGHT))
+    return frames
+
+
+def decode_webp_frames(file_name, step=1, flipped=False):
+    """
+    用PIL解码动图
+    :param file_name: 动图文件的路径
+    :param step: 每隔几帧取一帧
+    :param flipped: 是否同时生成左右翻转后的帧
+    :return: 形状为(帧数, 1或2, 高, 宽, 4)的uint8数组，第二维的1号为翻转后的帧
+    """
+    count = _frame_count(PIL.Image.open(file_name), step)
+    return _decode_range(file_name, step, flipped, 0, count)
+
+
+def _read_cache(path):
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        return np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        # 缓存文件损坏（比如写入时程序被关闭），重新解码
+        return None
+
+
+def _write_cache(path, frames):
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            np.save(file, frames)
+        os.replace(temp_path, path)
+    except OSError:
+        # 缓存目录不可写时只是无法加速下一次启动，不影响游戏
+        pass
+
+
+def _process_context():
+    """
+    获取用于并行解码的进程启动方式，无法安全地并行时返回None
+    只使用fork：spawn方式会在子进程中重新执行主模块，而游戏的主模块在导入时就会加载这些动图。
+    工作进程中也不再继续并行，避免进程无限嵌套。
+    只在还没有其他线程、也没有打开窗口的进程中fork：从多线程的进程中fork（比如已经开始播放音乐、后台加载时）可能导致子进程死锁，
+    fork已经初始化了OpenGL上下文的进程也不安全；macOS上fork系统框架同样不安全，因此直接不并行。
+    需要并行解码时，应当在创建窗口前用submit_many_webp_frames提交任务，其余情况退回单线程解码
+    """
+    if multiprocessing.parent_process() is not None:
+        return None
+    if threading.current_thread() is not threading.main_thread() or threading.active_count() > 1:
+        return None
+    if sys.platform == "darwin" or pyglet.app.windows:
+        return None
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork")
+
+
+class PendingFrames:
+    """
+    正在解码的一组动图，由submit_many_webp_frames返回。
+    result可以在任意线程中调用，只会等待解码完成，不会创建进程
+    """
+
+    def __init__(self, paths, results, missing, tasks, chunks, executor=None):
+        self._paths = paths
+        self._results = results
+        self._missing = missing
+        self._tasks = tasks
+        # 每个任务的解码结果，在进程池中解码时为对应的Future，None：在调用result的线程中依次解码
+        self._chunks = chunks
+        self._executor = executor
+
+    def result(self):
+        """
+        等待所有动图解码完成，解码结果会写入缓存
+        :return: 列表，按照requests的顺序排列，每个元素与load_webp_frames的返回值相同
+        """
+        if self._chunks is None:
+            self._chunks = [_decode_range(*task[1:]) for task in self._tasks]
+        elif self._executor is not None:
+            try:
+                self._chunks = [future.result() for future in self._chunks]
+            finally:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        for number, _ in self._missing:
+            frames = np.concatenate([chunk for task, chunk in zip(self._tasks, self._chunks) if task[0] == number])
+            _write_cache(self._paths[number], frames)
+            self._results[number] = frames
+        self._missing = []
+        return self._results
+
+
+def submit_many_webp_frames(requests, workers=None, split=1):
+    """
+    开始获取多个动图解码后的RGBA帧，参数与load_many_webp_frames相同。
+    有缓存的动图直接以内存映射的方式打开；其余的动图立刻提交给进程池，调用返回值的result等待解码完成。
+    无法并行时不在这里解码，而是在调用result的线程中依次解码
+    进程池只能在主线程中创建，因此需要在后台加载时，在主线程中调用这个函数，再在后台线程中等待result
+    :return: PendingFrames
+    """
+    results = [None] * len(requests)
+    paths = [None] * len(requests)
+    # 需要解码的动图：(编号, 解码后的总帧数)
+    missing = []
+    for number, (file_name, step, flipped) in enumerate(requests):
+        paths[number] = cache_path(file_name, step, flipped)
+        results[number] = _read_cache(paths[number])
+        if results[number] is None:
+            missing.append((number, _frame_count(PIL.Image.open(file_name), step)))
+    if not missing:
+        return PendingFrames(paths, results, missing, [], [])
+
+    tasks = []
+    for number, count in missing:
+        file_name, step, flipped = requests[number]
+        parts = max(1, min(split, count))
+        bounds = [count * part // parts for part in range(parts + 1)]
+        for start, stop in zip(bounds, bounds[1:]):
+            tasks.append((number, file_name, step, flipped, start, stop))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    context = _process_context() if workers > 1 else None
+    if context is None:
+        return PendingFrames(paths, results, missing, tasks, None)
+    # 使用fork时，进程池在第一次提交任务时就创建所有工作进程，之后等待结果的线程不会再fork
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    futures = [executor.submit(_decode_range, *task[1:]) for task in tasks]
+    return PendingFrames(paths, results, missing, tasks, futures, executor)
+
+
+@traced("asset")
+def load_many_webp_frames(requests, workers=None, split=1):
+    """
+    同时获取多个动图解码后的RGBA帧。
+    有缓存的动图直接以内存映射的方式打开；其余的动图按帧的范围拆成若干个任务交给进程池，
+    每个工作进程自己打开文件解码，解码结果按原来的顺序拼接后写入缓存。
+    动图的每一帧都依赖前一帧，解码后面的帧必须先解码前面所有的帧，所以把一个动图拆开并不能减少总的等待时间，
+    split默认为1，也就是每个动图作为一个任务，多个动图在不同的核心上同时解码
+    :param requests: 列表，每个元素为(动图文件的路径, 每隔几帧取一帧, 是否同时获取左右翻转后的帧)
+    :param workers: 进程数量，None：使用所有核心；1：在当前进程中依次解码
+    :param split: 每个动图拆分成几个任务
+    :return: 列表，按照requests的顺序排列，每个元素与load_webp_frames的返回值相同
+    """
+    return submit_many_webp_frames(requests, workers, split).result()
+
+
+def load_webp_frames(file_name, step=1, flipped=False, workers=1, split=1):
+    """
+    获取动图解码后的RGBA帧。
+    有缓存时以内存映射的方式打开缓存文件，完全跳过PIL的解码；否则解码后写入缓存
+    :param file_name: 动图文件的路径
+    :param step: 每隔几帧取一帧
+    :param flipped: 是否同时获取左右翻转后的帧
+    :param workers: 解码使用的进程数量，见load_many_webp_frames
+    :param split: 把动图拆分成几个任务并行解码，见load_many_webp_frames
+    :return: 形状为(帧数, 1或2, 高, 宽, 4)的uint8数组，第i帧对应动图中的第i * step帧
+    """
+    return load_many_webp_frames([(file_name, step, flipped)], workers, split)[0]
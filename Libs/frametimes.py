@@ -0,0 +1,152 @@
+import time
+from collections import deque, namedtuple
+
+import arcade
+import numpy as np
+from arcade import perf_info
+
+from Libs.compat import ARCADE_INTERNALS
+
+
+__all__ = ["FrameTimeMonitor", "FrameTimeOverlay", "FrameTimeStats"]
+
+
+class FrameTimeStats(namedtuple("FrameTimeStats", ["p50", "p95", "p99", "max", "over_budget", "count"])):
+    """
+    最近若干帧的帧时间统计，时间单位为毫秒
+    over_budget: 窗口中超出帧时间预算的帧数
+    count: 窗口中的帧数
+    """
+
+
+class FrameTimeMonitor:
+    """
+    根据arcade.enable_timings()记录的每次on_draw的开始时间，计算相邻两帧之间的间隔（帧时间）。
+    平均FPS会掩盖偶尔的卡顿，而帧时间的分位数和超出预算的帧数可以直接反映卡顿
+    """
+
+    def __init__(self, budget=1 / 60, window=240, keep=60):
+        """
+        :param budget: 每一帧的时间预算，单位为秒
+        :param window: 保留最近多少帧的帧时间
+        :param keep: arcade自己只会不断追加时间戳而从不清理，读取后只在其中保留最近keep个，足够arcade.get_fps使用
+        """
+        self.budget = budget
+        self.keep = keep
+        self.samples = deque(maxlen=window)
+        # 开始统计以来超出预算的总帧数
+        self.total_over_budget = 0
+        self._last_stamp = None
+
+    def add_stamp(self, stamp):
+        """
+        记录一帧开始的时间
+        :param stamp: time.perf_counter()的值
+        :return: None
+        """
+        if self._last_stamp is not None:
+            frame_time = stamp - self._last_stamp
+            self.samples.append(frame_time)
+            if frame_time > self.budget:
+                self.total_over_budget += 1
+        self._last_stamp = stamp
+
+    def collect(self):
+        """
+        读取arcade在上次调用之后新记录的时间戳。
+        时间戳保存在arcade的私有变量中，不是arcade 2.6时不去读取和清理它，改为以每次调用的时间作为一帧的开始
+        :return: None
+        """
+        if not ARCADE_INTERNALS:
+            self.add_stamp(time.perf_counter())
+            return
+        stamps = perf_info._frame_times
+        new = []
+        for stamp in reversed(stamps):
+            if self._last_stamp is not None and stamp <= self._last_stamp:
+                break
+            new.append(stamp)
+        for stamp in reversed(new):
+            self.add_stamp(stamp)
+        while len(stamps) > self.keep:
+            stamps.popleft()
+
+    def stats(self):
+        """
+        :return: FrameTimeStats，还没有数据时返回None
+        """
+        if not self.samples:
+            return None
+        data = np.fromiter(self.samples, dtype=float, count=len(self.samples)) * 1000
+        p50, p95, p99 = np.percentile(data, [50, 95, 99])
+        over_budget = int(np.count_nonzero(data > self.budget * 1000))
+        return FrameTimeStats(float(p50), float(p95), float(p99), float(data.max()), over_budget, len(data))
+
+
+class FrameTimeOverlay:
+    """
+    在屏幕上画出最近每一帧的帧时间柱状图，以及帧时间的分位数
+    柱子的颜色：绿色表示没有超出预算，黄色表示超出预算但不到两倍，红色表示超过两倍预算
+    """
+    GOOD_COLOR = (90, 200, 90, 200)
+    SLOW_COLOR = (230, 200, 60, 220)
+    BAD_COLOR = (230, 70, 60, 240)
+
+    def __init__(self, monitor: FrameTimeMonitor, left, bottom, width=240, height=60):
+        """
+        :param monitor: 提供数据的FrameTimeMonitor
+        :param left: 图表左边的x坐标
+        :param bottom: 图表底部的y坐标，文字显示在图表上方
+        :param width: 图表的宽
+        :param height: 图表的高，对应两倍的帧时间预算，更长的帧会被截断
+        """
+        self.monitor = monitor
+        self.left = left
+        self.bottom = bottom
+        self.width = width
+        self.height = height
+        self.text = arcade.Text("", left, bottom + height + 8, font_size=11, multiline=True, width=width * 2)
+        self.shapes = arcade.ShapeElementList()
+
+    def refresh(self, _=None):
+        """
+        根据最新的数据重新生成图表和文字。生成图形的代价较高，不需要每一帧都调用
+        :return: None
+        """
+        monitor = self.monitor
+        stats = monitor.stats()
+        if stats is None:
+            self.text.text = "Frame time: no data"
+            return
+        self.text.text = (f"p50 {stats.p50:.1f}  p95 {stats.p95:.1f}  p99 {stats.p99:.1f}  max {stats.max:.1f} ms\n"
+                          f"over {monitor.budget * 1000:.1f} ms: {stats.over_budget} / {stats.count}"
+                          f"  (total {monitor.total_over_budget})")
+
+        shapes = arcade.ShapeElementList()
+        shapes.append(arcade.create_rectangle_filled(self.left + self.width / 2, self.bottom + self.height / 2,
+                                                     self.width, self.height, (0, 0, 0, 120)))
+        bar_width = self.width / monitor.samples.maxlen
+        points = []
+        colors = []
+        for index, frame_time in enumerate(monitor.samples):
+            ratio = frame_time / monitor.budget
+            if ratio <= 1:
+                color = self.GOOD_COLOR
+            elif ratio <= 2:
+                color = self.SLOW_COLOR
+            else:
+                color = self.BAD_COLOR
+            left = self.left + index * bar_width
+            top = self.bottom + min(ratio / 2, 1) * self.height
+            points += [(left, self.bottom), (left + bar_width, self.bottom), (left + bar_width, top), (left, top)]
+            colors += [color] * 4
+        if points:
+            shapes.append(arcade.create_rectangles_filled_with_colors(points, colors))
+        # 预算线画在图表的正中间
+        budget_y = self.bottom + self.height / 2
+        shapes.append(arcade.create_line(self.left, budget_y, self.left + self.width, budget_y, (255, 255, 255, 160)))
+        self.shapes = shapes
+
+    def draw(self):
+        self.shapes.draw()
+        self.text.draw()
@@ -0,0 +1,97 @@
+import argparse
+import importlib
+import time
+from collections import namedtuple
+
+
+__all__ = ["HeadlessWindow", "SimulationResult", "attach_headless_window", "simulate"]
+
+
+class HeadlessWindow:
+    """
+    无窗口模式下用来代替arcade.Window的替身
+    游戏逻辑会通过view.window获取屏幕大小、切换界面，这个类只提供这些最少的属性，不会创建任何OpenGL上下文
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.current_view = None
+
+    def show_view(self, new_view):
+        """
+        记录被切换到的View。无窗口模式下不会调用View的on_show_view/on_hide_view
+        :param new_view: 新的View
+        :return: None
+        """
+        self.current_view = new_view
+
+
+def attach_headless_window(view, width, height):
+    """
+    以无窗口模式初始化一个arcade.View
+    arcade.View.__init__会为section管理器创建摄像机，而摄像机必须拿到真正的窗口，
+    所以无窗口模式下不调用它，只设置游戏逻辑会用到的属性
+    :param view: 需要初始化的View
+    :param width: 假想窗口的宽
+    :param height: 假想窗口的高
+    :return: None
+    """
+    view.window = HeadlessWindow(width, height)
+    view.key = None
+    view.section_manager = None
+
+
+class SimulationResult(namedtuple("SimulationResult", ["frames", "game_time", "wall_time", "result"])):
+    """
+    一次无窗口模拟的结果
+    frames: 实际运行的帧数
+    game_time: 游戏内经过的时间，单位为秒
+    wall_time: 模拟实际花费的时间，单位为秒
+    result: 游戏结果，None：游戏尚未结束，True：胜利，False：失败
+    """
+
+    @property
+    def ticks_per_second(self):
+        if self.wall_time <= 0:
+            return float("inf")
+        return self.frames / self.wall_time
+
+
+def simulate(view, frames, delta_time=1 / 60, stop_when_over=True):
+    """
+    在无窗口模式下连续调用view.update，尽可能快地运行游戏逻辑
+    :param view: 以headless=True创建的GameView
+    :param frames: 最多运行的帧数
+    :param delta_time: 每一帧游戏内经过的时间
+    :param stop_when_over: 游戏结束（view.game_result不为None）后是否提前停止
+    :return: SimulationResult
+    """
+    if not getattr(view, "headless", False):
+        raise ValueError("只能模拟以headless=True创建的GameView")
+    count = 0
+    start = time.perf_counter()
+    for count in range(1, frames + 1):
+        view.update(delta_time)
+        if stop_when_over and view.game_result is not None:
+            break
+    wall_time = time.perf_counter() - start
+    return SimulationResult(count, count * delta_time, wall_time, view.game_result)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="在没有显示器的情况下运行游戏逻辑")
+    parser.add_argument("game", nargs="?", default="main", choices=["main", "ishar_mla"],
+                        help="要运行的游戏模块")
+    parser.add_argument("--frames", type=int, default=3600, help="最多运行的帧数")
+    parser.add_argument("--dt", type=float, default=1 / 60, help="每一帧游戏内经过的时间")
+    parser.add_argument("--boss", action="store_true", help="直接从Boss战开始")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子，不指定时随机选取")
+    arguments = parser.parse_args()
+
+    game = importlib.import_module(arguments.game)
+    game_view = game.GameView(boss_fight=arguments.boss, headless=True, seed=arguments.seed)
+    game_view.firing = True
+    outcome = simulate(game_view, arguments.frames, arguments.dt)
+    print(f"{outcome.frames} frames, {outcome.game_time:.1f}s game time in {outcome.wall_time:.3f}s "
+          f"({outcome.ticks_per_second:.0f} ticks/s), seed: {game_view.seed}, result: {outcome.result}")
@@ -0,0 +1,197 @@
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import threading
+
+import arcade
+import PIL.Image
+
+
+__all__ = ["HIT_BOX_ALGORITHM", "HIT_BOX_DETAIL", "HitBoxCache", "CachedTexture", "compute_hit_box", "image_digest",
+           "HIT_BOXES"]
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 碰撞盒缓存文件的路径，设为None时不保存到磁盘，只在本次运行中缓存
+CACHE_FILE = os.path.join(ROOT, ".cache", "hitbox", "hitboxes.json")
+# 计算方式或缓存格式改变时增加这个数字，旧的缓存会被丢弃
+CACHE_VERSION = 1
+# 默认的碰撞盒算法与精细程度，与arcade.Texture的默认值相同
+HIT_BOX_ALGORITHM = "Simple"
+HIT_BOX_DETAIL = 4.5
+
+
+def image_digest(image):
+    """
+    计算图像内容的哈希。内容相同的图像（比如动图中不同取样间隔取到的同一帧）得到同样的哈希
+    :param image: PIL.Image
+    :return: 十六进制字符串
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}-{image.width}x{image.height}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def compute_hit_box(image, algorithm=HIT_BOX_ALGORITHM, detail=HIT_BOX_DETAIL):
+    """
+    计算碰撞盒，结果与arcade.Texture.hit_box_points相同
+    :param image: PIL.Image
+    :param algorithm: "Simple"，"Detailed"或者"None"
+    :param detail: 使用"Detailed"算法时的精细程度
+    :return: 碰撞盒的顶点
+    """
+    if algorithm == "Simple":
+        return arcade.calculate_hit_box_points_simple(image)
+    if algorithm == "Detailed":
+        return arcade.calculate_hit_box_points_detailed(image, detail)
+    width, height = image.width, image.height
+    return (-width / 2, -height / 2), (width / 2, -height / 2), (width / 2, height / 2), (-width / 2, height / 2)
+
+
+class HitBoxCache:
+    """
+    按图像内容的哈希保存计算好的碰撞盒，并写入磁盘，下次启动时不需要重新计算。
+    对于大图片，arcade的"Simple"算法逐个像素检查边缘，一张500x500的图片就需要约0.5秒。
+    碰撞盒通常在游戏中第一次检查碰撞时才计算，因此新算出的碰撞盒默认只保存在内存中，调用save时才一次性写入磁盘
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        """
+        :param path: 缓存文件的路径，None：不保存到磁盘
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._boxes = None
+        # 是否有还没有写入磁盘的碰撞盒
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(digest, algorithm, detail):
+        return f"{digest}-{algorithm}-{detail if algorithm == 'Detailed' else ''}"
+
+    def _load(self):
+        self._boxes = {}
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            # 缓存文件损坏，重新计算
+            return
+        if data.get("version") == CACHE_VERSION:
+            self._boxes = data.get("boxes", {})
+
+    def get(self, image, algorithm=HIT_BOX_ALGORITHM, detail=HIT_BOX_DETAIL, save=False):
+        """
+        获取图像的碰撞盒，缓存中没有时计算并保存在内存中
+        :param image: PIL.Image
+        :param algorithm: 碰撞盒算法
+        :param detail: 精细程度
+        :param save: 计算了新的碰撞盒时是否立即写入磁盘。每次写入都会重写整个文件，游戏中不要使用
+        :return: 碰撞盒的顶点
+        """
+        key = self.key(image_digest(image), algorithm, detail)
+        with self._lock:
+            if self._boxes is None:
+                self._load()
+            points = self._boxes.get(key)
+            if points is not None:
+                self.hits += 1
+                return tuple(tuple(point) for point in points)
+        points = compute_hit_box(image, algorithm, detail)
+        with self._lock:
+            self.misses += 1
+            self._boxes[key] = [list(point) for point in points]
+            self._dirty = True
+        if save:
+            self.save()
+        return points
+
+    def save(self):
+        """
+        把新计算的碰撞盒写入磁盘，没有新的碰撞盒时什么都不做
+        :return: None
+        """
+        if self.path is None or self._boxes is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": CACHE_VERSION, "boxes": dict(self._boxes)}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as file:
+                json.dump(data, file)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # 缓存目录不可写时只是下次启动需要重新计算
+            pass
+
+    def __len__(self):
+        with self._lock:
+            if self._boxes is None:
+                self._load()
+            return len(self._boxes)
+
+
+# 游戏使用的碰撞盒缓存，游戏中新计算的碰撞盒在退出时一次性写入磁盘
+HIT_BOXES = HitBoxCache()
+atexit.register(HIT_BOXES.save)
+
+
+class CachedTexture(arcade.Texture):
+    """
+    从HIT_BOXES获取碰撞盒的材质
+    与arcade.Texture一样，只有在第一次需要碰撞盒时才会去获取，只用来显示的材质（比如动图的大部分帧）不需要计算哈希
+    """
+
+    @property
+    def hit_box_points(self):
+        if self._hit_box_points is None:
+            if not self.image:
+                raise ValueError(f"Texture '{self.name}' doesn't have an image")
+            self._hit_box_points = HIT_BOXES.get(self.image, self._hit_box_algorithm, self._hit_box_detail)
+        return self._hit_box_points
+
+
+def _webp_frames(file_name):
+    image_object = PIL.Image.open(file_name)
+    for index in range(image_object.n_frames):
+        image_object.seek(index)
+        image = image_object.convert("RGBA")
+        yield image
+        yield image.transpose(PIL.Image.FLIP_LEFT_RIGHT)
+
+
+if __name__ == "__main__":
+    from Libs.atlas import SOURCE_DIRS, find_sources
+
+    parser = argparse.ArgumentParser(description="预先计算游戏中所有图片（包括动图的每一帧及其翻转）的碰撞盒")
+    parser.add_argument("--algorithm", default=HIT_BOX_ALGORITHM, choices=["Simple", "Detailed", "None"])
+    parser.add_argument("--detail", type=float, default=HIT_BOX_DETAIL)
+    args = parser.parse_args()
+
+    images = []
+    for name in find_sources():
+        images.append(PIL.Image.open(os.path.join(ROOT, name)).convert("RGBA"))
+    count = len(images)
+    for directory in SOURCE_DIRS:
+        for name in sorted(os.listdir(os.path.join(ROOT, directory))):
+            if name.lower().endswith(".webp"):
+                for image in _webp_frames(os.path.join(ROOT, directory, name)):
+                    HIT_BOXES.get(image, args.algorithm, args.detail)
+                    count += 1
+                # 每个动图完成后保存一次，中途停止也不会丢失已经算好的结果
+                HIT_BOXES.save()
+    for image in images:
+        HIT_BOXES.get(image, args.algorithm, args.detail)
+    HIT_BOXES.save()
+    print(f"{count} images, {HIT_BOXES.misses} computed, {HIT_BOXES.hits} already cached -> {HIT_BOXES.path}")
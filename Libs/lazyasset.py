@@ -0,0 +1,151 @@
+import threading
+
+
+__all__ = ["LazyAsset", "LazyAssetGroup", "start_loading", "preload"]
+
+
+class LazyAsset:
+    """
+    延迟加载的资源。
+    第一次使用（get或者下标访问）时才调用加载函数；如果资源已经在后台线程中加载，使用时只会等待加载完成，不会重复加载
+    """
+
+    def __init__(self, loader, *args, **kwargs):
+        """
+        :param loader: 加载资源的函数
+        :param args: 传给加载函数的参数
+        :param kwargs: 传给加载函数的参数
+        """
+        self._loader = loader
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        """
+        获取资源，还没有加载完成时会阻塞直到加载完成
+        :return: 加载函数的返回值
+        """
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                self._value = self._loader(*self._args, **self._kwargs)
+                self._loaded = True
+        return self._value
+
+    def start(self):
+        """
+        在调用者的线程中开始加载。单独的资源没有需要在调用者线程中完成的准备工作，加载全部在get中进行
+        :return: None
+        """
+
+    def __getitem__(self, item):
+        return self.get()[item]
+
+    def __len__(self):
+        return len(self.get())
+
+    def __iter__(self):
+        return iter(self.get())
+
+
+class LazyAssetGroup:
+    """
+    一起加载的一组延迟加载的资源，比如需要在多个进程中同时解码的几个动图。
+    加载分为两步：start在调用者的线程（主线程）中开始加载，比如创建进程池并提交任务；get等待加载完成，可以在后台线程中调用。
+    用asset得到组中单个资源的LazyAsset，第一次使用其中任何一个时都会加载整组
+    """
+
+    def __init__(self, starter, *args, **kwargs):
+        """
+        :param starter: 开始加载的函数，返回一个没有参数的函数，后者等待加载完成并返回组中所有资源组成的列表
+        :param args: 传给starter的参数
+        :param kwargs: 传给starter的参数
+        """
+        self._starter = starter
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._finish = None
+        self._values = None
+
+    @property
+    def loaded(self):
+        return self._values is not None
+
+    def start(self):
+        """
+        开始加载整组资源，已经开始时什么都不做
+        :return: None
+        """
+        with self._lock:
+            if self._values is None and self._finish is None:
+                self._finish = self._starter(*self._args, **self._kwargs)
+
+    def get(self):
+        """
+        获取整组资源，还没有加载完成时会阻塞直到加载完成；还没有开始加载时在当前线程中开始
+        :return: 列表，组中的所有资源
+        """
+        if self._values is not None:
+            return self._values
+        with self._lock:
+            if self._values is None:
+                finish = self._finish or self._starter(*self._args, **self._kwargs)
+                # 加载失败时丢弃已经开始的加载，下一次使用时重新开始，从而在使用者的线程中抛出异常
+                self._finish = None
+                self._values = finish()
+        return self._values
+
+    def asset(self, index):
+        """
+        :param index: 资源在组中的位置
+        :return: 组中单个资源的LazyAsset
+        """
+        return LazyAsset(lambda: self.get()[index])
+
+
+def start_loading(*assets):
+    """
+    在调用者的线程中开始加载还没有加载的资源，不等待加载完成，比如在创建窗口前提交需要在多个进程中解码的资源组
+    开始加载失败的资源会留到第一次使用时在使用者的线程中重新加载，从而在那里抛出异常
+    :param assets: LazyAsset或者LazyAssetGroup
+    :return: 列表，还没有加载完成的资源
+    """
+    pending = [asset for asset in assets if not asset.loaded]
+    for asset in pending:
+        try:
+            asset.start()
+        except Exception:
+            pass
+    return pending
+
+
+def preload(*assets):
+    """
+    在一个后台线程中依次加载还没有加载的资源，需要在主线程中调用：资源组在调用者的线程中开始加载，后台线程只负责等待
+    加载失败的资源会留到第一次使用时在使用者的线程中重新加载，从而在那里抛出异常
+    :param assets: LazyAsset或者LazyAssetGroup
+    :return: 后台线程，所有资源都已经加载时返回None
+    """
+    pending = start_loading(*assets)
+    if not pending:
+        return None
+
+    def load_all():
+        for asset in pending:
+            try:
+                asset.get()
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=load_all, name="asset-preload", daemon=True)
+    thread.start()
+    return thread
@@ -1,6 +1,11 @@
 import PIL.Image
 import arcade
 
+from Libs.events import Signal
+from Libs.framecache import load_webp_frames, submit_many_webp_frames
+from Libs.hitbox import HIT_BOX_ALGORITHM, HIT_BOX_DETAIL, CachedTexture
+from Libs.tracing import traced
+
 
 class LivingSprite(arcade.Sprite):
     """
@@ -27,6 +32,8 @@ class LivingSprite(arcade.Sprite):
         :param kwargs: 其他给arcade.Sprite的参数
         """
         super().__init__(image, scale, *args, **kwargs)
+        # 血量改变时发出，参数为新的血量。界面上的血条等通过订阅它来更新，而不是每一帧都重新读取
+        self.health_changed = Signal()
         self.cur_frame_idx = 0
         self.time_counter = 0
         self.frames: [arcade.sprite.AnimationKeyframe] = frames
@@ -84,8 +91,11 @@ class LivingSprite(arcade.Sprite):
         # 控制血量不超过上限
         new_health = new_health if new_health < self.total_health else self.total_health
         new_health = 0 if new_health < 0 else new_health
-        self.on_health_change(new_health - self.health)
+        old_health = self._health
+        self.on_health_change(new_health - old_health)
         self._health = new_health
+        if new_health != old_health:
+            self.health_changed.emit(new_health)
 
     def on_health_change(self, delta_health):
         """
@@ -115,63 +125,107 @@ class LivingSprite(arcade.Sprite):
                 self.texture = cur_frame.texture
 
 
-def get_cache_if_possible(texture_name, image):
+def get_cache_if_possible(texture_name, image, hit_box_algorithm=HIT_BOX_ALGORITHM, hit_box_detail=HIT_BOX_DETAIL):
     if texture_name in arcade.texture.load_texture.texture_cache:
         texture = arcade.texture.load_texture.texture_cache[texture_name]
     else:
-        texture = arcade.Texture(texture_name, image)
+        # 碰撞盒从按图像内容保存的缓存中获取，大尺寸的动图帧不需要在每次启动时重新计算
+        texture = CachedTexture(texture_name, image, hit_box_algorithm, hit_box_detail)
         arcade.texture.load_texture.texture_cache[texture_name] = texture
     return texture
 
 
-def load_textures_from_webp(resource_name, scale=1):
+@traced("asset")
+def load_textures_from_webp(resource_name, scale=1, workers=1, split=1, hit_box_algorithm=HIT_BOX_ALGORITHM,
+                            hit_box_detail=HIT_BOX_DETAIL):
     file_name = arcade.resources.resolve_resource_path(resource_name)
-    image_object = PIL.Image.open(file_name)
-    if not image_object.is_animated:
-        raise TypeError(f"The file {resource_name} is not an animated webp.")
+    frames = load_webp_frames(file_name, scale, workers=workers, split=split)
 
     textures = []
-    for frame in range(0, image_object.n_frames, scale):
-        image_object.seek(frame)
-        image = image_object.convert("RGBA")
+    for index in range(len(frames)):
+        frame = index * scale
         cache_file_name = f"{resource_name}-{frame}-0"
-        texture = get_cache_if_possible(cache_file_name, image)
+        texture = get_cache_if_possible(cache_file_name, PIL.Image.fromarray(frames[index, 0]), hit_box_algorithm,
+                                        hit_box_detail)
         textures.append(texture)
 
     return textures
 
 
-def load_textures_pair_from_webp(resource_name, scale=1):
-    file_name = arcade.resources.resolve_resource_path(resource_name)
-    image_object = PIL.Image.open(file_name)
-    if not image_object.is_animated:
-        raise TypeError(f"The file {resource_name} is not an animated webp.")
-
+def _textures_pair_from_frames(resource_name, frames, scale, hit_box_algorithm=HIT_BOX_ALGORITHM,
+                               hit_box_detail=HIT_BOX_DETAIL):
     textures = []
     textures_flipped = []
-    for frame in range(0, image_object.n_frames, scale):
-        image_object.seek(frame)
-        image = image_object.convert("RGBA")
-        texture = get_cache_if_possible(f"{resource_name}-{frame}-0", image)
-        texture_flipped = get_cache_if_possible(f"{resource_name}-{frame}-1", image.transpose(PIL.Image.FLIP_LEFT_RIGHT))
+    for index in range(len(frames)):
+        frame = index * scale
+        texture = get_cache_if_possible(f"{resource_name}-{frame}-0", PIL.Image.fromarray(frames[index, 0]),
+                                        hit_box_algorithm, hit_box_detail)
+        texture_flipped = get_cache_if_possible(f"{resource_name}-{frame}-1", PIL.Image.fromarray(frames[index, 1]),
+                                                hit_box_algorithm, hit_box_detail)
         textures.append(texture)
         textures_flipped.append(texture_flipped)
 
     return textures, textures_flipped
 
 
-def load_frames_from_webp(resource_name, frame_rate=30, scale=1):
+@traced("asset")
+def load_textures_pair_from_webp(resource_name, scale=1, workers=1, split=1, hit_box_algorithm=HIT_BOX_ALGORITHM,
+                                 hit_box_detail=HIT_BOX_DETAIL):
+    file_name = arcade.resources.resolve_resource_path(resource_name)
+    frames = load_webp_frames(file_name, scale, flipped=True, workers=workers, split=split)
+    return _textures_pair_from_frames(resource_name, frames, scale, hit_box_algorithm, hit_box_detail)
+
+
+@traced("asset")
+def start_textures_pairs_from_webp(resources, workers=None, hit_box_algorithm=HIT_BOX_ALGORITHM,
+                                   hit_box_detail=HIT_BOX_DETAIL):
+    """
+    开始加载多个动图的正向与翻转材质：没有缓存的动图立刻交给多个进程同时解码，因此需要在主线程中调用。
+    返回的函数等待解码完成并创建材质，可以在后台线程中调用
+    :param resources: 列表，每个元素为(动图的路径, 每隔几帧取一帧)
+    :param workers: 解码使用的进程数量，None：使用所有核心
+    :param hit_box_algorithm: 所有材质的碰撞盒算法
+    :param hit_box_detail: 使用"Detailed"算法时的精细程度
+    :return: 没有参数的函数，返回值与load_textures_pairs_from_webp相同
+    """
+    requests = [(arcade.resources.resolve_resource_path(resource_name), scale, True)
+                for resource_name, scale in resources]
+    pending = submit_many_webp_frames(requests, workers)
+
+    @traced("asset", "finish_textures_pairs_from_webp")
+    def finish():
+        return [_textures_pair_from_frames(resource_name, frames, scale, hit_box_algorithm, hit_box_detail)
+                for (resource_name, scale), frames in zip(resources, pending.result())]
+
+    return finish
+
+
+@traced("asset")
+def load_textures_pairs_from_webp(resources, workers=None, hit_box_algorithm=HIT_BOX_ALGORITHM,
+                                  hit_box_detail=HIT_BOX_DETAIL):
+    """
+    同时加载多个动图的正向与翻转材质，没有缓存的动图会在多个进程中同时解码
+    :param resources: 列表，每个元素为(动图的路径, 每隔几帧取一帧)
+    :param workers: 解码使用的进程数量，None：使用所有核心
+    :param hit_box_algorithm: 所有材质的碰撞盒算法
+    :param hit_box_detail: 使用"Detailed"算法时的精细程度
+    :return: 列表，按resources的顺序排列，每个元素与load_textures_pair_from_webp的返回值相同
+    """
+    return start_textures_pairs_from_webp(resources, workers, hit_box_algorithm, hit_box_detail)()
+
+
+@traced("asset")
+def load_frames_from_webp(resource_name, frame_rate=30, scale=1, workers=1, split=1,
+                          hit_box_algorithm=HIT_BOX_ALGORITHM, hit_box_detail=HIT_BOX_DETAIL):
     file_name = arcade.resources.resolve_resource_path(resource_name)
-    image_object = PIL.Image.open(file_name)
-    if not image_object.is_animated:
-        raise TypeError(f"The file {resource_name} is not an animated webp.")
+    decoded = load_webp_frames(file_name, scale, workers=workers, split=split)
 
     frames = []
-    for frame in range(0, image_object.n_frames, scale):
-        image_object.seek(frame)
+    for index in range(len(decoded)):
+        frame = index * scale
         frame_duration = int(1000 / frame_rate)
-        image = image_object.convert("RGBA")
-        texture = get_cache_if_possible(f"{resource_name}-{frame}-0", image)
+        texture = get_cache_if_possible(f"{resource_name}-{frame}-0", PIL.Image.fromarray(decoded[index, 0]),
+                                        hit_box_algorithm, hit_box_detail)
         frame = arcade.AnimationKeyframe(0, frame_duration, texture)
         frames.append(frame)
 
@@ -0,0 +1,289 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from Libs.benchmark import SCENARIOS, run_suite
+
+
+__all__ = ["ASSETS", "collect", "compare", "load_baseline", "mann_whitney_p", "save_baseline", "Comparison"]
+
+
+# 基线文件的格式改变时增加这个数字
+BASELINE_VERSION = 1
+# 默认的基线文件，提交在仓库中
+BASELINE_FILE = "perf_baseline.json"
+# 计时的资源：Boss战开始时加载的几个动图，与ishar_mla.py中的参数相同
+ASSETS = [("dlc_ishar_mla/images/normal_move.webp", 3), ("dlc_ishar_mla/images/normal_heal.webp", 3),
+          ("dlc_ishar_mla/images/normal_die.webp", 1), ("dlc_ishar_mla/images/normal_attack.webp", 3)]
+
+
+def _measure_startup(game):
+    # 在全新的进程中调用：导入游戏模块（包括模块级的资源加载）以及创建无窗口的GameView各花了多少毫秒
+    start = time.perf_counter()
+    module = importlib.import_module(game)
+    imported = time.perf_counter()
+    module.GameView(headless=True, seed=1)
+    created = time.perf_counter()
+    return {f"startup.{game}.import": (imported - start) * 1000, f"startup.{game}.view": (created - imported) * 1000}
+
+
+def _measure_assets():
+    # 在全新的进程中调用：用Libs/livingsprite.py加载每个动图的正向与翻转材质花了多少毫秒。
+    # 先加载一次保证磁盘缓存存在，再清空arcade的材质缓存重新计时，得到的是有磁盘缓存时（即平时启动时）的耗时
+    import arcade
+    from Libs.livingsprite import load_textures_pair_from_webp
+
+    results = {}
+    for resource_name, scale in ASSETS:
+        load_textures_pair_from_webp(resource_name, scale=scale)
+        arcade.texture.load_texture.texture_cache.clear()
+        start = time.perf_counter()
+        load_textures_pair_from_webp(resource_name, scale=scale)
+        results[f"assets.{os.path.basename(resource_name)}"] = (time.perf_counter() - start) * 1000
+    return results
+
+
+def _run_worker(*args):
+    output = subprocess.run([sys.executable, "-m", "Libs.perfgate", "--worker", *args],
+                            check=True, stdout=subprocess.PIPE, text=True).stdout
+    # 游戏模块在导入时可能打印内容，结果总是最后一行
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def collect(repeat=5, ticks=300, warmup=60, only=None):
+    """
+    重复测量所有指标。每次测量都在全新的子进程中进行，各个指标轮流测量，机器负载的缓慢变化会平均分摊到所有指标上
+    指标分为三类，单位都是毫秒：
+    update.<场景名>: 基准测试场景中GameView.update每一步的耗时（最快一批的平均值），见Libs/benchmark.py
+    assets.<文件名>: 加载一个动图的材质的耗时
+    startup.<游戏>.import / startup.<游戏>.view: 导入游戏模块、创建GameView的耗时
+    :param repeat: 每个指标测量的次数
+    :param ticks: 每次测量场景时计时的步数
+    :param warmup: 每次测量场景前预热的步数
+    :param only: 只测量名字以这些前缀开头的指标，None：全部测量
+    :return: 字典，指标名：每次测量的结果组成的列表
+    """
+
+    def wanted(name):
+        return only is None or any(name.startswith(prefix) for prefix in only)
+
+    samples = {}
+    for _ in range(repeat):
+        scenarios = [name for name in SCENARIOS if wanted(f"update.{name}")]
+        if scenarios:
+            for name, result in run_suite(scenarios, ticks, warmup, memory=False).items():
+                samples.setdefault(f"update.{name}", []).append(result["best_ms_per_tick"])
+        measured = {}
+        if any(wanted(f"assets.{os.path.basename(resource_name)}") for resource_name, _ in ASSETS):
+            measured.update(_run_worker("assets"))
+        for game in ("main", "ishar_mla"):
+            if wanted(f"startup.{game}"):
+                measured.update(_run_worker("startup", game))
+        for name, value in measured.items():
+            if wanted(name):
+                samples.setdefault(name, []).append(value)
+    return samples
+
+
+def mann_whitney_p(baseline, current):
+    """
+    Mann-Whitney U检验（正态近似，含并列修正）的单侧p值：current整体大于baseline的显著程度。
+    不假设耗时服从正态分布，个别被系统打断的离群样本也不会左右结果
+    :param baseline: 基线的样本
+    :param current: 本次的样本
+    :return: p值，越小越说明current确实变大了
+    """
+    n1 = len(baseline)
+    n2 = len(current)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    values = np.concatenate([baseline, current])
+    # 平均秩：并列的样本取它们所占位置的平均值
+    order = values.argsort(kind="mergesort")
+    ranks = np.empty(len(values))
+    sorted_values = values[order]
+    start = 0
+    while start < len(values):
+        end = start
+        while end + 1 < len(values) and sorted_values[end + 1] == sorted_values[start]:
+            end += 1
+        ranks[order[start:end + 1]] = (start + end) / 2 + 1
+        start = end + 1
+    u = ranks[n1:].sum() - n2 * (n2 + 1) / 2
+    _, counts = np.unique(values, return_counts=True)
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - (counts ** 3 - counts).sum() / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    # 连续性修正
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class Comparison:
+    """
+    一个指标与基线的比较结果
+    """
+
+    def __init__(self, name, baseline, current, tolerance, alpha):
+        """
+        :param name: 指标名
+        :param baseline: 基线的样本，None：基线中没有这个指标
+        :param current: 本次的样本，None：本次没有测量这个指标
+        :param tolerance: 允许变慢的比例，比如0.1：中位数变慢10%以内不算退化
+        :param alpha: 显著性水平
+        """
+        self.name = name
+        self.baseline = baseline
+        self.current = current
+        self.tolerance = tolerance
+        self.alpha = alpha
+        self.baseline_median = float(np.median(baseline)) if baseline else None
+        self.current_median = float(np.median(current)) if current else None
+        self.p = mann_whitney_p(baseline, current) if baseline and current else None
+
+    @property
+    def change(self):
+        """
+        :return: 中位数变化的比例，正数为变慢。缺少一侧的数据时为None
+        """
+        if self.baseline_median is None or self.current_median is None or self.baseline_median <= 0:
+            return None
+        return self.current_median / self.baseline_median - 1
+
+    @property
+    def regressed(self):
+        """
+        :return: 中位数变慢超过容差，并且统计上显著时为True
+        """
+        return self.change is not None and self.change > self.tolerance and self.p < self.alpha
+
+    @property
+    def status(self):
+        if self.baseline is None:
+            return "new"
+        if self.current is None:
+            return "not measured"
+        if self.regressed:
+            return "REGRESSED"
+        if self.change < -self.tolerance and mann_whitney_p(self.current, self.baseline) < self.alpha:
+            return "improved"
+        return "ok"
+
+    def __str__(self):
+        baseline = "-" if self.baseline_median is None else f"{self.baseline_median:.3f} ms"
+        current = "-" if self.current_median is None else f"{self.current_median:.3f} ms"
+        change = "-" if self.change is None else f"{self.change:+.1%}"
+        p = "-" if self.p is None else f"{self.p:.3f}"
+        return (f"{self.name:<32}{baseline:>13}{current:>13}{change:>9}  {f'±{self.tolerance:.0%}':<11}"
+                f"{p:<8}{self.status}")
+
+
+def compare(baseline, current, tolerance=0.1, alpha=0.05):
+    """
+    比较本次的测量结果与基线
+    :param baseline: load_baseline得到的基线
+    :param current: collect得到的本次结果
+    :param tolerance: 默认的容差，基线中为某个指标单独设置了tolerance时使用那个值
+    :param alpha: 显著性水平
+    :return: Comparison的列表，先列出基线中的指标，再列出新的指标
+    """
+    metrics = baseline["metrics"]
+    names = list(metrics) + [name for name in current if name not in metrics]
+    return [Comparison(name, metrics[name]["samples"] if name in metrics else None, current.get(name),
+                       metrics.get(name, {}).get("tolerance", tolerance), alpha)
+            for name in names]
+
+
+def load_baseline(path):
+    """
+    读取基线文件
+    :param path: 基线文件的路径
+    :return: 字典，格式见save_baseline
+    """
+    with open(path) as file:
+        baseline = json.load(file)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"Unsupported baseline version: {baseline.get('version')}")
+    return baseline
+
+
+def save_baseline(path, samples, previous=None):
+    """
+    把测量结果保存为新的基线。基线中每个指标保存所有样本，以及可选的单独容差
+    :param path: 基线文件的路径
+    :param samples: collect得到的结果
+    :param previous: 原来的基线，其中为指标单独设置的容差会被保留。None：没有原来的基线
+    :return: None
+    """
+    old_metrics = previous["metrics"] if previous is not None else {}
+    metrics = {}
+    for name, values in samples.items():
+        metrics[name] = {"unit": "ms", "median": float(np.median(values)), "samples": values}
+        if "tolerance" in old_metrics.get(name, {}):
+            metrics[name]["tolerance"] = old_metrics[name]["tolerance"]
+    # 这次没有测量的指标保持不变
+    for name, metric in old_metrics.items():
+        metrics.setdefault(name, metric)
+    data = {
+        "version": BASELINE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "metrics": metrics,
+    }
+    with open(path, "w") as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="重复测量模拟速度、资源加载与启动的耗时，与提交的基线比较，有指标退化时以状态码1退出")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基线文件的路径")
+    parser.add_argument("--repeat", type=int, default=5, help="每个指标测量的次数")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="中位数允许变慢的比例，基线中为指标单独设置的tolerance优先")
+    parser.add_argument("--alpha", type=float, default=0.05, help="判断变慢是否显著的显著性水平")
+    parser.add_argument("--ticks", type=int, default=300, help="每次测量场景时计时的步数")
+    parser.add_argument("--warmup", type=int, default=60, help="每次测量场景前预热的步数")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="只测量名字以这些前缀开头的指标，比如update startup")
+    parser.add_argument("--update", action="store_true", help="不做比较，把这次的结果写入基线")
+    parser.add_argument("--worker", nargs="+", help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.worker:
+        # 由collect启动的子进程：测量一组指标，把结果作为一行JSON输出
+        if arguments.worker[0] == "assets":
+            print(json.dumps(_measure_assets()))
+        else:
+            print(json.dumps(_measure_startup(arguments.worker[1])))
+        sys.exit(0)
+
+    old = load_baseline(arguments.baseline) if os.path.exists(arguments.baseline) else None
+    if old is None and not arguments.update:
+        parser.error(f"{arguments.baseline} does not exist, run with --update to create it")
+    results = collect(arguments.repeat, arguments.ticks, arguments.warmup, arguments.only)
+    if arguments.update:
+        save_baseline(arguments.baseline, results, old)
+        print(f"{len(results)} metrics written to {arguments.baseline}")
+        sys.exit(0)
+
+    comparisons = compare(old, results, arguments.tolerance, arguments.alpha)
+    if arguments.only:
+        # 只测量了部分指标时，不列出其余没有测量的指标
+        comparisons = [one for one in comparisons if one.current is not None]
+    print(f"{'metric':<32}{'baseline':>13}{'current':>13}{'change':>9}  {'tolerance':<11}{'p':<8}status")
+    for one in comparisons:
+        print(one)
+    regressions = [one for one in comparisons if one.regressed]
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed beyond tolerance: {', '.join(one.name for one in regressions)}")
+        sys.exit(1)
+    print(f"\nno regressions against {arguments.baseline} ({arguments.repeat} runs per metric)")
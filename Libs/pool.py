@@ -0,0 +1,135 @@
+from collections import namedtuple
+
+import arcade
+
+
+__all__ = ["PoolStats", "PooledSprite", "SpritePool", "load_cached_texture"]
+
+
+# 图片路径：材质。精灵从对象池取出时直接从这里拿材质，不用每次都按路径去arcade的缓存中查找
+_textures = {}
+
+
+def load_cached_texture(image):
+    """
+    按路径获取材质，同一个路径只会加载一次
+    :param image: 图片路径
+    :return: arcade.Texture
+    """
+    texture = _textures.get(image)
+    if texture is None:
+        texture = _textures[image] = arcade.load_texture(image)
+    return texture
+
+
+class PoolStats(namedtuple("PoolStats", ["live", "free", "high_water", "created"])):
+    """
+    对象池的统计信息
+    live: 当前正在使用的对象数量
+    free: 池中空闲、可以重复利用的对象数量
+    high_water: 同时使用的对象数量的最大值
+    created: 池一共创建过的对象数量。稳定运行时这个值不再增长，说明没有新的分配
+    """
+
+
+class PooledSprite(arcade.Sprite):
+    """
+    可以被对象池回收的精灵
+    从所有精灵列表中移除（kill或remove_from_sprite_lists）时会自动回到取出它的对象池。
+    对象池设置了延迟移除队列时，kill只会把精灵标记为已死亡，帧末由队列统一移除
+    子类需要实现reset，参数与__init__相同，用来在重复利用时重新设置精灵的状态
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def reset(self):
+        """
+        清除上一次使用时留下的运动状态
+        :return: None
+        """
+        self.angle = 0
+        self.change_x = 0
+        self.change_y = 0
+
+    def set_image(self, image, scale=1):
+        """
+        切换精灵的图片，同时更新碰撞盒
+        :param image: 图片路径
+        :param scale: 缩放大小
+        :return: None
+        """
+        self.scale = scale
+        texture = load_cached_texture(image)
+        self.texture = texture
+        self.hit_box = texture.hit_box_points
+        self.collision_radius = max(self.width, self.height)
+
+    def kill(self):
+        if self.pool is not None and self.pool.removals is not None:
+            self.pool.removals.defer(self)
+        else:
+            self.remove_from_sprite_lists()
+
+    def remove_from_sprite_lists(self):
+        super().remove_from_sprite_lists()
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class SpritePool:
+    """
+    精灵对象池：被销毁的精灵不会被丢弃，而是留在池中，下次需要同类精灵时重新设置后直接使用
+    """
+
+    def __init__(self, factory, removals=None):
+        """
+        :param factory: 创建新精灵的可调用对象，通常就是精灵的类。其参数需要与精灵的reset方法相同
+        :param removals: 延迟移除队列RemovalQueue，None：kill时立即移除
+        """
+        self.factory = factory
+        self.removals = removals
+        self._free = []
+        self.live = 0
+        self.high_water = 0
+        self.created = 0
+
+    def __len__(self):
+        return self.live
+
+    def acquire(self, *args, **kwargs):
+        """
+        取出一个精灵。池中有空闲精灵时以相同的参数调用其reset，否则创建一个新的
+        :return: 精灵
+        """
+        if self._free:
+            sprite = self._free.pop()
+            sprite.reset(*args, **kwargs)
+        else:
+            sprite = self.factory(*args, **kwargs)
+            self.created += 1
+        sprite.pool = self
+        self.live += 1
+        if self.live > self.high_water:
+            self.high_water = self.live
+        return sprite
+
+    def release(self, sprite):
+        """
+        把精灵放回池中。同一个精灵被重复销毁时只会放回一次
+        :param sprite: 精灵
+        :return: None
+        """
+        if sprite.pool is not self:
+            return
+        sprite.pool = None
+        self.live -= 1
+        self._free.append(sprite)
+
+    @property
+    def stats(self):
+        """
+        :return: PoolStats
+        """
+        return PoolStats(self.live, len(self._free), self.high_water, self.created)
@@ -0,0 +1,120 @@
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from Libs.tracing import TRACER
+
+
+__all__ = ["FrameProfiler", "PhaseStats"]
+
+
+class PhaseStats(namedtuple("PhaseStats", ["min", "mean", "p95", "p99", "count"])):
+    """
+    一个阶段在最近若干帧内的耗时统计，单位为毫秒
+    count: 统计窗口中的样本数量
+    """
+
+
+class FrameProfiler:
+    """
+    按阶段统计每一帧的耗时。
+    在一帧开始时调用start，之后每完成一个阶段调用一次lap(阶段名)，记录的是距离上一次start/lap经过的时间，
+    因此插桩时不需要改变原有代码的缩进。每个阶段只保留最近window帧的数据
+    """
+
+    def __init__(self, window=300):
+        """
+        :param window: 每个阶段保留的样本数量
+        """
+        self.window = window
+        # 阶段名：最近的耗时（秒）。字典保持阶段第一次出现的顺序，也就是它们在一帧中的顺序
+        self._samples = {}
+        self._start = self._last = time.perf_counter()
+
+    def start(self):
+        """
+        开始计时新的一组阶段
+        :return: None
+        """
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, name):
+        """
+        记录一个阶段：从上一次start或lap到现在的时间
+        :param name: 阶段名
+        :return: None
+        """
+        now = time.perf_counter()
+        self.record(name, now - self._last)
+        if TRACER.enabled:
+            TRACER.complete(name, "phase", self._last, now - self._last)
+        self._last = now
+
+    def stop(self, name):
+        """
+        记录从start到现在的总耗时
+        :param name: 总耗时使用的名字
+        :return: None
+        """
+        now = time.perf_counter()
+        self.record(name, now - self._start)
+        if TRACER.enabled:
+            TRACER.complete(name, "phase", self._start, now - self._start)
+        self._last = now
+
+    def record(self, name, seconds):
+        """
+        直接记录一个阶段的耗时
+        :param name: 阶段名
+        :param seconds: 耗时，单位为秒
+        :return: None
+        """
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def reset(self):
+        """
+        清空所有数据
+        :return: None
+        """
+        self._samples.clear()
+
+    @property
+    def phases(self):
+        """
+        :return: 所有阶段名，按照第一次记录的顺序排列
+        """
+        return list(self._samples)
+
+    def stats(self, name):
+        """
+        获取一个阶段的统计数据
+        :param name: 阶段名
+        :return: PhaseStats，还没有该阶段的数据时返回None
+        """
+        samples = self._samples.get(name)
+        if not samples:
+            return None
+        data = np.fromiter(samples, dtype=float, count=len(samples)) * 1000
+        p95, p99 = np.percentile(data, [95, 99])
+        return PhaseStats(float(data.min()), float(data.mean()), float(p95), float(p99), len(data))
+
+    def summary(self):
+        """
+        获取所有阶段的统计数据
+        :return: 字典，格式为：阶段名：PhaseStats
+        """
+        return {name: self.stats(name) for name in self._samples if self._samples[name]}
+
+    def report(self):
+        """
+        把统计数据格式化为适合显示的文字
+        :return: 多行字符串
+        """
+        lines = [f"{'phase':<24}{'min':>8}{'mean':>8}{'p95':>8}{'p99':>8}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<24}{stats.min:>8.2f}{stats.mean:>8.2f}{stats.p95:>8.2f}{stats.p99:>8.2f}")
+        return "\n".join(lines)
@@ -0,0 +1,119 @@
+from array import array
+from collections import namedtuple
+
+from Libs.compat import ARCADE_INTERNALS
+
+
+__all__ = ["RemovalQueue", "RemovalStats", "remove_sprites"]
+
+
+class RemovalStats(namedtuple("RemovalStats", ["requested", "removed", "coalesced", "batches"])):
+    """
+    一次批量移除的统计信息
+    requested: 本帧中kill被调用的次数
+    removed: 实际被移除的精灵数量
+    coalesced: 被合并掉的重复kill的次数：已经被kill、还没有移除的精灵再次被kill
+    batches: 被整理的精灵列表数量。每个列表只整理一次，而不是每移除一个精灵就在列表中线性查找一次
+    """
+
+
+def remove_sprites(sprite_list, sprites):
+    """
+    一次性从arcade.SpriteList中移除多个精灵。
+    SpriteList.remove每次都要在精灵列表与绘制顺序中各做一次线性查找和删除；
+    这里只遍历一遍列表，其余精灵的先后顺序保持不变，结果与逐个调用remove相同
+    :param sprite_list: arcade.SpriteList
+    :param sprites: 需要移除的精灵，必须都在sprite_list中
+    :return: None
+    """
+    if not ARCADE_INTERNALS:
+        for sprite in dict.fromkeys(sprites):
+            sprite_list.remove(sprite)
+        return
+    dead = set(sprites)
+    for sprite in dead:
+        slot = sprite_list.sprite_slot.pop(sprite)
+        sprite_list._sprite_buffer_free_slots.append(slot)
+        sprite.sprite_lists.remove(sprite_list)
+        if sprite_list.spatial_hash:
+            sprite_list.spatial_hash.remove_object(sprite)
+    sprite_list.sprite_list = [sprite for sprite in sprite_list.sprite_list if sprite not in dead]
+
+    # 绘制顺序（index buffer）与精灵列表的顺序一致，按剩下的精灵重新生成，容量保持不变
+    slots = sprite_list.sprite_slot
+    index_data = array("I", [slots[sprite] for sprite in sprite_list.sprite_list])
+    index_data.extend([0] * (len(sprite_list._sprite_index_data) - len(index_data)))
+    sprite_list._sprite_index_data = index_data
+    sprite_list._sprite_index_slots = len(sprite_list.sprite_list)
+    sprite_list._sprite_index_changed = True
+
+
+class RemovalQueue:
+    """
+    延迟移除队列。
+    一帧中被kill的精灵先只是标记为已死亡，留在所有精灵列表中，直到帧末调用flush时，
+    每个精灵列表只整理一次，一次性移除其中所有已死亡的精灵。同一个精灵在一帧中被多次kill只会移除一次
+    """
+
+    def __init__(self):
+        # 已死亡的精灵。用字典保存，既可以快速判断，又保持kill的先后顺序
+        self._pending = {}
+        self._requested = 0
+        self._coalesced = 0
+        self.last = RemovalStats(0, 0, 0, 0)
+        # 开始运行以来的统计
+        self.total = RemovalStats(0, 0, 0, 0)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, sprite):
+        return sprite in self._pending
+
+    def defer(self, sprite):
+        """
+        把精灵标记为已死亡，帧末再移除
+        :param sprite: 精灵
+        :return: None
+        """
+        self._requested += 1
+        if sprite in self._pending:
+            self._coalesced += 1
+        elif sprite.sprite_lists:
+            self._pending[sprite] = None
+        else:
+            # 不在任何精灵列表中，没有需要整理的列表，直接完成清理
+            sprite.remove_from_sprite_lists()
+
+    def is_dead(self, sprite):
+        """
+        :param sprite: 精灵
+        :return: 精灵是否已经被kill（不论是否已经从精灵列表中移除）
+        """
+        return sprite in self._pending or not sprite.sprite_lists
+
+    def flush(self):
+        """
+        移除本帧中所有已死亡的精灵，之后再调用每个精灵的remove_from_sprite_lists，
+        让它们完成自己的清理工作（比如离开子弹引擎、回到对象池）
+        :return: RemovalStats
+        """
+        pending = self._pending
+        requested = self._requested
+        coalesced = self._coalesced
+        self._pending = {}
+        self._requested = 0
+        self._coalesced = 0
+
+        by_list = {}
+        for sprite in pending:
+            for sprite_list in sprite.sprite_lists:
+                by_list.setdefault(sprite_list, []).append(sprite)
+        for sprite_list, sprites in by_list.items():
+            remove_sprites(sprite_list, sprites)
+        for sprite in pending:
+            sprite.remove_from_sprite_lists()
+
+        self.last = RemovalStats(requested, len(pending), coalesced, len(by_list))
+        self.total = RemovalStats(*(total + last for total, last in zip(self.total, self.last)))
+        return self.last
@@ -0,0 +1,176 @@
+import argparse
+import importlib
+import json
+import os
+import time
+from functools import wraps
+
+from Libs.headless import SimulationResult
+
+
+__all__ = ["InputRecorder", "ReplayController", "create_view", "load_recording", "recorded", "replay"]
+
+
+# 录像格式改变时增加这个数字
+REPLAY_VERSION = 1
+
+
+def _plain(value):
+    # 手柄等对象无法保存，也不影响游戏逻辑，重放时传入None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return None
+
+
+def recorded(method):
+    """
+    装饰GameView的输入处理方法：GameView.recorder不为None时，把这次调用记录下来，之后可以原样重放。
+    记录的是调用时已经完成的逻辑步数，重放时在同一步之前调用同一个方法，因此得到的是完全相同的一局游戏
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args):
+        if self.recorder is not None:
+            self.recorder.record(self.steps, name, args)
+        return method(self, *args)
+
+    return wrapper
+
+
+class InputRecorder:
+    """
+    录制一局游戏中GameView收到的所有输入，连同随机数种子等开局参数一起保存为一个JSON文件
+    """
+
+    def __init__(self, path, game, seed, step, boss_fight=False, boss_health=None):
+        """
+        :param path: 录像文件的路径
+        :param game: 游戏模块名，"main"或"ishar_mla"
+        :param seed: 本局的随机数种子
+        :param step: 逻辑每一步推进的时间
+        :param boss_fight: 是否直接从Boss战开始
+        :param boss_health: Boss的初始血量，None：使用GameView的默认值
+        """
+        self.path = path
+        self.header = {"version": REPLAY_VERSION, "game": game, "seed": seed, "step": step,
+                       "boss_fight": boss_fight, "boss_health": boss_health}
+        # 每一项为[已完成的逻辑步数, 方法名, 参数...]
+        self.events = []
+
+    def __len__(self):
+        return len(self.events)
+
+    def record(self, step, name, args):
+        """
+        记录一次输入
+        :param step: 输入发生时已经完成的逻辑步数
+        :param name: GameView中处理这次输入的方法名
+        :param args: 方法的参数
+        :return: None
+        """
+        self.events.append([step, name, *map(_plain, args)])
+
+    def save(self, steps, result=None):
+        """
+        把录像写入文件。可以多次调用，每次都会覆盖之前保存的内容
+        :param steps: 目前为止完成的逻辑步数
+        :param result: 游戏结果，None：游戏尚未结束
+        :return: 录像文件的路径
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        recording = dict(self.header, steps=steps, result=result, events=self.events)
+        with open(self.path, "w") as file:
+            json.dump(recording, file, separators=(",", ":"))
+        return self.path
+
+
+class ReplayController:
+    """
+    重放时代替手柄的对象。游戏每一步从手柄读取左摇杆的位置，这里的值来自录下的摇杆事件
+    """
+
+    def __init__(self):
+        self.leftx = 0
+        self.lefty = 0
+
+
+def load_recording(path):
+    """
+    读取录像文件
+    :param path: 录像文件的路径
+    :return: 字典，内容见InputRecorder.save
+    """
+    with open(path) as file:
+        recording = json.load(file)
+    if recording.get("version") != REPLAY_VERSION:
+        raise ValueError(f"Unsupported replay version: {recording.get('version')}")
+    return recording
+
+
+def _apply(view, name, args):
+    # 手柄的连接与断开需要换成ReplayController，其余输入直接交给GameView同名的方法
+    if name == "on_connect":
+        view.joystick = ReplayController()
+        return
+    if name == "on_disconnect":
+        view.joystick = None
+        return
+    if name == "on_stick_motion" and args[1] == "leftstick" and view.joystick is not None:
+        view.joystick.leftx, view.joystick.lefty = args[2], args[3]
+    getattr(view, name)(*args)
+
+
+def replay(view, recording, stop_when_over=True):
+    """
+    在无窗口模式下尽可能快地重放一局游戏：每一步之前输入这一步录下的所有事件，再推进一步逻辑
+    :param view: 以headless=True和录像中的随机数种子创建的GameView
+    :param recording: load_recording得到的录像
+    :param stop_when_over: 游戏结束后是否提前停止
+    :return: SimulationResult，其中frames为推进的逻辑步数
+    """
+    if not getattr(view, "headless", False):
+        raise ValueError("只能在以headless=True创建的GameView中重放")
+    events = recording["events"]
+    step = recording["step"]
+    index = 0
+    start = time.perf_counter()
+    for current in range(recording["steps"]):
+        while index < len(events) and events[index][0] <= current:
+            _apply(view, events[index][1], events[index][2:])
+            index += 1
+        view.simulate(step)
+        if stop_when_over and view.game_result is not None:
+            break
+    wall_time = time.perf_counter() - start
+    return SimulationResult(view.steps, view.steps * step, wall_time, view.game_result)
+
+
+def create_view(recording):
+    """
+    按录像的开局参数创建无窗口的GameView
+    :param recording: load_recording得到的录像
+    :return: GameView
+    """
+    game = importlib.import_module(recording["game"])
+    kwargs = {"boss_fight": recording["boss_fight"], "headless": True, "seed": recording["seed"]}
+    if recording["boss_health"] is not None:
+        kwargs["boss_health"] = recording["boss_health"]
+    return game.GameView(**kwargs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="在没有显示器的情况下尽可能快地重放录下的一局游戏")
+    parser.add_argument("recording", help="录像文件，游戏以--record运行时生成")
+    parser.add_argument("--repeat", type=int, default=1, help="重放的次数")
+    arguments = parser.parse_args()
+
+    data = load_recording(arguments.recording)
+    for _ in range(arguments.repeat):
+        outcome = replay(create_view(data), data)
+        matched = outcome.result == data["result"] and outcome.frames == data["steps"]
+        print(f"{outcome.frames} steps, {outcome.game_time:.1f}s game time in {outcome.wall_time:.3f}s "
+              f"({outcome.ticks_per_second:.0f} ticks/s), {len(data['events'])} inputs, "
+              f"result: {outcome.result} ({'matches' if matched else 'differs from'} the recording)")
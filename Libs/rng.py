@@ -0,0 +1,60 @@
+import random
+
+
+__all__ = ["RandomService", "RNG"]
+
+
+class RandomService:
+    """
+    游戏使用的随机数服务。
+    每个子系统（敌人生成，Boss AI，掉落，背景，战斗）拥有各自独立的随机数流，
+    某个子系统多抽或少抽一次随机数不会影响其他子系统，给定同一个种子就能逐帧复现同一局游戏
+    """
+    STREAMS = ("spawning", "boss", "drops", "background", "combat")
+
+    def __init__(self, seed=None):
+        """
+        :param seed: 随机数种子，None：随机选取一个种子
+        """
+        self.seed_value = None
+        self.spawning: random.Random = random.Random()
+        self.boss: random.Random = random.Random()
+        self.drops: random.Random = random.Random()
+        self.background: random.Random = random.Random()
+        self.combat: random.Random = random.Random()
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """
+        重新设置所有随机数流的种子
+        每个流的种子由总种子和流的名字共同决定，因此各个流之间互不相关
+        :param seed: 随机数种子，一个整数。None：随机选取一个种子
+        :return: 实际使用的种子
+        """
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+        self.seed_value = seed
+        for name in self.STREAMS:
+            # 以字符串作为种子时，Python会对其做sha512，结果与PYTHONHASHSEED无关
+            getattr(self, name).seed(f"{seed}-{name}")
+        return seed
+
+    def get_state(self):
+        """
+        获取所有随机数流的当前状态，可以之后用set_state恢复
+        :return: 字典，格式为：流的名字：该流的状态
+        """
+        return {name: getattr(self, name).getstate() for name in self.STREAMS}
+
+    def set_state(self, state):
+        """
+        恢复get_state获取的状态
+        :param state: get_state的返回值
+        :return: None
+        """
+        for name in self.STREAMS:
+            getattr(self, name).setstate(state[name])
+
+
+# 整个游戏共用的随机数服务
+RNG = RandomService()
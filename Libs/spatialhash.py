@@ -0,0 +1,98 @@
+import arcade
+
+
+__all__ = ["SpatialGrid"]
+
+
+class SpatialGrid:
+    """
+    均匀网格空间哈希，用于快速找出可能发生碰撞的精灵。
+    子弹每一帧都会移动，arcade自带的空间哈希需要在每次移动时重新计算，代价很高。
+    这个网格在每一帧开始检测碰撞前整体重建一次，之后每次查询只需检查精灵附近格子中的精灵，
+    而不是整个精灵列表
+    """
+
+    def __init__(self, cell_size=128):
+        """
+        :param cell_size: 每个格子的边长，单位为像素。应当与精灵的大小相当
+        """
+        self.cell_size = cell_size
+        # 格子坐标：该格子中的(插入顺序, 精灵)列表
+        self._cells = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _cell_range(self, sprite):
+        # collision_radius就是arcade在精确检测前做粗略检测时使用的半径，用它确定精灵覆盖的格子不会漏掉任何碰撞
+        radius = sprite.collision_radius
+        size = self.cell_size
+        return (int((sprite.center_x - radius) // size), int((sprite.center_x + radius) // size),
+                int((sprite.center_y - radius) // size), int((sprite.center_y + radius) // size))
+
+    def rebuild(self, sprites):
+        """
+        清空网格，并把sprites中的所有精灵放入网格
+        :param sprites: 精灵列表
+        :return: None
+        """
+        cells = self._cells = {}
+        count = 0
+        for order, sprite in enumerate(sprites):
+            count += 1
+            entry = (order, sprite)
+            left, right, bottom, top = self._cell_range(sprite)
+            for x in range(left, right + 1):
+                for y in range(bottom, top + 1):
+                    bucket = cells.get((x, y))
+                    if bucket is None:
+                        cells[(x, y)] = [entry]
+                    else:
+                        bucket.append(entry)
+        self._count = count
+
+    def remove(self, sprite):
+        """
+        从网格中移除一个精灵，比如子弹在本帧击中敌人后被销毁时
+        :param sprite: 需要移除的精灵
+        :return: None
+        """
+        left, right, bottom, top = self._cell_range(sprite)
+        removed = False
+        for x in range(left, right + 1):
+            for y in range(bottom, top + 1):
+                bucket = self._cells.get((x, y))
+                if not bucket:
+                    continue
+                for index, entry in enumerate(bucket):
+                    if entry[1] is sprite:
+                        del bucket[index]
+                        removed = True
+                        break
+        if removed:
+            self._count -= 1
+
+    def nearby(self, sprite):
+        """
+        获取与sprite位于相同格子中的所有精灵
+        :param sprite: 需要查询的精灵
+        :return: 列表，按照精灵放入网格时的顺序排列
+        """
+        found = {}
+        left, right, bottom, top = self._cell_range(sprite)
+        for x in range(left, right + 1):
+            for y in range(bottom, top + 1):
+                bucket = self._cells.get((x, y))
+                if bucket:
+                    for order, one in bucket:
+                        found[order] = one
+        return [found[order] for order in sorted(found)]
+
+    def collides_with(self, sprite):
+        """
+        获取网格中与sprite碰撞的所有精灵，结果与sprite.collides_with_list(原列表)相同
+        :param sprite: 需要查询的精灵
+        :return: 列表，按照精灵放入网格时的顺序排列
+        """
+        return [one for one in self.nearby(sprite) if one is not sprite and arcade.check_for_collision(sprite, one)]
@@ -0,0 +1,151 @@
+import heapq
+import itertools
+
+
+__all__ = ["Task", "Timeline"]
+
+
+class Task:
+    """
+    在Timeline中运行的一个脚本
+    """
+
+    def __init__(self, script, owner=None):
+        self.script = script
+        self.owner = owner
+        self.done = False
+
+    def cancel(self):
+        """
+        停止这个脚本，它不会再被继续执行。已经结束的脚本调用也没有问题
+        :return: None
+        """
+        if self.done:
+            return
+        self.done = True
+        try:
+            self.script.close()
+        except ValueError:
+            # 脚本在执行过程中取消了自己，Timeline执行完这一步后不会再继续它
+            pass
+
+
+class Timeline:
+    """
+    以生成器（协程）的形式运行技能脚本的时间线。
+    脚本中每次yield一个数字，表示等待多少秒后继续执行；yield None表示等到下一次advance再继续。比如：
+
+    def shot():
+        for _ in range(8):
+            yield 0.75
+            发射一发子弹
+
+    所有脚本共用同一个时间游标，由一个时钟项目（每帧调用一次advance）统一推进，
+    同时运行再多的脚本也只占用一个调度项目。唤醒时间按脚本自己的节奏精确累加，不受帧率影响；
+    一次advance跨过多个唤醒时间时，会按时间先后依次执行，因此可以用fast_forward直接快进若干秒
+    """
+
+    def __init__(self, clock=None):
+        """
+        :param clock: 推进时间线的pyglet时钟，比如GameView.clock_not_paused。None：需要自己调用advance
+        """
+        self.time = 0
+        # 堆，元素为(唤醒时间, 序号, Task)。序号保证同一时间唤醒的脚本按加入的先后执行
+        self._waiting = []
+        # 等待下一次advance的脚本
+        self._next_tick = []
+        self._counter = itertools.count()
+        # 开始运行以来执行脚本的次数
+        self.steps = 0
+        if clock is not None:
+            clock.schedule(self.advance)
+
+    def __len__(self):
+        return len(self._waiting) + len(self._next_tick)
+
+    def run(self, script, owner=None):
+        """
+        开始运行一个脚本。脚本会立刻执行到第一个yield处
+        :param script: 生成器，即调用生成器函数得到的对象
+        :param owner: 脚本的所有者，比如发动技能的Boss，用于cancel_owner
+        :return: Task
+        """
+        task = Task(script, owner)
+        self._step(task, self.time)
+        return task
+
+    def cancel_owner(self, owner):
+        """
+        停止某个所有者的所有脚本
+        :param owner: run时传入的所有者
+        :return: None
+        """
+        for _, _, task in self._waiting:
+            if task.owner is owner:
+                task.cancel()
+        for task in self._next_tick:
+            if task.owner is owner:
+                task.cancel()
+        self._waiting = [item for item in self._waiting if not item[2].done]
+        heapq.heapify(self._waiting)
+        self._next_tick = [task for task in self._next_tick if not task.done]
+
+    def clear(self):
+        """
+        停止所有脚本
+        :return: None
+        """
+        for _, _, task in self._waiting:
+            task.cancel()
+        for task in self._next_tick:
+            task.cancel()
+        self._waiting.clear()
+        self._next_tick.clear()
+
+    def advance(self, delta_time):
+        """
+        把时间游标向前推进delta_time秒，按时间先后执行所有到时间的脚本
+        :param delta_time: 推进的时间，单位为秒
+        :return: None
+        """
+        end = self.time + delta_time
+        next_tick, self._next_tick = self._next_tick, []
+        for task in next_tick:
+            if not task.done:
+                self._step(task, self.time)
+        while self._waiting and self._waiting[0][0] <= end:
+            wake, _, task = heapq.heappop(self._waiting)
+            if not task.done:
+                self._step(task, wake)
+        self.time = end
+
+    def fast_forward(self, seconds, step=None):
+        """
+        快进若干秒，用于测试或跳过演出
+        :param seconds: 快进的时间，单位为秒
+        :param step: 每次推进的时间。yield None的脚本每次推进只会执行一次；None：一次推进完
+        :return: None
+        """
+        if step is None:
+            self.advance(seconds)
+            return
+        end = self.time + seconds
+        while self.time + step < end:
+            self.advance(step)
+        self.advance(end - self.time)
+
+    def _step(self, task, wake):
+        # 执行脚本到下一个yield。执行期间时间游标停在脚本的唤醒时间，脚本中再run的新脚本也从这个时间算起
+        self.time = wake
+        self.steps += 1
+        try:
+            delay = next(task.script)
+        except StopIteration:
+            task.done = True
+            return
+        if task.done:
+            return
+        if delay is None or delay <= 0:
+            self._next_tick.append(task)
+        else:
+            heapq.heappush(self._waiting, (wake + delay, next(self._counter), task))
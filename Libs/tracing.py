@@ -0,0 +1,187 @@
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+
+__all__ = ["Tracer", "TRACER", "TRACE_ENV", "trace_views", "traced"]
+
+
+# 设置了这个环境变量时，整个运行过程会被记录下来，在退出时以Chrome trace格式写入它指定的文件，
+# 可以用chrome://tracing或者https://ui.perfetto.dev打开。比如：PLANEFIGHT_TRACE=trace.json python main.py
+# 用环境变量而不是命令行参数开启，是为了连导入游戏模块时加载的资源也能记录到
+TRACE_ENV = "PLANEFIGHT_TRACE"
+# 内存中最多保留的事件数量，超出后丢弃最早的事件。每帧大约二三十个事件，足够记录十几分钟
+MAX_EVENTS = 500000
+# 界面切换单独显示在这个线程号下，与真实的线程号区分开
+VIEW_TID = 0
+
+
+class Tracer:
+    """
+    以Chrome trace事件格式记录程序各部分的耗时。
+    每个事件只是在内存中追加一个元组，不做格式化也不写文件，退出时才一次性转换并写入，记录本身不会造成卡顿。
+    每个区间记录为一个完整事件（"X"，即开始时间加持续时间），等价于一对开始/结束事件
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        """
+        :param max_events: 内存中最多保留的事件数量
+        """
+        self.enabled = False
+        self.path = None
+        # 元素为(阶段类型, 名字, 类别, 开始时间, 持续时间, 线程号, 参数)，时间为time.perf_counter()的秒数
+        self._events = deque(maxlen=max_events)
+        self._threads = {}
+        self._origin = time.perf_counter()
+
+    def start(self, path):
+        """
+        开始记录，程序退出时自动写入文件
+        :param path: trace文件的路径
+        :return: None
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        self.path = path
+        atexit.register(self.flush)
+
+    def _tid(self):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        return tid
+
+    def complete(self, name, category, start, duration, args=None, tid=None):
+        """
+        记录一个区间
+        :param name: 区间的名字
+        :param category: 类别，比如"phase"，"clock"，"asset"，"view"
+        :param start: 开始时间，time.perf_counter()的返回值
+        :param duration: 持续时间，单位为秒
+        :param args: 附加的信息，一个字典，None：没有
+        :param tid: 显示在哪个线程号下，None：当前线程
+        :return: None
+        """
+        self._events.append(("X", name, category, start, duration, self._tid() if tid is None else tid, args))
+
+    @contextmanager
+    def span(self, name, category, args=None):
+        """
+        记录with块的耗时，没有开始记录时什么都不做
+        :param name: 区间的名字
+        :param category: 类别
+        :param args: 附加的信息，None：没有
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, time.perf_counter() - start, args)
+
+    def __len__(self):
+        return len(self._events)
+
+    def to_json(self):
+        """
+        把记录的事件转换为Chrome trace格式
+        :return: 可以直接json.dump的字典
+        """
+        pid = os.getpid()
+        trace_events = [{"ph": "M", "name": "process_name", "pid": pid, "tid": VIEW_TID,
+                         "args": {"name": "PlaneFight"}},
+                        {"ph": "M", "name": "thread_name", "pid": pid, "tid": VIEW_TID, "args": {"name": "views"}}]
+        for tid, thread_name in self._threads.items():
+            trace_events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid,
+                                 "args": {"name": thread_name}})
+        for phase, name, category, start, duration, tid, args in self._events:
+            event = {"ph": phase, "name": name, "cat": category, "pid": pid, "tid": tid,
+                     "ts": round((start - self._origin) * 1e6, 3), "dur": round(duration * 1e6, 3)}
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def flush(self, path=None):
+        """
+        把记录的事件写入文件。程序退出时会自动调用
+        :param path: trace文件的路径，None：使用start时指定的路径
+        :return: 写入的路径，没有指定路径时返回None
+        """
+        path = path or self.path
+        if path is None:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_json(), file, separators=(",", ":"), ensure_ascii=False)
+        return path
+
+
+# 整个游戏共用的记录器，默认不记录。解码动图的子进程也会继承环境变量，但只有主进程记录，否则子进程退出时会覆盖文件
+TRACER = Tracer()
+if os.environ.get(TRACE_ENV) and multiprocessing.parent_process() is None:
+    TRACER.start(os.environ[TRACE_ENV])
+
+
+def traced(category, name=None):
+    """
+    记录函数每次调用耗时的装饰器。没有开始记录时只多一次判断。
+    函数的第一个参数是字符串（比如资源路径）时，会作为附加信息一同记录
+    :param category: 类别
+    :param name: 区间的名字，None：使用函数的限定名
+    """
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                detail = {"resource": args[0]} if args and isinstance(args[0], str) else None
+                TRACER.complete(label, category, start, time.perf_counter() - start, detail)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_views(window):
+    """
+    记录窗口的界面切换：每次切换的耗时（包括旧界面的on_hide_view与新界面的on_show_view），
+    以及每个界面显示了多久，后者单独显示在"views"一行中。没有开始记录时什么都不做
+    :param window: arcade.Window
+    :return: None
+    """
+    if not TRACER.enabled:
+        return
+    show_view = window.show_view
+    shown_since = [time.perf_counter()]
+
+    def traced_show_view(new_view):
+        old_view = window.current_view
+        old_name = type(old_view).__name__ if old_view is not None else "None"
+        new_name = type(new_view).__name__
+        now = time.perf_counter()
+        if old_view is not None:
+            TRACER.complete(old_name, "view", shown_since[0], now - shown_since[0], tid=VIEW_TID)
+        with TRACER.span(f"{old_name} -> {new_name}", "view"):
+            show_view(new_view)
+        shown_since[0] = time.perf_counter()
+
+    window.show_view = traced_show_view
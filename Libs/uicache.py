@@ -0,0 +1,56 @@
+import arcade.gui
+
+
+__all__ = ["CachedUIManager"]
+
+
+class CachedUIManager(arcade.gui.UIManager):
+    """
+    只在有控件需要重绘时才更新离屏缓冲的UIManager。
+    arcade的UIManager会把控件画在离屏的Surface上，但每一帧仍然会重新排版所有控件、切换到Surface的帧缓冲并遍历整棵控件树。
+    控件被标记为需要重绘时（改变文字、图片、位置等都会调用trigger_render）会顺带把所在的CachedUIManager标记为dirty，
+    没有被标记时跳过排版与渲染，直接把缓存的Surface作为一个四边形画到屏幕上
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = True
+        # 调用draw的次数与其中重新生成离屏缓冲的次数
+        self.frames = 0
+        self.rebuilds = 0
+
+    def trigger_render(self):
+        super().trigger_render()
+        self.dirty = True
+
+    def draw(self):
+        self.frames += 1
+        if self.dirty:
+            self.rebuilds += 1
+            super().draw()
+            # 排版时改变的控件已经在这一次draw中重绘，之后才清除标记
+            self.dirty = False
+            return
+        for layer in sorted(self.children.keys()):
+            self._get_surface(layer).draw()
+
+
+_widget_trigger_render = arcade.gui.UIWidget.trigger_render
+
+
+def _trigger_render(widget):
+    """
+    替换UIWidget.trigger_render：标记控件需要重绘，同时把控件树根部的CachedUIManager标记为dirty。
+    只在控件改变时调用，沿父控件向上找到根部的开销远小于每一帧遍历整棵控件树
+    :param widget: 需要重绘的控件
+    :return: None
+    """
+    _widget_trigger_render(widget)
+    parent = widget.parent
+    while isinstance(parent, arcade.gui.UIWidget):
+        parent = parent.parent
+    if isinstance(parent, CachedUIManager):
+        parent.dirty = True
+
+
+arcade.gui.UIWidget.trigger_render = _trigger_render
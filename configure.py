@@ -8,7 +8,7 @@ PAUSE_KEY = key.E
 # 开火键
 FIRE_KEY = key.SPACE
 
-# 显示fps的按键
+# 显示帧时间统计（帧时间柱状图，p50/p95/p99/最大帧时间，超出预算的帧数）的按键
 FPS_KEY = key.F
 
 # 显示或者隐藏得分的按键
@@ -16,3 +16,6 @@ SCORE_KEY = key.X
 
 # 显示或隐藏UI的按键
 UI_KEY = key.C
+
+# 显示或隐藏每一帧各阶段耗时统计的按键
+PROFILER_KEY = key.P
@@ -2,15 +2,33 @@ import random
 import math
 import json
 import sys
+import time
+import argparse
 from Libs.BackgroundMusicPlayer import BackgroundMusicPlayer
-from Libs.clock import BadClock
-from Libs.livingsprite import LivingSprite, load_textures_pair_from_webp
+from Libs.atlas import install_atlas, prime_gpu_atlas
+from Libs.bulletengine import BulletEngine, ManagedBullet
+from Libs.clock import BadClock, GameClock
+from Libs.collision import CollisionMatrix
+from Libs.events import Signal
+from Libs.fixedstep import FixedTimestep, Interpolator
+from Libs.frametimes import FrameTimeMonitor, FrameTimeOverlay
+from Libs.headless import attach_headless_window
+from Libs.rng import RNG
+from Libs.spatialhash import SpatialGrid
+from Libs.timeline import Timeline
+from Libs.tracing import trace_views, traced
+from Libs.uicache import CachedUIManager
+from Libs.lazyasset import LazyAssetGroup, preload, start_loading
+from Libs.livingsprite import LivingSprite, start_textures_pairs_from_webp
+from Libs.pool import PooledSprite, SpritePool
+from Libs.profiler import FrameProfiler
+from Libs.removal import RemovalQueue
+from Libs.replay import InputRecorder, recorded
+from Libs import danmaku
 from typing import Union
 from collections import namedtuple
 import arcade
 import arcade.gui
-import pyglet.clock
-import pyglet.media
 
 from configure import *
 import os
@@ -22,6 +40,8 @@ HARD = 'hard'
 
 # 为能兼容Pyinstaller而使用，在这里修改工作目录，这样arcade才能在打包好的东西中找到其需要的文件
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
+# 所有图片都从打包好的图集中读取，启动时只需要读取一个文件
+install_atlas()
 
 # 屏幕的宽，高，标题
 SCREEN_WIDTH = 1080
@@ -44,10 +64,15 @@ ENEMY = ["images/enemy1.png", "images/enemy2.png",
          "images/enemy3.png", "images/enemy4.png"]
 
 BOSS = arcade.load_texture("dlc_ishar_mla/images/normal_start.png")
-BOSS_MOVE = load_textures_pair_from_webp("dlc_ishar_mla/images/normal_move.webp", scale=3)
-BOSS_SKILL = load_textures_pair_from_webp("dlc_ishar_mla/images/normal_heal.webp", scale=3)
-BOSS_DIE = load_textures_pair_from_webp("dlc_ishar_mla/images/normal_die.webp", scale=1)
-BOSS_ATTACK = load_textures_pair_from_webp("dlc_ishar_mla/images/normal_attack.webp", scale=3)
+# Boss的动画只在Boss战中用到，加载时间又很长，因此不在导入时加载：main在创建窗口前开始解码，进入游戏界面时在后台等待解码完成，
+# 见GameView.on_show_view。四个动图作为一组加载，没有缓存时会在多个进程中同时解码
+BOSS_ANIMATIONS = LazyAssetGroup(start_textures_pairs_from_webp, [
+    ("dlc_ishar_mla/images/normal_move.webp", 3),
+    ("dlc_ishar_mla/images/normal_heal.webp", 3),
+    ("dlc_ishar_mla/images/normal_die.webp", 1),
+    ("dlc_ishar_mla/images/normal_attack.webp", 3),
+])
+BOSS_MOVE, BOSS_SKILL, BOSS_DIE, BOSS_ATTACK = (BOSS_ANIMATIONS.asset(index) for index in range(4))
 BOSS_ATTACK_1 = "dlc_ishar_mla/images/boss_attack_1.png"
 BOSS_THROW_BALL = 'dlc_ishar_mla/images/throw_ball.png'
 BOSS_TEARS = "dlc_ishar_mla/images/tear.png"
@@ -92,7 +117,15 @@ PLAYER_SPEED = 480  # 像素/秒
 BULLET_SPEED = 300
 PLAYER_BULLET_SPEED = 500
 
+# 游戏逻辑每一步推进的时间，单位为秒；以及每帧最多推进的步数，卡顿太久时游戏会短暂变慢，而不是一步跳过很长的时间
+SIM_STEP = 1 / 60
+MAX_SIM_STEPS = 5
+# 录制每一局输入的目录，以--record运行时设置，None：不录制。录像可以用python -m Libs.replay重放
+RECORD_DIR = None
+
 BOSS_KILLED = False
+# 得分超过该值时Boss出现
+BOSS_SCORE = 0
 
 # 读取难度设置（即多少分对应什么样的敌人）
 with open("difficulty.json", 'r') as f:
@@ -224,6 +257,17 @@ class TextureButton(arcade.gui.UITextureButton):
                 self.current_indexing %= len(self.many_textures)
                 self.texture = self.many_textures[self.current_indexing]
 
+    @property
+    def texture(self):
+        return self._tex
+
+    @texture.setter
+    def texture(self, value):
+        # 材质没有改变时不需要重绘，否则界面的缓存每一帧都会失效
+        if value is not self._tex:
+            self._tex = value
+            self.trigger_render()
+
 
 class HealthBar:
     """
@@ -245,12 +289,25 @@ class HealthBar:
         for one in self.buttons:
             self.box.add(one.with_space_around(right=5))
 
-    def on_update(self, _):
-        health = self.game_scene.player.health
-        for i in range(health):
-            self.buttons[i].texture = self.health_images[1]
-        for i in range(health, self.game_scene.player.total_health):
-            self.buttons[i].texture = self.health_images[0]
+    def watch(self, sprite):
+        """
+        订阅精灵的血量变化，之后只在血量改变时才更新图标
+        :param sprite: 需要显示血量的LivingSprite，一般就是玩家
+        :return: None
+        """
+        sprite.health_changed.connect(self.show)
+        self.show(sprite.health)
+
+    def show(self, health):
+        """
+        按血量显示实心与空心的图标。只替换确实需要改变的图标，避免无谓的重绘
+        :param health: 血量
+        :return: None
+        """
+        for i in range(self.game_scene.player.total_health):
+            texture = self.health_images[1] if i < health else self.health_images[0]
+            if self.buttons[i].texture is not texture:
+                self.buttons[i].texture = texture
 
 
 class Benefit(arcade.Sprite):
@@ -349,6 +406,9 @@ BENEFITS = {Healer: HEAL, Shield: SHIELD, UnlimitedBullet: UNLIMITED_BULLET[1],
 
 
 class Boss(LivingSprite):
+    # 被玩家子弹击中时是否会挡住（销毁）子弹
+    stops_bullets = True
+
     def __init__(self, textures: Union[arcade.Texture, tuple[arcade.Texture]], game_scene, scale=1, health=1000,
                  invincible=0.1, total_health=1000,
                  cur_texture=0, change_time=0.1, *args, **kwargs):
@@ -383,6 +443,8 @@ class Boss(LivingSprite):
         self.tears = [True, True, True]
 
         self._energy = 0
+        # 能量改变时发出，参数为新的能量
+        self.energy_changed = Signal()
         self.energy_cd = 1
         self.total_energy_cd = 1
 
@@ -397,14 +459,9 @@ class Boss(LivingSprite):
         # 在召唤出小飞机之后，Boss巡航边界会变小一点点
         self.right_range = SCREEN_WIDTH
         self.left_range = 0
-        # Boss所有的技能，释放时会用random.choice()随机选择一个
+        # Boss所有的技能，释放时会用RNG.boss.choice()随机选择一个
         self.skills = [self.shot, self.throw_ball, self.heal, self.tear]
 
-        # 用于计算Boss技能效果并控制技能结束的变量
-        self._skill1_count = None
-        self._skill2_count = None
-        self._skill3_count = None
-
     @property
     def towards(self):
         return self._towards
@@ -424,7 +481,10 @@ class Boss(LivingSprite):
 
     @energy.setter
     def energy(self, new):
-        self._energy = new if new <= 125 else 125
+        new = new if new <= 125 else 125
+        if new != self._energy:
+            self._energy = new
+            self.energy_changed.emit(new)
 
     def on_damaged(self, bullet):
         if self.invincible <= 0:
@@ -540,9 +600,9 @@ class Boss(LivingSprite):
                                           lambda: self.many_bullets(),
                                           lambda: setattr(self, "large", False)])
         # 满足两个条件：技能cd为0，主cd为0时每帧有10%概率释放
-        if random.random() < 0.1 and len(skill_available) > 0 >= self.main_cd and not self.large:
+        if RNG.boss.random() < 0.1 and len(skill_available) > 0 >= self.main_cd and not self.large:
             self.main_cd = self.main_cd_total
-            skill = random.choice(skill_available)
+            skill = RNG.boss.choice(skill_available)
             index = self.skills.index(skill)
             self.skill_cd[index] = self.total_skill_cd[index]
             self.walking = False
@@ -560,10 +620,10 @@ class Boss(LivingSprite):
         随机掉落一种补给，位置在屏幕中心的（300， 250）区域内
         :return:
         """
-        benefit = random.choice(list(BENEFITS.keys()))
-        b = benefit(BENEFITS[benefit], center=(random.randint(int(SCREEN_WIDTH / 2 - 150), int(SCREEN_WIDTH / 2 + 150)),
-                                               random.randint(int(SCREEN_HEIGHT / 2 - 150),
-                                                              int(SCREEN_HEIGHT / 2 + 100))),
+        benefit = RNG.drops.choice(list(BENEFITS.keys()))
+        b = benefit(BENEFITS[benefit],
+                    center=(RNG.drops.randint(int(SCREEN_WIDTH / 2 - 150), int(SCREEN_WIDTH / 2 + 150)),
+                            RNG.drops.randint(int(SCREEN_HEIGHT / 2 - 150), int(SCREEN_HEIGHT / 2 + 100))),
                     scale=2)
         self.game_view.game_scene.add_sprite("Benefit", b)
 
@@ -598,33 +658,29 @@ class Boss(LivingSprite):
         一技能：Boss持续发射5发子弹，间隔1秒，弱追踪我方。
         :return:
         """
-        self.game_view.clock_not_paused.schedule_interval_soft(self._shot, 0.75)
-        self._skill1_count = 0
+        self.game_view.timeline.run(self._shot(), owner=self)
 
-    def _shot(self, _=None):
-        bullet = ForcastBullet((self.center_x, self.bottom), image=BOSS_ATTACK_1, speed=500,
-                               player=self.game_view.player, scale=0.75)
-        self.game_view.game_scene.add_sprite("EnemyBullet", bullet)
-        self._skill1_count += 1
-        if self._skill1_count >= 5:
-            self.game_view.clock_not_paused.unschedule(self._shot)
+    def _shot(self):
+        for _ in range(5):
+            yield 0.75
+            bullet = self.game_view.forcast_bullet_pool.acquire((self.center_x, self.bottom), image=BOSS_ATTACK_1,
+                                                                speed=500, player=self.game_view.player, scale=0.75)
+            self.game_view.add_bullet("EnemyBullet", bullet)
 
     def throw_ball(self):
         """
         二技能：2.5秒内，Boss每隔0.5秒发射一发追踪弹，一共发射5发，弱追踪1.5秒，在其尽头停住，持续对碰撞的玩家造成伤害
         :return:
         """
-        self._skill2_count = 0
-        self.game_view.clock_not_paused.schedule_interval_soft(self._throw_ball, 2)
+        self.game_view.timeline.run(self._throw_ball(), owner=self)
 
-    def _throw_ball(self, _=None):
-        self._skill2_count += 1
-        bullet = ThrowBall(BOSS_THROW_BALL,
-                           player_position=(self.game_view.player.center_x, self.game_view.player.center_y),
-                           center=(self.center_x, self.bottom))
-        self.game_view.game_scene.add_sprite("Enemy", bullet)
-        if self._skill2_count >= 3:
-            self.game_view.clock_not_paused.unschedule(self._throw_ball)
+    def _throw_ball(self):
+        for _ in range(3):
+            yield 2
+            bullet = ThrowBall(BOSS_THROW_BALL,
+                               player_position=(self.game_view.player.center_x, self.game_view.player.center_y),
+                               center=(self.center_x, self.bottom))
+            self.game_view.game_scene.add_sprite("Enemy", bullet)
 
     def heal(self):
         """
@@ -640,8 +696,9 @@ class Boss(LivingSprite):
                 one_enemy.health += 3
 
     def tear(self):
-        tear = Tear(image=BOSS_TEARS, center=(random.randint(int(SCREEN_WIDTH / 2 - 100), int(SCREEN_WIDTH / 2 + 100)),
-                                              random.randint(int(SCREEN_HEIGHT / 2 - 30), int(SCREEN_HEIGHT / 2 + 30))),
+        tear = Tear(image=BOSS_TEARS,
+                    center=(RNG.boss.randint(int(SCREEN_WIDTH / 2 - 100), int(SCREEN_WIDTH / 2 + 100)),
+                            RNG.boss.randint(int(SCREEN_HEIGHT / 2 - 30), int(SCREEN_HEIGHT / 2 + 30))),
                     boss=self)
         self.game_view.game_scene.add_sprite("Enemy", tear)
 
@@ -651,28 +708,27 @@ class Boss(LivingSprite):
         子弹在发射时锁定玩家位置，并持续沿着该方向移动
         :return:
         """
-        self._skill3_count = 0
-        self.game_view.clock_not_paused.schedule_interval_soft(self._many_bullets, 0.1)
-
-    def _many_bullets(self, _=None):
-        self._skill3_count += 1
-        bullet1 = ForcastBullet((self.center_x, self.bottom), image=BOSS_ATTACK_1, speed=350,
-                                player=self.game_view.player)
-        bullet2 = Bullet((self.center_x - 30, self.bottom), BOSS_ATTACK_1, chase=SIMPLE, speed=350,
-                         player=self.game_view.player)
-        bullet3 = Bullet((self.center_x + 30, self.bottom), BOSS_ATTACK_1, chase=SIMPLE, speed=350,
-                         player=self.game_view.player)
-        self.game_view.game_scene.add_sprite("EnemyBullet", bullet1)
-        self.game_view.game_scene.add_sprite("EnemyBullet", bullet2)
-        self.game_view.game_scene.add_sprite("EnemyBullet", bullet3)
-        # 在该技能期间无法释放其他技能
-        self.main_cd = self.main_cd_total
-
-        if self._skill3_count >= 50:
-            self.game_view.clock_not_paused.unschedule(self._many_bullets)
+        self.game_view.timeline.run(self._many_bullets(), owner=self)
+
+    def _many_bullets(self):
+        for _ in range(50):
+            yield 0.1
+            # 中间一发预判玩家的走位，两侧各一发瞄准玩家当前的位置
+            player = self.game_view.player
+            volley = danmaku.concat(
+                danmaku.predictive((self.center_x, self.bottom), player.position,
+                                   (player.average_change_x, player.average_change_y), 350,
+                                   bounds=(SCREEN_WIDTH, SCREEN_HEIGHT)),
+                danmaku.aimed([(self.center_x - 30, self.bottom), (self.center_x + 30, self.bottom)],
+                              player.position, 350))
+            self.game_view.add_volley("EnemyBullet", self.game_view.bullet_pool, volley, BOSS_ATTACK_1, player=player)
+            # 在该技能期间无法释放其他技能
+            self.main_cd = self.main_cd_total
 
 
 class Enemy(LivingSprite):
+    stops_bullets = True
+
     def __init__(self, image, game_view, scale: int = 1, speed: float = 180, fire: bool = False,
                  fire_cd: float = 1, chase: str = NO, center_x=None, center_y=None, health=None, damage=None,
                  invincible=0.5, benefit_chance=0.15,
@@ -706,7 +762,7 @@ class Enemy(LivingSprite):
         else:
             self.center_y = center_y
         if center_x is None:
-            self.center_x = random.randint(50, SCREEN_WIDTH - 50)
+            self.center_x = RNG.spawning.randint(50, SCREEN_WIDTH - 50)
         else:
             self.center_x = center_x
 
@@ -733,9 +789,12 @@ class Enemy(LivingSprite):
         :return:
         """
         for one_bullet in self.bullets:
-            one_bullet.kill()
-        if random.random() < self.benefit_chance:
-            benefit = random.choice(list(BENEFITS.keys()))
+            # 子弹可能早已被销毁，并被对象池分配给了别人
+            if one_bullet.owner is self:
+                one_bullet.kill()
+        self.bullets.clear()
+        if RNG.drops.random() < self.benefit_chance:
+            benefit = RNG.drops.choice(list(BENEFITS.keys()))
             self.game_view.game_scene.add_sprite("Benefit",
                                                  benefit(image=BENEFITS[benefit], scale=2,
                                                          center=(self.center_x, self.center_y)))
@@ -746,14 +805,16 @@ class Enemy(LivingSprite):
             return None
         if self.fire_cd <= 0:
             self.fire_cd = self.total_fire_cd
-            bullet = Bullet(center=(self.center_x, self.bottom), chase=self.chase, player=self.game_view.player)
-            self.game_view.game_scene.add_sprite("EnemyBullet", bullet)
+            bullet = self.game_view.bullet_pool.acquire(center=(self.center_x, self.bottom), chase=self.chase,
+                                                        player=self.game_view.player)
+            bullet.owner = self
+            self.game_view.add_bullet("EnemyBullet", bullet)
             self.bullets.append(bullet)
 
 
-class Bullet(arcade.Sprite):
+class Bullet(ManagedBullet):
     def __init__(self, center, image=None, chase=NO, player=None, damage=1, chase_time=1.0, speed=BULLET_SPEED,
-                 **kwargs):
+                 scale=1, turn_rate=math.inf):
         """
         创建一颗子弹
         :param center: 子弹的中心位置
@@ -763,11 +824,21 @@ class Bullet(arcade.Sprite):
         :param damage: 该子弹命中时造成的伤害
         :param chase_time: 子弹追踪的时间长度，在chase=HARD时才有用
         :param speed: 子弹的速度
+        :param scale: 子弹的缩放大小
+        :param turn_rate: 强追踪时每秒最多转过的角度，单位为度。inf：每帧直接对准目标
         """
+        super().__init__()
+        self.reset(center, image, chase, player, damage, chase_time, speed, scale, turn_rate)
+
+    def reset(self, center, image=None, chase=NO, player=None, damage=1, chase_time=1.0, speed=BULLET_SPEED,
+              scale=1, turn_rate=math.inf):
+        """
+        重新设置子弹，从对象池中取出旧子弹时使用，参数与__init__相同
+        """
+        super().reset()
         if image is None:
-            super().__init__(random.choice(BULLET), **kwargs)
-        else:
-            super().__init__(image, **kwargs)
+            image = RNG.combat.choice(BULLET)
+        self.set_image(image, scale)
         self.chase = chase
         self.player = player
         self.center_x = center[0]
@@ -787,28 +858,20 @@ class Bullet(arcade.Sprite):
 
         self.damage = damage
         self.speed = speed
+        self.turn_rate = turn_rate
 
-    def on_update(self, delta_time=None):
-        self.chase_time -= delta_time
-        if self.player is not None and self.player.health <= 0:
-            self.kill()
-        if self.chase == HARD and self.chase_time > 0:
-            x_diff = self.player.center_x - self.center_x
-            y_diff = self.player.center_y - self.center_y
-            angle = math.atan2(y_diff, x_diff)
-            self.angle = math.degrees(angle) - 90
-            self.change_y = math.sin(angle) * self.speed
-            self.change_x = math.cos(angle) * self.speed
-        if self.left > SCREEN_WIDTH or self.right < 0 or self.bottom > SCREEN_HEIGHT or self.top < 0:
-            self.kill()
-
-        self.center_y += self.change_y * delta_time
-        self.center_x += self.change_x * delta_time
 
+class ForcastBullet(ManagedBullet):
+    def __init__(self, center, player: "Player", image=None, speed=BULLET_SPEED, scale=1):
+        super().__init__()
+        self.reset(center, player, image, speed, scale)
 
-class ForcastBullet(arcade.Sprite):
-    def __init__(self, center, player: "Player", image=None, speed=BULLET_SPEED, *args, **kwargs):
-        super().__init__(image, *args, **kwargs)
+    def reset(self, center, player: "Player", image=None, speed=BULLET_SPEED, scale=1):
+        """
+        重新设置子弹，从对象池中取出旧子弹时使用，参数与__init__相同
+        """
+        super().reset()
+        self.set_image(image, scale)
         self.center_x = center[0]
         self.center_y = center[1]
         self.player = player
@@ -844,6 +907,8 @@ class ForcastBullet(arcade.Sprite):
 
 
 class ThrowBall(arcade.Sprite):
+    stops_bullets = True
+
     def __init__(self, image, player_position, center, scale=1, damage=1, speed=300, living_time=10, **kwargs):
         super().__init__(image, scale, **kwargs)
         self.invincible = 0
@@ -886,6 +951,9 @@ class ThrowBall(arcade.Sprite):
 
 
 class Tear(arcade.Sprite):
+    # 玩家子弹会穿过眼泪：子弹只会把眼泪标记为被触碰过，自己不会被销毁
+    stops_bullets = False
+
     def __init__(self, image, center, boss, scale=1, damage=1, speed=300, living_time=10, **kwargs):
         super().__init__(image, scale, **kwargs)
         self.invincible = 0
@@ -924,14 +992,27 @@ class Tear(arcade.Sprite):
             self.texture = arcade.load_texture(BOSS_TEARS_TOUCHED)
 
 
-class PlayerBullet(arcade.Sprite):
+class PlayerBullet(ManagedBullet):
     def __init__(self, images, go_through=False):
-        super().__init__(images)
+        super().__init__()
+        self.reset(images, go_through)
+
+    def reset(self, images, go_through=False):
+        """
+        重新设置子弹，从对象池中取出旧子弹时使用，参数与__init__相同
+        """
+        super().reset()
+        self.set_image(images)
         self.through = go_through
         self.damage = 1
+        self.change_y = PLAYER_BULLET_SPEED
+
+    def cull_box(self, width, height):
+        # 玩家的子弹只会向上飞，顶端超出屏幕就销毁，不会打中还没飞进屏幕的敌人
+        return -math.inf, math.inf, -math.inf, height - self.height / 2
 
     def on_update(self, delta_time: float = 1 / 60):
-        self.center_y += delta_time * PLAYER_BULLET_SPEED
+        self.center_y += delta_time * self.change_y
         if self.top > SCREEN_HEIGHT:
             self.kill()
 
@@ -1036,11 +1117,11 @@ class Player(LivingSprite):
     def fire(self):
         if self.fire_cd <= 0 < self.health:
             self.fire_cd = self.total_fire_cd
-            player_bullet = PlayerBullet(PLAYER_BULLET, self.bullet_through)
+            player_bullet = self.game_view.player_bullet_pool.acquire(PLAYER_BULLET, self.bullet_through)
             player_bullet.center_x = self.center_x
             player_bullet.center_y = self.top
-            self.game_view.game_scene.add_sprite("PlayerBullet", player_bullet)
-            if PLAY_FIRE_SOUND:
+            self.game_view.add_bullet("PlayerBullet", player_bullet)
+            if PLAY_FIRE_SOUND and self.game_view.fire_sound is not None:
                 self.game_view.fire_sound.play(volume=0.3)
 
     def kill(self):
@@ -1054,7 +1135,7 @@ class Player(LivingSprite):
             self.set_texture(1)
         elif delta_health > 0:
             self.set_texture(2)
-        self.game_view.clock_not_paused.schedule_once(lambda event: self.set_texture(0), 0.5)
+        self.game_view.clock_not_paused.reschedule_once_keyed((self, "texture"), lambda event: self.set_texture(0), 0.5)
 
     def unlimited_bullets(self, duration=5):
         """
@@ -1095,10 +1176,10 @@ class Player(LivingSprite):
 
     def _chase_bullets_boss(self, _):
         self._enemy_killed += 1
-        bullet = Bullet((self.center_x, self.center_y), CHASE_FIRE[1], chase=HARD, player=self.game_view.boss,
-                        damage=15,
-                        chase_time=9999999, speed=600)
-        self.game_view.game_scene.add_sprite("PlayerBullet", bullet)
+        bullet = self.game_view.bullet_pool.acquire((self.center_x, self.center_y), CHASE_FIRE[1], chase=HARD,
+                                                    player=self.game_view.boss, damage=15,
+                                                    chase_time=9999999, speed=600)
+        self.game_view.add_bullet("PlayerBullet", bullet)
         if self._enemy_killed > 4:
             self.game_view.clock_not_paused.unschedule(self._chase_bullets_boss)
 
@@ -1106,9 +1187,9 @@ class Player(LivingSprite):
         for enemy in self.game_view.game_scene.get_sprite_list("Enemy"):
             if enemy not in self._enemy and self._enemy_killed + len(self._enemy) <= 6:
                 self._enemy.append(enemy)
-                bullet = Bullet((self.center_x, self.center_y), CHASE_FIRE[1], chase=HARD, player=enemy, damage=10,
-                                chase_time=9999999, speed=600)
-                self.game_view.game_scene.add_sprite("PlayerBullet", bullet)
+                bullet = self.game_view.bullet_pool.acquire((self.center_x, self.center_y), CHASE_FIRE[1], chase=HARD,
+                                                            player=enemy, damage=10, chase_time=9999999, speed=600)
+                self.game_view.add_bullet("PlayerBullet", bullet)
 
         for one in self._enemy:
             one: arcade.Sprite
@@ -1123,16 +1204,24 @@ class Player(LivingSprite):
     def on_damaged(self, bullet):
         if self.bullet_through:
             # 一技能期间有50%概率不受攻击伤害
-            if random.random() < 0.5:
+            if RNG.combat.random() < 0.5:
                 super().on_damaged(bullet)
         else:
             super().on_damaged(bullet)
 
 
-class Explosion(arcade.Sprite):
+class Explosion(PooledSprite):
     def __init__(self, center):
         super().__init__()
+        self.reset(center)
+
+    def reset(self, center):
+        """
+        重新设置爆炸效果，从对象池中取出旧的爆炸时使用，参数与__init__相同
+        """
+        super().reset()
         self.textures = EXPLODE_LIST
+        self.cur_texture_index = 0
         self.center_x = center[0]
         self.center_y = center[1]
         self.life_time = 0.5
@@ -1151,9 +1240,10 @@ class Explosion(arcade.Sprite):
 
 def spawn_enemy(game_view, numbers: list[int], difficulty: str):
     game_view: GameView
-    for _ in range(random.randint(*numbers)):
+    for _ in range(RNG.spawning.randint(*numbers)):
         while 1:
-            plane = Enemy(random.choice(ENEMY), game_view, speed=random.randint(*DIFFICULTY[difficulty]["speed"]),
+            plane = Enemy(RNG.spawning.choice(ENEMY), game_view,
+                          speed=RNG.spawning.randint(*DIFFICULTY[difficulty]["speed"]),
                           health=DIFFICULTY[difficulty]["health"], fire=DIFFICULTY[difficulty]["fire"],
                           fire_cd=DIFFICULTY[difficulty]["fire_cd"], chase=DIFFICULTY[difficulty]["chase"])
             if not plane.collides_with_list(game_view.game_scene["Enemy"]):
@@ -1477,16 +1567,138 @@ class GameView(arcade.View):
     游戏的主程序
     """
 
-    def __init__(self, boss_fight=False, boss_health=500):
-        super().__init__()
-        # 以下为游戏界面内容
-        # 游戏中的GUI
+    @traced("view")
+    def __init__(self, boss_fight=False, boss_health=500, headless=False, seed=None):
+        """
+        :param boss_fight: 是否直接从Boss战开始
+        :param boss_health: Boss的初始血量
+        :param headless: 是否以无窗口模式运行。该模式下不会创建窗口，UI和声音，只运行游戏逻辑；
+        游戏内的时间也不再跟随真实时间，每次调用update时前进delta_time秒
+        :param seed: 本局游戏的随机数种子。相同的种子与相同的输入会得到完全相同的一局游戏，None：随机选取
+        """
+        self.headless = headless
+        self.seed = RNG.seed(seed)
+        # 已经推进的逻辑步数，以及录制本局输入的InputRecorder
+        self.steps = 0
+        self.recorder = None
+        if RECORD_DIR is not None and not headless:
+            self.recorder = InputRecorder(os.path.join(RECORD_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.seed}.json"),
+                                          "ishar_mla", self.seed, SIM_STEP, boss_fight, boss_health)
+        if headless:
+            attach_headless_window(self, SCREEN_WIDTH, SCREEN_HEIGHT)
+        else:
+            super().__init__()
         self.boss_dead = False
-        self.sound_player = BackgroundMusicPlayer()
+        # 是否已经开始在后台加载Boss的动画
+        self.boss_preloaded = False
+        # 游戏结果，None：游戏尚未结束，True：胜利，False：失败
+        self.game_result = None
+        self.sound_player = None if headless else BackgroundMusicPlayer()
 
         self.showed = False
         self.boss_health = boss_health
-        self.game_ui_manager = arcade.gui.UIManager()
+        self.fire_sound = None
+        # 帧时间统计，数据来自arcade.enable_timings()
+        self.frame_times = FrameTimeMonitor()
+        if not headless:
+            # 以下为游戏界面内容
+            self.setup_ui()
+            self.fire_sound = arcade.Sound(FIRE_SOUND, streaming=False)
+            # 似乎arcade的音频系统在第一次播放声音前不会加载它
+            # 但加载音频会导致肉眼可见的卡顿
+            # 因此这里以零音量播放一次，让其提前加载好
+            self.fire_sound.play(volume=0)
+        # 建立游戏对象
+        self.game_scene: arcade.Scene = arcade.Scene()
+        self.paused = False
+        if headless:
+            # 无窗口模式下，游戏时间只会在调用update时前进
+            self.sim_timer = BadClock()
+            self.clock = GameClock(time_function=self.sim_timer)
+        else:
+            self.sim_timer = None
+            self.clock = GameClock()
+        self.bad_timer = BadClock()
+        self.clock_not_paused = GameClock(time_function=self.bad_timer, name="clock_not_paused")
+        # Boss技能等脚本的时间线，随游戏一起暂停
+        self.timeline = Timeline(self.clock_not_paused)
+        # 固定步长推进游戏逻辑，绘制时在两步之间插值。无窗口模式下不绘制，不需要插值
+        self.timestep = FixedTimestep(SIM_STEP, MAX_SIM_STEPS)
+        self.interpolator = None if headless else Interpolator()
+
+        # 控制方向所用的变量
+        self.up_pressed = False
+        self.down_pressed = False
+        self.left_pressed = False
+        self.right_pressed = False
+
+        self.firing = False
+
+        self.boss_fight = boss_fight
+        self.boss = None
+
+        self.game_scene = arcade.Scene()
+        self.game_scene.add_sprite_list("Background")
+        self.game_scene.add_sprite_list("Benefit")
+        self.game_scene.add_sprite_list("Enemy")
+        self.game_scene.add_sprite_list("EnemyBullet")
+        self.game_scene.add_sprite_list("Player")
+        self.game_scene.add_sprite_list("PlayerBullet")
+        self.game_scene.add_sprite_list("Explosion")
+        # 子弹数量可能很多，碰撞检测时用空间哈希网格代替逐个检查
+        self.player_bullet_grid = SpatialGrid()
+        self.enemy_bullet_grid = SpatialGrid()
+        # 两个子弹层的移动与出界销毁由子弹引擎批量完成
+        self.bullet_engines = {"EnemyBullet": BulletEngine(SCREEN_WIDTH, SCREEN_HEIGHT),
+                               "PlayerBullet": BulletEngine(SCREEN_WIDTH, SCREEN_HEIGHT)}
+        # 对象池中的精灵被kill时先只标记为已死亡，在每一帧的最后统一移除
+        self.removals = RemovalQueue()
+        # 频繁创建、销毁的精灵从对象池中取出，销毁后回到池中等待重复利用
+        self.bullet_pool = SpritePool(Bullet, self.removals)
+        self.player_bullet_pool = SpritePool(PlayerBullet, self.removals)
+        self.explosion_pool = SpritePool(Explosion, self.removals)
+        self.forcast_bullet_pool = SpritePool(ForcastBullet, self.removals)
+
+        # 玩家
+        self.player = Player(self, PLAYER)
+        self.player.center_x = SCREEN_WIDTH / 2
+        self.player.center_y = self.player.height / 2
+        self.game_scene.add_sprite("Player", self.player)
+        # 碰撞矩阵：只检查登记过的层之间的碰撞，按登记的顺序检查，每一对层由自己的处理函数响应
+        self.collisions = CollisionMatrix(self.game_scene, self.removals.is_dead)
+        self.collisions.bind("Player", lambda: (self.player,))
+        self.collisions.add("Player", "Benefit", self.on_benefit_touched, name="benefit_collision")
+        self.collisions.add("Enemy", "PlayerBullet", self.on_enemy_shot, grid=self.player_bullet_grid,
+                            name="player_bullet_collision")
+        self.collisions.add("Player", "EnemyBullet", self.on_player_shot, grid=self.enemy_bullet_grid,
+                            when=lambda: self.player.health > 0, name="enemy_bullet_collision")
+        self.collisions.add("Player", "Enemy", self.on_player_crashed, when=lambda: self.player.health > 0,
+                            name="player_enemy_collision")
+
+        self.paused = False
+        self.fps_enable = False
+        # 按阶段统计每一帧的耗时
+        self.profiler = FrameProfiler()
+        self.profiler_enable = False
+        self.ui_enable = True
+        self._score = 0
+        # 得分改变时发出，参数为新的得分
+        self.score_changed = Signal()
+        self.score_enable = True
+        if not headless:
+            self.connect_hud()
+        if self.boss_fight:
+            self.start_boss_fight()
+        elif not headless:
+            self.sound_player.play_bgm(BATTLE_SOUND)
+
+    def setup_ui(self):
+        """
+        创建游戏中的GUI。无窗口模式下不会调用该函数
+        :return: None
+        """
+        # 游戏界面只在有控件改变时才重新渲染，其余时候直接绘制缓存好的画面
+        self.game_ui_manager = CachedUIManager()
         self.game_v_box = arcade.gui.UIBoxLayout()
         self.exit_button = arcade.gui.UIFlatButton(0, 0, text="Main Menu",
                                                    width=200,
@@ -1500,19 +1712,16 @@ class GameView(arcade.View):
 
         self.pause_image = arcade.load_texture("images/pause_square.png")
         self.continue_image = arcade.load_texture("images/play.png")
-        self.fire_sound = arcade.Sound(FIRE_SOUND, streaming=False)
-        # 似乎arcade的音频系统在第一次播放声音前不会加载它
-        # 但加载音频会导致肉眼可见的卡顿
-        # 因此这里以零音量播放一次，让其提前加载好
-        self.fire_sound.play(volume=0)
 
         self.game_v_box_right = arcade.gui.UIBoxLayout()
         self.pause_button = arcade.gui.UITextureButton(texture=arcade.load_texture("images/pause_square.png"))
         self.pause_button.on_click = self.on_click_pause
         self.game_v_box_right.add(self.pause_button)
 
-        self.fps_text = arcade.gui.UITextArea(text="FPS: 0", height=30, width=200,
-                                              font_name="Kenney Future", font_size=20)
+        # 左下角的帧时间统计，代替原来只显示平均FPS的文字
+        self.frame_time_overlay = FrameTimeOverlay(self.frame_times, 30, 30)
+        self.profiler_text = arcade.Text("", 30, SCREEN_HEIGHT - 220, font_name="Courier New", font_size=12,
+                                         multiline=True, width=600, anchor_y="top")
 
         self.player_skill1_texture = [arcade.load_texture(UNLIMITED_BULLET[0]),
                                       arcade.load_texture(UNLIMITED_BULLET[1]),
@@ -1568,13 +1777,6 @@ class GameView(arcade.View):
             anchor_y='top',
             child=self.game_v_box_right
         ))
-        self.game_ui_manager.add(arcade.gui.UIAnchorWidget(
-            anchor_x="left",
-            align_x=30,
-            align_y=30,
-            anchor_y="bottom",
-            child=self.fps_text
-        ))
         self.game_ui_manager.add(arcade.gui.UIAnchorWidget(
             anchor_x='left',
             align_x=30,
@@ -1582,47 +1784,80 @@ class GameView(arcade.View):
             anchor_y='top',
             child=self.health_bar.box
         ))
-        # 建立游戏对象
-        self.game_scene: arcade.Scene = arcade.Scene()
-        self.paused = False
-        self.clock = pyglet.clock.Clock()
-        self.bad_timer = BadClock()
-        self.clock_not_paused = pyglet.clock.Clock(time_function=self.bad_timer)
 
-        # 控制方向所用的变量
-        self.up_pressed = False
-        self.down_pressed = False
-        self.left_pressed = False
-        self.right_pressed = False
+    @property
+    def score(self):
+        return self._score
 
-        self.firing = False
+    @score.setter
+    def score(self, new):
+        if new != self._score:
+            self._score = new
+            self.score_changed.emit(new)
 
-        self.boss_fight = boss_fight
+    def connect_hud(self):
+        """
+        让界面上显示数值的控件订阅这些数值的改变，只在数值真正改变时才重新生成文字或图标。无窗口模式下不会调用该函数
+        :return: None
+        """
+        self.score_changed.connect(self.render_score)
+        self.health_bar.watch(self.player)
+        self.render_score()
 
-        self.game_scene = arcade.Scene()
-        self.game_scene.add_sprite_list("Background")
-        self.game_scene.add_sprite_list("Benefit")
-        self.game_scene.add_sprite_list("Enemy")
-        self.game_scene.add_sprite_list("EnemyBullet")
-        self.game_scene.add_sprite_list("Player")
-        self.game_scene.add_sprite_list("PlayerBullet")
-        self.game_scene.add_sprite_list("Explosion")
+    def render_score(self, _=None):
+        self.score_text.text = f"Score: {self.score}" if self.score_enable else ""
 
-        # 玩家
-        self.player = Player(self, PLAYER)
-        self.player.center_x = SCREEN_WIDTH / 2
-        self.player.center_y = self.player.height / 2
-        self.game_scene.add_sprite("Player", self.player)
+    def render_boss_health(self, _=None):
+        self.boss_health_bar.text = f"{self.boss.health} / {self.boss.total_health}"
 
-        self.paused = False
-        self.fps_enable = False
-        self.ui_enable = True
-        self.score = 0
-        self.score_enable = True
-        if self.boss_fight:
-            self.boss = Boss(textures=BOSS, game_scene=self, health=self.boss_health, total_health=500, invincible=0.1,
-                             center_x=SCREEN_WIDTH / 2, center_y=SCREEN_HEIGHT - 180, scale=1)
-            self.game_scene.add_sprite("Enemy", self.boss)
+    def render_boss_energy(self, _=None):
+        self.boss_energy_bar.text = f"Energy: {self.boss.energy} / 125"
+
+    def pool_stats(self):
+        """
+        获取各个对象池的统计信息，用于监控
+        :return: 字典，格式为：精灵种类：PoolStats(正在使用, 空闲, 最大同时使用, 一共创建)
+        """
+        pools = {"Bullet": self.bullet_pool,
+                "PlayerBullet": self.player_bullet_pool,
+                "Explosion": self.explosion_pool,
+                "ForcastBullet": self.forcast_bullet_pool}
+        return {name: pool.stats for name, pool in pools.items()}
+
+    def add_bullet(self, layer, bullet):
+        """
+        把一颗子弹加入场景，并交给该层的子弹引擎推进
+        :param layer: 子弹所在的层，"EnemyBullet"或"PlayerBullet"
+        :param bullet: 子弹
+        :return: 无
+        """
+        self.game_scene.add_sprite(layer, bullet)
+        self.bullet_engines[layer].add(bullet)
+
+    def add_volley(self, layer, pool, volley, *args, **kwargs):
+        """
+        把弹幕发射器计算好的一次齐射加入场景：从对象池中取出所有子弹，一次性加入精灵列表与子弹引擎
+        :param layer: 子弹所在的层
+        :param pool: 子弹的对象池
+        :param volley: Libs.danmaku.Volley
+        :param args: 传给pool.acquire的其余参数（位置之后的参数），比如图片
+        :param kwargs: 同上
+        :return: 子弹的列表
+        """
+        bullets = danmaku.acquire_volley(pool, volley, *args, **kwargs)
+        self.game_scene[layer].extend(bullets)
+        self.bullet_engines[layer].add_many(bullets, volley.x, volley.y, volley.vx, volley.vy)
+        return bullets
+
+    def start_boss_fight(self):
+        """
+        生成Boss，并切换到Boss战的UI与音乐
+        :return: None
+        """
+        self.boss = Boss(textures=BOSS, game_scene=self, health=self.boss_health, total_health=500, invincible=0.1,
+                         center_x=SCREEN_WIDTH / 2, center_y=SCREEN_HEIGHT - 180, scale=1)
+        self.game_scene.add_sprite("Enemy", self.boss)
+        if not self.headless:
             self.game_ui_manager.add(arcade.gui.UIAnchorWidget(
                 anchor_x='center',
                 anchor_y='top',
@@ -1637,17 +1872,71 @@ class GameView(arcade.View):
                 align_x=50,
                 child=self.boss_energy_bar
             ))
+            self.boss.health_changed.connect(self.render_boss_health)
+            self.boss.energy_changed.connect(self.render_boss_energy)
+            self.render_boss_health()
+            self.render_boss_energy()
             self.sound_player.play_bgm(BOSS_SOUND, volume=0.7)
-            self.player.center_x = SCREEN_WIDTH / 2
-            self.player.center_y = 0
-        else:
-            self.sound_player.play_bgm(BATTLE_SOUND)
+        self.player.center_x = SCREEN_WIDTH / 2
+        self.player.center_y = 0
 
     def on_draw(self):
+        self.profiler.start()
         self.clear()
+        if self.interpolator is not None:
+            self.interpolator.apply(self.timestep.alpha)
         self.game_scene.draw()
+        if self.interpolator is not None:
+            self.interpolator.restore()
+        self.profiler.lap("draw_scene")
         if self.ui_enable:
             self.game_ui_manager.draw()
+            if self.fps_enable:
+                self.frame_time_overlay.draw()
+        self.profiler.lap("draw_ui")
+        if self.profiler_enable:
+            self.profiler_text.draw()
+        self.profiler.stop("draw")
+
+    def toggle_frame_times(self):
+        """
+        显示或隐藏左下角的帧时间统计
+        :return: None
+        """
+        self.fps_enable = not self.fps_enable
+        if self.headless:
+            return
+        if self.fps_enable:
+            self.frame_time_overlay.refresh()
+            self.clock.schedule_interval(self.frame_time_overlay.refresh, 0.25)
+        else:
+            self.clock.unschedule(self.frame_time_overlay.refresh)
+
+    def toggle_profiler(self):
+        """
+        显示或隐藏各阶段耗时的统计
+        :return: None
+        """
+        self.profiler_enable = not self.profiler_enable
+        if self.headless:
+            return
+        if self.profiler_enable:
+            self.update_profiler_text()
+            self.clock.schedule_interval(self.update_profiler_text, 0.5)
+        else:
+            self.clock.unschedule(self.update_profiler_text)
+
+    def update_profiler_text(self, _=None):
+        removals = self.removals.total
+        self.profiler_text.text = (f"{self.profiler.report()}\n"
+                                   f"removals: {removals.removed} in {removals.batches} batches, "
+                                   f"{removals.coalesced} coalesced\n"
+                                   f"ui: {self.game_ui_manager.rebuilds} rebuilds / {self.game_ui_manager.frames} frames\n"
+                                   f"clock: {self.clock.queue_depth} + {self.clock_not_paused.queue_depth} queued, "
+                                   f"{self.clock.coalesced + self.clock_not_paused.coalesced} coalesced, "
+                                   f"{len(self.timeline)} scripts\n"
+                                   f"steps: {self.timestep.last_steps} last frame, "
+                                   f"{self.timestep.dropped:.2f}s dropped")
 
     def update(self, delta_time: float):
         """
@@ -1655,164 +1944,209 @@ class GameView(arcade.View):
         :param delta_time: 两次调用的间隔
         :return: 无
         """
+        self.profiler.start()
+        if self.headless:
+            self.sim_timer.update(delta_time)
         diff = self.clock.tick()
-        self.clock_not_paused.tick()
-        if self.fps_enable:
-            self.fps_text.text = f"FPS: {arcade.get_fps():.2f}"
-        else:
-            self.fps_text.text = ''
-        if self.score_enable:
-            self.score_text.text = f"Score: {self.score}"
+        self.profiler.lap("clock")
+        if not self.headless:
+            self.update_texts()
+        self.profiler.lap("texts")
+
+        if self.paused:
+            self.timestep.reset()
+            if self.interpolator is not None:
+                self.interpolator.clear()
+            self.removals.flush()
         else:
-            self.score_text.text = f""
-        if not self.paused:
-            # 先更新内容
-            self.game_scene.on_update(diff)
-            self.game_scene.update_animation(diff)
-            self.health_bar.on_update(diff)
-            self.bad_timer.update(diff)
-
-            # 更新玩家技能提示
-            if self.player.skills[0]:
-                self.player_skill1_hint.enabled = True
-                if self.skill_selected == 1:
-                    self.player_skill1_image.enabled = True
-                else:
-                    self.player_skill1_image.enabled = False
-                    self.player_skill1_image.texture = self.player_skill1_texture[1]
-            else:
-                self.player_skill1_hint.enabled = False
-                self.player_skill1_hint.texture = self.player_skill1_texture[2][1]
-                self.player_skill1_image.enabled = False
-                self.player_skill1_image.texture = self.player_skill1_texture[0]
-
-            if self.player.skills[1]:
-                self.player_skill2_hint.enabled = True
-                if self.skill_selected == 2:
-                    self.player_skill2_image.enabled = True
-                else:
-                    self.player_skill2_image.enabled = False
-                    self.player_skill2_image.texture = self.player_skill2_texture[1]
+            # 逻辑按固定的步长推进，与帧率无关。无窗口模式下直接使用传入的时间，不受计时误差影响
+            steps = self.timestep.advance(delta_time if self.headless else diff)
+            for step in range(steps):
+                if self.interpolator is not None and step == steps - 1:
+                    self.interpolator.snapshot(self.game_scene.sprite_lists)
+                self.simulate(self.timestep.step)
+                if self.game_result is not None:
+                    break
+            # 技能提示只在游戏进行时更新，每帧一次
+            if not self.headless:
+                self.update_skill_hints()
+        self.profiler.stop("update")
+
+    def simulate(self, delta_time):
+        """
+        推进一步游戏逻辑
+        :param delta_time: 这一步推进的时间，即SIM_STEP
+        :return: 无
+        """
+        self.steps += 1
+        self.clock_not_paused.tick()
+        # 先更新内容，子弹层交给子弹引擎推进，其他层逐个调用精灵的on_update
+        for name in self.game_scene.name_mapping:
+            if name in self.bullet_engines:
+                self.bullet_engines[name].step(delta_time)
             else:
-                self.player_skill2_hint.enabled = False
-                self.player_skill2_hint.texture = self.player_skill2_texture[2][1]
-                self.player_skill2_image.enabled = False
-                self.player_skill2_image.texture = self.player_skill2_texture[0]
-
-            # 然后，随机生成敌人
-            if len(self.game_scene['Enemy']) <= 2 and random.random() < 0.1 and not self.boss_fight:
-                spawn_enemy(self, [1, 3], str(get_difficulty(self.score)))
-
-            # 检查Boss该不该生成
-            if self.score > 0 and not self.boss_fight:
-                self.boss_fight = True
-                for one_enemy in self.game_scene["Enemy"]:
-                    one_enemy.benefit_chance = 0
-                    one_enemy.kill()
-                self.boss = Boss(textures=BOSS, game_scene=self, health=self.boss_health, total_health=500,
-                                 invincible=0.1,
-                                 center_x=SCREEN_WIDTH / 2, center_y=SCREEN_HEIGHT - 180, scale=1)
-                self.game_scene.add_sprite("Enemy", self.boss)
-                self.game_ui_manager.add(arcade.gui.UIAnchorWidget(
-                    anchor_x='center',
-                    anchor_y='top',
-                    align_y=-30,
-                    align_x=50,
-                    child=self.boss_health_bar
-                ))
-                self.game_ui_manager.add(arcade.gui.UIAnchorWidget(
-                    anchor_x='center',
-                    anchor_y='top',
-                    align_y=-80,
-                    align_x=50,
-                    child=self.boss_energy_bar
-                ))
-                self.sound_player.play_bgm(BOSS_SOUND, volume=0.7)
-                self.player.center_x = SCREEN_WIDTH / 2
-                self.player.center_y = 0
-
-            # Boss战时才更新的内容：
-            if self.boss_fight:
-                self.boss_health_bar.text = f"{self.boss.health} / {self.boss.total_health}"
-                self.boss_energy_bar.text = f"Energy: {self.boss.energy} / 125"
-
+                self.game_scene.on_update(delta_time, names=[name])
+        self.profiler.lap("scene_update")
+        self.game_scene.update_animation(delta_time)
+        self.profiler.lap("animation")
+        self.bad_timer.update(delta_time)
+
+        # 然后，随机生成敌人
+        if len(self.game_scene['Enemy']) <= 2 and RNG.spawning.random() < 0.1 and not self.boss_fight:
+            spawn_enemy(self, [1, 3], str(get_difficulty(self.score)))
+
+        # 检查Boss该不该生成
+        if self.score > BOSS_SCORE and not self.boss_fight:
+            self.boss_fight = True
+            for one_enemy in self.game_scene["Enemy"]:
+                one_enemy.benefit_chance = 0
+                one_enemy.kill()
+            self.start_boss_fight()
+
+        # 无窗口模式下没有UI，也不会展示教程
+        if not self.headless:
             if self.game_scene['Benefit'] and HINTS_STATUS['benefit']:
-                self.clock.schedule_once(self.show_benefit_hint, 0.6)
+                self.clock.schedule_once_keyed("benefit_hint", self.show_benefit_hint, 0.6)
 
             if not HINTS_STATUS['skill1'] and not HINTS_STATUS['skill2'] and HINTS_STATUS['roll']:
                 self.show_roll_hint()
 
-            # 检查玩家是否获得增益
-            for one_benefit in self.player.collides_with_list(self.game_scene["Benefit"]):
-                one_benefit: Benefit
-                if isinstance(one_benefit, UnlimitedBullet) and HINTS_STATUS['skill1']:
-                    self.clock.schedule_once(self.show_skill1_hints, 0.1)
-                elif isinstance(one_benefit, ChaseFire) and HINTS_STATUS['skill2']:
-                    self.clock.schedule_once(self.show_skill2_hints, 0.1)
-                elif isinstance(one_benefit, Healer) and HINTS_STATUS['heal']:
-                    self.clock.schedule_once(self.show_heal_hints, 0.1)
-                elif isinstance(one_benefit, Shield) and HINTS_STATUS['shield']:
-                    self.clock.schedule_once(self.show_shield_hints, 0.1)
-                one_benefit.on_touched(self.player)
-
-            # 检查玩家子弹与敌人碰撞
-            for one_enemy in self.game_scene['Enemy']:
-                one_enemy: Enemy
-                for one_bullet in one_enemy.collides_with_list(self.game_scene["PlayerBullet"]):
-                    one_enemy.on_damaged(one_bullet)
-                    if (not hasattr(one_bullet, "through") or not one_bullet.through) and not isinstance(one_enemy,
-                                                                                                         Tear):
-                        one_bullet.kill()
-                    if one_enemy.health <= 0:
-                        if not (hasattr(self, "boss") and one_enemy == self.boss):
-                            explode = Explosion((one_enemy.center_x, one_enemy.center_y))
-                            self.game_scene.add_sprite("Explosion", explode)
-                            self.score += 10
-                            break
-
-            if self.player.health > 0:
-                # 检查敌人子弹与玩家碰撞
-                for one_bullet in self.player.collides_with_list(self.game_scene["EnemyBullet"]):
-                    one_bullet.kill()
-                    self.player.on_damaged(one_bullet)
-                    if self.player.health <= 0:
-                        explode = Explosion((self.player.center_x, self.player.center_y))
-                        self.game_scene.add_sprite("Explosion", explode)
-                        break
-
-            # 检查玩家与敌人碰撞
-            if self.player.health > 0:
-                for one_enemy in self.player.collides_with_list(self.game_scene["Enemy"]):
-                    self.player.on_damaged(one_enemy)
-                    if self.player.health <= 0:
-                        explode = Explosion((self.player.center_x, self.player.center_y))
-                        self.game_scene.add_sprite("Explosion", explode)
-                        break
-                    one_enemy.on_damaged(self.player)
-                    if one_enemy.health <= 0:
-                        if not (hasattr(self, "boss") and one_enemy == self.boss):
-                            explode = Explosion((one_enemy.center_x, one_enemy.center_y))
-                            self.game_scene.add_sprite("Explosion", explode)
-                            self.score += 10
-                            break
-
-            # 检查玩家是否想开火
-            if self.firing:
-                self.player.fire()
-
-            if self.player.health <= 0:
-                self.end_game(False)
-            if self.boss_fight and self.boss.health <= 0 and not self.boss_dead:
-                self.boss_dead = True
-                self.player.invincible += 999
-                self.player.no_hurt = True
-                self.boss.invincible += 999
-                self.boss.no_hurt = True
-                self.boss.walking = False
-                for index in range(len(self.boss.skill_cd)):
-                    self.boss.skill_cd[index] += 999
-
-                self.boss.play_animation_and_stop(BOSS_DIE[self.boss.facing], lambda: self.end_game(True))
+        self.profiler.lap("spawning")
+
+        # 检查各层之间的碰撞
+        self.collisions.check(self.profiler.lap)
+
+        # 检查玩家是否想开火
+        if self.firing:
+            self.player.fire()
+        self.profiler.lap("fire")
+
+        if self.player.health <= 0:
+            self.end_game(False)
+        if self.boss_fight and self.boss.health <= 0 and not self.boss_dead:
+            self.boss_dead = True
+            self.player.invincible += 999
+            self.player.no_hurt = True
+            self.boss.invincible += 999
+            self.boss.no_hurt = True
+            self.boss.walking = False
+            for index in range(len(self.boss.skill_cd)):
+                self.boss.skill_cd[index] += 999
+            # 播放死亡动画期间，Boss还没有放完的技能不再继续
+            self.timeline.cancel_owner(self.boss)
+
+            self.boss.play_animation_and_stop(BOSS_DIE[self.boss.facing], lambda: self.end_game(True))
+        # 一次性移除这一步中被kill的精灵
+        self.removals.flush()
+        self.profiler.lap("removal")
+
+    def explode(self, sprite):
+        """
+        在精灵的位置产生爆炸效果
+        :param sprite: 爆炸的精灵
+        :return: None
+        """
+        self.game_scene.add_sprite("Explosion", self.explosion_pool.acquire((sprite.center_x, sprite.center_y)))
+
+    def on_benefit_touched(self, player, benefit):
+        """
+        碰撞处理：玩家获得增益
+        """
+        if not self.headless:
+            self.schedule_benefit_hints(benefit)
+        benefit.on_touched(player)
+
+    def on_enemy_shot(self, enemy, bullet):
+        """
+        碰撞处理：玩家子弹击中敌人。Boss被击败时由Boss战的流程处理，这里不会产生爆炸
+        :return: 敌人被击毁时返回True，不再处理它与其他子弹的碰撞
+        """
+        enemy.on_damaged(bullet)
+        if (not hasattr(bullet, "through") or not bullet.through) and enemy.stops_bullets:
+            bullet.kill()
+        if enemy.health <= 0 and enemy is not self.boss:
+            self.explode(enemy)
+            self.score += 10
+            return True
+
+    def on_player_shot(self, player, bullet):
+        """
+        碰撞处理：敌人子弹击中玩家
+        :return: 玩家被击毁时返回True
+        """
+        bullet.kill()
+        player.on_damaged(bullet)
+        if player.health <= 0:
+            self.explode(player)
+            return True
+
+    def on_player_crashed(self, player, enemy):
+        """
+        碰撞处理：玩家与敌人相撞，双方都会受到伤害
+        :return: 玩家或者敌人被击毁时返回True
+        """
+        player.on_damaged(enemy)
+        if player.health <= 0:
+            self.explode(player)
+            return True
+        enemy.on_damaged(player)
+        if enemy.health <= 0 and enemy is not self.boss:
+            self.explode(enemy)
+            self.score += 10
+            return True
+
+    def update_texts(self):
+        """
+        收集帧时间。得分等文字只在数值改变时更新，见connect_hud。无窗口模式下不会调用该函数
+        :return: None
+        """
+        self.frame_times.collect()
+
+    def update_skill_hints(self):
+        """
+        更新右侧的玩家技能提示。无窗口模式下不会调用该函数
+        :return: None
+        """
+        if self.player.skills[0]:
+            self.player_skill1_hint.enabled = True
+            if self.skill_selected == 1:
+                self.player_skill1_image.enabled = True
+            else:
+                self.player_skill1_image.enabled = False
+                self.player_skill1_image.texture = self.player_skill1_texture[1]
+        else:
+            self.player_skill1_hint.enabled = False
+            self.player_skill1_hint.texture = self.player_skill1_texture[2][1]
+            self.player_skill1_image.enabled = False
+            self.player_skill1_image.texture = self.player_skill1_texture[0]
+
+        if self.player.skills[1]:
+            self.player_skill2_hint.enabled = True
+            if self.skill_selected == 2:
+                self.player_skill2_image.enabled = True
+            else:
+                self.player_skill2_image.enabled = False
+                self.player_skill2_image.texture = self.player_skill2_texture[1]
+        else:
+            self.player_skill2_hint.enabled = False
+            self.player_skill2_hint.texture = self.player_skill2_texture[2][1]
+            self.player_skill2_image.enabled = False
+            self.player_skill2_image.texture = self.player_skill2_texture[0]
+
+    def schedule_benefit_hints(self, benefit):
+        """
+        玩家第一次捡起某种增益时，稍后展示对应的教程
+        :param benefit: 玩家捡起的增益
+        :return: None
+        """
+        if isinstance(benefit, UnlimitedBullet) and HINTS_STATUS['skill1']:
+            self.clock.schedule_once(self.show_skill1_hints, 0.1)
+        elif isinstance(benefit, ChaseFire) and HINTS_STATUS['skill2']:
+            self.clock.schedule_once(self.show_skill2_hints, 0.1)
+        elif isinstance(benefit, Healer) and HINTS_STATUS['heal']:
+            self.clock.schedule_once(self.show_heal_hints, 0.1)
+        elif isinstance(benefit, Shield) and HINTS_STATUS['shield']:
+            self.clock.schedule_once(self.show_shield_hints, 0.1)
 
     def end_game(self, win: bool):
         """
@@ -1820,6 +2154,12 @@ class GameView(arcade.View):
         :param win: 游戏是否赢了，赢：True，输：False
         :return:
         """
+        self.game_result = win
+        if self.recorder is not None:
+            self.recorder.save(self.steps, win)
+        if self.headless:
+            # 无窗口模式下只记录结果，不切换界面
+            return
         self.sound_player.stop()
         sound = arcade.Sound(WIN_SOUND if win else LOSE_SOUND, streaming=False)
         if win:
@@ -1919,6 +2259,7 @@ class GameView(arcade.View):
                              callback=lambda: HINTS_STATUS.__setitem__("roll", False))
         self.window.show_view(hint_view)
 
+    @recorded
     def on_key_press(self, symbol, modifiers):
         """Called whenever a key is pressed. """
 
@@ -1940,20 +2281,24 @@ class GameView(arcade.View):
         if symbol == FIRE_KEY:
             self.firing = True
         if symbol == FPS_KEY:
-            self.fps_enable = not self.fps_enable
-        if symbol == SCORE_KEY:
+            self.toggle_frame_times()
+        if symbol == SCORE_KEY and not self.headless:
             self.score_enable = not self.score_enable
+            self.render_score()
+        if symbol == PROFILER_KEY:
+            self.toggle_profiler()
         if symbol == arcade.key.KEY_1:
             self.player.unlimited_bullets(5)
         if symbol == arcade.key.KEY_2:
             self.player.chase_bullets()
-        if symbol == UI_KEY:
+        if symbol == UI_KEY and not self.headless:
             self.ui_enable = not self.ui_enable
             if self.ui_enable:
                 self.game_ui_manager.enable()
             else:
                 self.game_ui_manager.disable()
 
+    @recorded
     def on_key_release(self, symbol: object, modifiers):
         """Called when the user releases a key. """
 
@@ -1972,6 +2317,7 @@ class GameView(arcade.View):
         if symbol == FIRE_KEY:
             self.firing = False
 
+    @recorded
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int):
         if button == arcade.MOUSE_BUTTON_LEFT:
             self.firing = True
@@ -1981,6 +2327,7 @@ class GameView(arcade.View):
             elif self.skill_selected == 2:
                 self.player.chase_bullets()
 
+    @recorded
     def on_mouse_release(self, x: int, y: int, button: int, modifiers: int):
         if button == arcade.MOUSE_BUTTON_LEFT:
             self.firing = False
@@ -1990,6 +2337,15 @@ class GameView(arcade.View):
         # macOS下滚轮向下负的，向上正的……
         if "win32" in sys.platform:
             scroll_y = -scroll_y
+        self.select_skill_by_scroll(scroll_y)
+
+    @recorded
+    def select_skill_by_scroll(self, scroll_y):
+        """
+        按滚轮的方向选择技能。滚轮方向在不同系统中已经统一，录像在任何系统中重放都相同
+        :param scroll_y: 统一方向后的滚动量
+        :return: None
+        """
         if scroll_y > 0:
             self.skill_selected = 2
         if scroll_y < 0:
@@ -2011,6 +2367,21 @@ class GameView(arcade.View):
 
     def on_show_view(self):
         self.game_ui_manager.enable()
+        self.reset_input()
+        # 第一次进入游戏界面时，在后台等待Boss的动画解码完成。解码已经在main中开始；没有开始时（比如不经过main创建的界面）
+        # 这里已经有窗口和其他线程，不能再fork进程池，会退回在后台线程中依次解码
+        if not self.boss_preloaded:
+            self.boss_preloaded = True
+            preload(BOSS_ANIMATIONS)
+        if HINTS_STATUS['first_time']:
+            self.show_first_time_hints()
+
+    @recorded
+    def reset_input(self):
+        """
+        松开所有按键，停止移动与开火。回到游戏界面时调用，离开期间的按键不会被游戏收到
+        :return: None
+        """
         self.up_pressed = False
         self.down_pressed = False
         self.left_pressed = False
@@ -2019,14 +2390,16 @@ class GameView(arcade.View):
         self.player.change_y = 0
 
         self.firing = False
-        if HINTS_STATUS['first_time']:
-            self.show_first_time_hints()
 
     def on_hide_view(self):
         self.game_ui_manager.disable()
+        if self.recorder is not None:
+            self.recorder.save(self.steps, self.game_result)
 
     def on_click_pause(self, _=None):
         self.paused = not self.paused
+        if self.headless:
+            return
         if self.paused:
             self.pause_button.texture = self.continue_image
         else:
@@ -2149,16 +2522,29 @@ class GameOverView(arcade.View):
 
 
 def main():
+    global RECORD_DIR
+    parser = argparse.ArgumentParser(description="飞机大战")
+    parser.add_argument("--record", metavar="DIR", default=None,
+                        help="把每一局的输入录制到该目录，之后可以用python -m Libs.replay在无窗口模式下重放")
+    RECORD_DIR = parser.parse_args().record
     arcade.load_font("font/Kenney Future.ttf")
     arcade.load_font("font/华文黑体.ttf")
     arcade.enable_timings()
+    # 此时进程中还只有主线程、也没有创建窗口，是唯一可以安全地fork解码进程的时机
+    start_loading(BOSS_ANIMATIONS)
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    trace_views(window)
+    prime_gpu_atlas(window.ctx)
     arcade.set_background_color(BACKGROUND_COLOR2)
     menu_view = MenuView()
     window.show_view(menu_view)
     try:
         arcade.run()
     finally:
+        # 关闭窗口时如果还在游戏中，保存这一局到目前为止的录像
+        view = getattr(window.current_view, "game_view", window.current_view)
+        if isinstance(view, GameView) and view.recorder is not None:
+            view.recorder.save(view.steps, view.game_result)
         with open("hints.json", 'w') as file:
             json.dump(HINTS_STATUS, file, indent=4, ensure_ascii=False)
         with open("setting.txt", 'w') as file:
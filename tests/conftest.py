@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 游戏按相对路径读取图片、配置文件，测试在仓库根目录中运行；不创建窗口，只测试游戏逻辑与Libs中的工具
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import arcade
+import numpy as np
+import pytest
+
+import Libs.bulletengine
+from Libs.bulletengine import BulletEngine, ManagedBullet
+
+
+def make_bullet(x, y):
+    bullet = ManagedBullet()
+    bullet.set_image("images/laser1.png")
+    bullet.center_x = x
+    bullet.center_y = y
+    bullet.chase = "hard"
+    bullet.chase_time = 100
+    bullet.speed = 50
+    return bullet
+
+
+def make_layer(count, target):
+    sprite_list = arcade.SpriteList()
+    engine = BulletEngine(800, 600)
+    bullets = []
+    for index in range(count):
+        bullet = make_bullet(100 + index * 20, 100)
+        bullet.player = target
+        sprite_list.append(bullet)
+        engine.add(bullet)
+        bullets.append(bullet)
+    return sprite_list, engine, bullets
+
+
+def angle_buffer(sprite_list, sprite):
+    return np.frombuffer(sprite_list._sprite_angle_data, dtype=np.float32)[sprite_list.sprite_slot[sprite]]
+
+
+def assert_angles_synced(sprite_list):
+    for sprite in sprite_list:
+        assert angle_buffer(sprite_list, sprite) == pytest.approx(sprite.angle, abs=1e-4)
+
+
+@pytest.mark.parametrize("internals", [True, False])
+def test_homing_angles_follow_reassigned_slots(monkeypatch, internals):
+    monkeypatch.setattr(Libs.bulletengine, "ARCADE_INTERNALS", internals)
+    target = SimpleNamespace(center_x=400, center_y=500, health=1)
+    sprite_list, engine, bullets = make_layer(20, target)
+
+    engine.step(1 / 60)
+    assert_angles_synced(sprite_list)
+
+    # 不经过引擎，先移除再加回一颗子弹：空闲槽先进先出，它会拿到另一颗子弹留下的槽
+    bullets[5].kill()
+    moved = bullets[3]
+    old_slot = sprite_list.sprite_slot[moved]
+    sprite_list.remove(moved)
+    sprite_list.append(moved)
+    assert sprite_list.sprite_slot[moved] != old_slot
+
+    # 用__setitem__换掉一颗子弹：新精灵接手它的槽，被换掉的子弹不再属于任何列表，但仍在引擎中
+    replaced = bullets[7]
+    plain = arcade.SpriteSolidColor(4, 4, arcade.color.WHITE)
+    plain.angle = 12
+    sprite_list[sprite_list.index(replaced)] = plain
+
+    target.center_x = 100
+    engine.step(1 / 60)
+
+    assert_angles_synced(sprite_list)
+    assert plain.angle == 12
+    assert replaced.angle != 0
@@ -0,0 +1,64 @@
+import pytest
+
+from Libs.clock import BadClock, GameClock
+
+
+def make_clock():
+    time = BadClock()
+    clock = GameClock(time_function=time)
+    clock.tick()
+    return clock, time
+
+
+def advance(clock, time, seconds):
+    time.update(seconds)
+    clock.tick()
+
+
+def test_schedule_once_keyed_coalesces():
+    clock, time = make_clock()
+    calls = []
+    assert clock.schedule_once_keyed("hint", lambda dt, name: calls.append(name), 1, "first")
+    assert not clock.schedule_once_keyed("hint", lambda dt, name: calls.append(name), 0.1, "second")
+
+    assert clock.is_pending("hint") and clock.coalesced == 1
+    advance(clock, time, 0.5)
+    assert calls == []
+    advance(clock, time, 0.6)
+    assert calls == ["first"]
+    assert not clock.is_pending("hint")
+
+
+def test_reschedule_once_keyed_moves_the_call():
+    clock, time = make_clock()
+    calls = []
+    clock.reschedule_once_keyed("hurt", lambda dt: calls.append(("old", dt)), 0.5)
+    # 受伤多次：每次都从现在起重新计时，换成最新的函数，队列中始终只有一项
+    for _ in range(10):
+        advance(clock, time, 0.1)
+        clock.reschedule_once_keyed("hurt", lambda dt: calls.append(("new", dt)), 0.5)
+        assert clock.queue_depth == 1
+
+    advance(clock, time, 0.4)
+    assert calls == []
+    advance(clock, time, 0.2)
+    assert len(calls) == 1
+    name, dt = calls[0]
+    # 传入的时间是从最后一次规划起经过的时间
+    assert name == "new" and dt == pytest.approx(0.6)
+    assert clock.coalesced == 10 and not clock.is_pending("hurt")
+    advance(clock, time, 1)
+    assert len(calls) == 1 and clock.queue_depth == 0
+
+
+def test_unschedule_keyed():
+    clock, time = make_clock()
+    calls = []
+    clock.schedule_once_keyed("hint", lambda dt: calls.append(dt), 0.5)
+    clock.unschedule_keyed("hint")
+    clock.unschedule_keyed("missing")
+
+    advance(clock, time, 1)
+    assert calls == [] and not clock.is_pending("hint")
+    # 取消之后同一个键可以重新规划
+    assert clock.schedule_once_keyed("hint", lambda dt: calls.append(dt), 0.5)
@@ -0,0 +1,93 @@
+import arcade
+import numpy as np
+import pytest
+
+import Libs.fixedstep
+from Libs.fixedstep import FixedTimestep, Interpolator
+
+
+def make_list(count):
+    sprite_list = arcade.SpriteList()
+    for index in range(count):
+        sprite = arcade.SpriteSolidColor(4, 4, arcade.color.WHITE)
+        sprite.position = (index * 10, 0)
+        sprite_list.append(sprite)
+    return sprite_list
+
+
+def drawn(sprite_list, sprite):
+    """精灵在位置缓冲中的位置，即绘制时使用的位置"""
+    positions = np.frombuffer(sprite_list._sprite_pos_data, dtype=np.float32).reshape(-1, 2)
+    return tuple(positions[sprite_list.sprite_slot[sprite]].tolist())
+
+
+def test_fixed_timestep_steps_and_drops():
+    timestep = FixedTimestep(step=0.25, max_steps=2)
+    assert timestep.advance(0.6) == 2
+    assert timestep.alpha == pytest.approx(0.4)
+    assert timestep.advance(0.15) == 1
+    # 超过步数上限时丢弃多出的时间
+    assert timestep.advance(1) == 2
+    assert timestep.dropped == pytest.approx(0.5)
+    timestep.reset()
+    assert timestep.alpha == 0
+
+
+def test_interpolates_between_steps_and_restores():
+    sprite_list = make_list(3)
+    interpolator = Interpolator(max_distance=50)
+    interpolator.snapshot([sprite_list])
+    sprite_list[0].center_x += 20
+    sprite_list[1].center_x += 200
+
+    interpolator.apply(0.25)
+    assert drawn(sprite_list, sprite_list[0]) == (5, 0)
+    # 一步中移动太远的精灵视为瞬移，静止的精灵也不变
+    assert drawn(sprite_list, sprite_list[1]) == (210, 0)
+    assert drawn(sprite_list, sprite_list[2]) == (20, 0)
+    # 精灵本身的位置不受影响
+    assert sprite_list[0].center_x == 20
+
+    interpolator.restore()
+    assert drawn(sprite_list, sprite_list[0]) == (20, 0)
+
+
+def test_reused_slots_and_grown_buffers_are_not_interpolated():
+    sprite_list = make_list(3)
+    interpolator = Interpolator()
+    interpolator.snapshot([sprite_list])
+    for sprite in sprite_list:
+        sprite.center_y += 10
+
+    # 新精灵接手被移除精灵的槽，与记录时不是同一个精灵；再加入更多精灵让位置缓冲扩容
+    old = sprite_list[1]
+    sprite_list.remove(old)
+    reused = arcade.SpriteSolidColor(4, 4, arcade.color.WHITE)
+    reused.position = (500, 10)
+    sprite_list.append(reused)
+    assert sprite_list.sprite_slot[reused] == 1
+    extra = make_list(200)
+    for sprite in list(extra):
+        extra.remove(sprite)
+        sprite.center_y = 10
+        sprite_list.append(sprite)
+
+    interpolator.apply(0.5)
+    assert drawn(sprite_list, sprite_list[0]) == (0, 5)
+    assert drawn(sprite_list, sprite_list[1]) == (20, 5)
+    assert drawn(sprite_list, reused) == (500, 10)
+    assert all(drawn(sprite_list, sprite) == sprite.position for sprite in sprite_list[3:])
+    interpolator.restore()
+    assert all(drawn(sprite_list, sprite) == sprite.position for sprite in sprite_list)
+
+
+def test_no_interpolation_without_arcade_internals(monkeypatch):
+    monkeypatch.setattr(Libs.fixedstep, "ARCADE_INTERNALS", False)
+    sprite_list = make_list(3)
+    interpolator = Interpolator()
+    interpolator.snapshot([sprite_list])
+    sprite_list[0].center_x += 20
+
+    interpolator.apply(0.5)
+    assert drawn(sprite_list, sprite_list[0]) == (20, 0)
+    interpolator.restore()
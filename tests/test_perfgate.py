@@ -0,0 +1,60 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from Libs.perfgate import mann_whitney_p
+
+
+def test_matches_the_reference_example():
+    # scipy.stats.mannwhitneyu文档中的例子：男女两组的数据，两组中没有并列的样本。
+    # mannwhitneyu(males, females, method="asymptotic")得到U=17，双侧p值为0.11134688653314041，单侧p值是它的一半
+    males = [19, 22, 16, 29, 24]
+    females = [20, 11, 17, 12]
+    assert mann_whitney_p(females, males) == pytest.approx(0.11134688653314041 / 2, rel=1e-12)
+
+
+def test_separated_samples():
+    # U=9，均值4.5，方差3*3*7/12=5.25
+    expected = 0.5 * math.erfc((9 - 4.5 - 0.5) / math.sqrt(5.25) / math.sqrt(2))
+    assert mann_whitney_p([1, 2, 3], [4, 5, 6]) == pytest.approx(expected, rel=1e-12)
+    assert expected == pytest.approx(0.0404278, abs=1e-7)
+    # 方向相反时p值接近1
+    assert mann_whitney_p([4, 5, 6], [1, 2, 3]) > 0.95
+
+
+def test_tie_correction_matches_the_permutation_variance():
+    # 并列修正后的方差应当等于在所有分组方式下U的方差（秩固定为平均秩），这里穷举所有分组直接计算
+    baseline = [1, 1, 2, 2, 2, 3]
+    current = [2, 3, 3, 3, 4]
+    values = np.array(baseline + current, dtype=float)
+    order = values.argsort(kind="mergesort")
+    sorted_values = values[order]
+    ranks = np.empty(len(values))
+    for value in np.unique(values):
+        positions = np.flatnonzero(sorted_values == value)
+        ranks[order[positions]] = positions.mean() + 1
+    n1, n2 = len(baseline), len(current)
+    us = [ranks[list(group)].sum() - n2 * (n2 + 1) / 2
+          for group in itertools.combinations(range(n1 + n2), n2)]
+    u = ranks[n1:].sum() - n2 * (n2 + 1) / 2
+    expected = 0.5 * math.erfc((u - np.mean(us) - 0.5) / math.sqrt(np.var(us)) / math.sqrt(2))
+
+    assert mann_whitney_p(baseline, current) == pytest.approx(expected, rel=1e-9)
+
+
+def test_degenerate_samples():
+    assert mann_whitney_p([], [1, 2]) == 1.0
+    assert mann_whitney_p([1, 2], []) == 1.0
+    # 所有样本都相同时无法判断，不算变大
+    assert mann_whitney_p([5, 5, 5], [5, 5]) == 1.0
+
+
+def test_detects_a_shift_in_noisy_samples():
+    rng = np.random.default_rng(3)
+    baseline = rng.lognormal(0, 0.3, 200)
+    # 偶尔被系统打断的离群样本不影响结果
+    noisy = np.concatenate([baseline[:190], [50] * 10])
+    assert mann_whitney_p(baseline, noisy) > 0.05
+    assert mann_whitney_p(baseline, baseline * 1.2) < 0.001
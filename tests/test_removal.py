@@ -0,0 +1,75 @@
+import random
+
+import arcade
+import pytest
+
+import Libs.removal
+from Libs.removal import RemovalQueue, remove_sprites
+
+
+def make_sprite(index):
+    sprite = arcade.SpriteSolidColor(4, 4, arcade.color.WHITE)
+    sprite.position = (index % 100 * 8, index // 100 * 8)
+    sprite.index = index
+    return sprite
+
+
+def make_list(count, use_spatial_hash=False):
+    sprite_list = arcade.SpriteList(use_spatial_hash=use_spatial_hash)
+    for index in range(count):
+        sprite_list.append(make_sprite(index))
+    return sprite_list
+
+
+def layout(sprite_list):
+    """列表中精灵的先后顺序、各自的位置槽、绘制顺序与空闲的位置槽，都用精灵的编号表示"""
+    return ([sprite.index for sprite in sprite_list],
+            {sprite.index: slot for sprite, slot in sprite_list.sprite_slot.items()},
+            list(sprite_list._sprite_index_data), sprite_list._sprite_index_slots,
+            sorted(sprite_list._sprite_buffer_free_slots))
+
+
+@pytest.mark.parametrize("internals", [True, False])
+@pytest.mark.parametrize("use_spatial_hash", [False, True])
+def test_remove_sprites_matches_sequential_remove(monkeypatch, internals, use_spatial_hash):
+    monkeypatch.setattr(Libs.removal, "ARCADE_INTERNALS", internals)
+    batch = make_list(3000, use_spatial_hash)
+    sequential = make_list(3000, use_spatial_hash)
+    indices = random.Random(1).sample(range(3000), 1200)
+
+    dead = [batch[index] for index in indices]
+    remove_sprites(batch, dead)
+    for sprite in [sequential[index] for index in indices]:
+        sequential.remove(sprite)
+
+    assert layout(batch) == layout(sequential)
+    assert all(not sprite.sprite_lists for sprite in dead)
+    if use_spatial_hash:
+        remaining = set().union(*batch.spatial_hash.contents.values())
+        assert remaining == set(batch.sprite_list)
+
+    # 空出的位置槽可以继续使用。空闲槽的先后顺序与逐个移除时不同，只检查绘制顺序与各精灵的位置槽一致
+    for index in range(3000, 3100):
+        batch.append(make_sprite(index))
+    slots = [batch.sprite_slot[sprite] for sprite in batch]
+    assert len(set(slots)) == len(batch) == 1900
+    assert list(batch._sprite_index_data[:len(batch)]) == slots
+
+
+def test_removal_queue_coalesces_repeated_kills():
+    first = make_list(10)
+    second = arcade.SpriteList()
+    for sprite in first[:5]:
+        second.append(sprite)
+    queue = RemovalQueue()
+    for sprite in first[:3]:
+        queue.defer(sprite)
+    queue.defer(first[0])
+
+    assert queue.is_dead(first[0]) and not queue.is_dead(first[5])
+    stats = queue.flush()
+
+    assert stats == (4, 3, 1, 2)
+    assert [sprite.index for sprite in first] == list(range(3, 10))
+    assert [sprite.index for sprite in second] == [3, 4]
+    assert len(queue) == 0
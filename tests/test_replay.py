@@ -0,0 +1,63 @@
+import main
+from Libs.headless import simulate
+from Libs.replay import InputRecorder, ReplayController, create_view, load_recording, replay
+
+
+def controller_recording(path):
+    """一局用手柄操作的录像：连接手柄、推动摇杆、开火、切换技能、暂停再继续，最后按back返回主菜单"""
+    recorder = InputRecorder(str(path), "main", 7, main.SIM_STEP)
+    events = [
+        (0, "on_connect", None),
+        (5, "on_stick_motion", None, "leftstick", 1.0, 0.5),
+        (10, "on_joybutton_press", None, "y"),
+        (40, "on_stick_motion", None, "rightstick", 0.0, -1.0),
+        (41, "on_stick_motion", None, "rightstick", 0.0, 0.0),
+        (60, "on_joybutton_release", None, "y"),
+        (70, "on_stick_motion", None, "leftstick", 0.0, 0.0),
+        (80, "on_joybutton_press", None, "start"),
+        (81, "on_joybutton_press", None, "start"),
+        (90, "on_joybutton_press", None, "back"),
+    ]
+    for step, name, *args in events:
+        recorder.record(step, name, args)
+    recorder.save(90, None)
+    return load_recording(path)
+
+
+def final_state(view):
+    """一局游戏的最终状态：步数、分数、玩家的状态，以及场景中所有精灵的位置"""
+    return (view.steps, view.score, view.player.position, view.player.health, view.skill_selected,
+            [[sprite.position for sprite in sprite_list] for sprite_list in view.game_scene.sprite_lists])
+
+
+def create_and_replay(recording):
+    view = create_view(recording)
+    replay(view, recording)
+    return view
+
+
+def test_replay_with_controller_events(tmp_path):
+    recording = controller_recording(tmp_path / "controller.json")
+
+    view = create_view(recording)
+    start = view.player.position
+    outcome = replay(view, recording)
+
+    assert outcome.frames == 90
+    assert isinstance(view.joystick, ReplayController)
+    assert view.player.center_x > start[0] and view.player.center_y > start[1]
+    assert not view.paused
+
+    # 录像在第90步按下back时结束；无窗口模式下没有界面可以返回，直接输入也不会出错
+    view.on_joybutton_press(None, "back")
+    # 同一个录像每次重放得到完全相同的一局
+    assert final_state(create_and_replay(recording)) == final_state(view)
+
+
+def test_same_seed_simulates_the_same_game():
+    outcomes = []
+    for _ in range(2):
+        view = main.GameView(headless=True, seed=7)
+        result = simulate(view, 600)
+        outcomes.append((result.frames, result.result, final_state(view)))
+    assert outcomes[0] == outcomes[1]
@@ -0,0 +1,144 @@
+from Libs.timeline import Timeline
+
+
+def script(timeline, log, name, delays):
+    """每次等待后记下脚本的名字与被唤醒的时间"""
+    for delay in delays:
+        yield delay
+        log.append((name, timeline.time))
+
+
+def test_scripts_wake_in_time_order():
+    timeline = Timeline()
+    log = []
+    timeline.run(script(timeline, log, "a", [1, 1, 1]))
+    timeline.run(script(timeline, log, "b", [0.5, 2]))
+    timeline.run(script(timeline, log, "c", [1]))
+
+    # 一次推进跨过多个唤醒时间，也按时间先后执行；同一时间唤醒的按加入的先后执行
+    timeline.advance(3)
+
+    assert log == [("b", 0.5), ("a", 1), ("c", 1), ("a", 2), ("b", 2.5), ("a", 3)]
+    assert len(timeline) == 0
+    assert timeline.time == 3
+
+
+def test_advance_in_frames_matches_one_advance():
+    log_frames, log_once = [], []
+    # 每帧的时间取可以精确表示的1/64秒，累加起来正好是3秒
+    for log, steps in ((log_frames, [1 / 64] * 192), (log_once, [3])):
+        timeline = Timeline()
+        timeline.run(script(timeline, log, "a", [0.75] * 4))
+        timeline.run(script(timeline, log, "b", [0.4] * 5))
+        for step in steps:
+            timeline.advance(step)
+        log[:] = [name for name, _ in log]
+
+    assert log_frames == log_once
+
+
+def test_yield_none_waits_for_next_advance():
+    timeline = Timeline()
+    log = []
+    timeline.run(script(timeline, log, "a", [None, None, 0]))
+
+    timeline.advance(1)
+    assert log == [("a", 0)]
+    timeline.advance(1)
+    timeline.advance(1)
+    assert [name for name, _ in log] == ["a", "a", "a"]
+
+
+def test_cancel_stops_a_script():
+    timeline = Timeline()
+    log = []
+    task = timeline.run(script(timeline, log, "a", [1, 1, 1]))
+    timeline.run(script(timeline, log, "b", [1.5]))
+
+    timeline.advance(1)
+    task.cancel()
+    timeline.advance(5)
+
+    assert log == [("a", 1), ("b", 1.5)]
+    assert task.done
+    # 已经结束的脚本再取消也没有问题
+    task.cancel()
+
+
+def test_script_can_cancel_itself():
+    timeline = Timeline()
+    log = []
+    tasks = []
+
+    def suicide():
+        yield 1
+        log.append("before")
+        tasks[0].cancel()
+        yield 1
+        log.append("after")
+
+    tasks.append(timeline.run(suicide()))
+    timeline.advance(5)
+
+    assert log == ["before"]
+    assert len(timeline) == 0
+
+
+def test_cancel_owner_only_stops_that_owner():
+    timeline = Timeline()
+    log = []
+    boss, other = object(), object()
+    boss_tasks = [timeline.run(script(timeline, log, "boss", [1, 1]), owner=boss),
+                  timeline.run(script(timeline, log, "boss_next", [None, 2]), owner=boss)]
+    other_task = timeline.run(script(timeline, log, "other", [1, 1]), owner=other)
+
+    timeline.cancel_owner(boss)
+    timeline.advance(3)
+
+    assert all(task.done for task in boss_tasks)
+    assert log == [("other", 1), ("other", 2)]
+    assert other_task.done
+
+
+def test_clear_stops_everything():
+    timeline = Timeline()
+    log = []
+    tasks = [timeline.run(script(timeline, log, "a", [1])), timeline.run(script(timeline, log, "b", [None]))]
+
+    timeline.clear()
+    timeline.advance(2)
+
+    assert log == []
+    assert len(timeline) == 0
+    assert all(task.done for task in tasks)
+
+
+def test_fast_forward():
+    timeline = Timeline()
+    log = []
+    timeline.run(script(timeline, log, "a", [0.5] * 4))
+    timeline.run(script(timeline, log, "b", [None] * 3))
+
+    # 一次快进完时，yield None的脚本只执行一次
+    timeline.fast_forward(2)
+    assert [name for name, _ in log] == ["b", "a", "a", "a", "a"]
+    assert timeline.time == 2
+
+    # 分步快进时，每一步都会执行一次yield None的脚本
+    timeline.fast_forward(1, step=0.25)
+    assert [name for name, _ in log].count("b") == 3
+    assert abs(timeline.time - 3) < 1e-9
+
+
+def test_scripts_started_from_scripts_count_from_wake_time():
+    timeline = Timeline()
+    log = []
+
+    def spawner():
+        yield 1
+        timeline.run(script(timeline, log, "child", [0.5]))
+
+    timeline.run(spawner())
+    timeline.advance(2)
+
+    assert log == [("child", 1.5)]